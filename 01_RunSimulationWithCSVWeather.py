@@ -1,40 +1,64 @@
 # Import required packages
+import argparse
 from pcse.base import ParameterProvider
-from pcse.input import CSVWeatherDataProvider, YAMLCropDataProvider
+from pcse.input import YAMLCropDataProvider
 from pcse.models import Wofost72_PP
-import matplotlib.pyplot as plt
-from configs.config_01 import agro_fp, crop, cultivar, fig_fp, output_fp, site_fp, soil_fp, weather_fp
+from configs.config_01 import agro_fp, crop, cultivar, fig_fp, output_fp, parquet_dir, site_fp, soil_fp, weather_fp
+from configs.config_01 import profile_dir
+from configs.config_01 import fig_dpi, make_figure, write_excel
+from libs.output_sink import ParquetOutputSink
+from libs.postprocessing import PostProcessor
+from libs.profiling import profiler
+from libs.weather_cache import CachedWeatherDataProvider
 import pandas as pd
 import yaml
 
-def main():
+def main(profile=False):
+    if profile:
+        profiler.enable()
+
     # Load model input data
-    agrod = yaml.safe_load(open(agro_fp))
-    cropd = YAMLCropDataProvider(Wofost72_PP)
-    sited = yaml.safe_load(open(site_fp))
-    soild = yaml.safe_load(open(soil_fp))
-    wdp = CSVWeatherDataProvider(weather_fp)
+    with profiler.stage("agromanagement"):
+        agrod = yaml.safe_load(open(agro_fp))
+    with profiler.stage("crop_data"):
+        cropd = YAMLCropDataProvider(Wofost72_PP)
+    with profiler.stage("site_data"):
+        sited = yaml.safe_load(open(site_fp))
+    with profiler.stage("soil_data"):
+        soild = yaml.safe_load(open(soil_fp))
+    with profiler.stage("weather_data"):
+        wdp = CachedWeatherDataProvider(weather_fp)
 
     # Build model and run it
-    parameters = ParameterProvider(sitedata=sited, soildata=soild, cropdata=cropd)
-    model = Wofost72_PP(parameters, wdp, agrod)
-    model.run_till_terminate()
-
-    # Collect simulation output
-    df = pd.DataFrame(model.get_output()).set_index("day")
-    fig, axs = plt.subplots(nrows=1, ncols=2, figsize=(16, 8))
-    df["LAI"].plot(ax=axs[0], label="LAI", color='k')
-    df["TAGP"].plot(ax=axs[1], label="Total biomass")
-    df["TWSO"].plot(ax=axs[1], label="Yield")
-    axs[0].set_title("Leaf Area Index")
-    axs[1].set_title("Crop biomass")
-    r = axs[1].legend()
-    fig.autofmt_xdate()
-
-    # Save output
-    fig.savefig(fig_fp, dpi=600)
-    df.to_excel(output_fp)
+    with profiler.stage("model_setup"):
+        parameters = ParameterProvider(sitedata=sited, soildata=soild, cropdata=cropd)
+        model = Wofost72_PP(parameters, wdp, agrod)
+    with profiler.stage("model_run"):
+        model.run_till_terminate()
+
+    # Save simulation output
+    with profiler.stage("parquet_output"):
+        output = model.get_output()
+        with ParquetOutputSink(parquet_dir, overwrite=True) as sink:
+            sink.add("01", output, model.get_summary_output())
+
+    # Optional post-processing
+    df = pd.DataFrame(output).set_index("day")
+    pp = PostProcessor()
+    if make_figure:
+        panels = [("Leaf Area Index", [("LAI", "LAI", {"color": 'k'})]),
+                  ("Crop biomass", [("TAGP", "Total biomass", {}), ("TWSO", "Yield", {})])]
+        with profiler.stage("figure"):
+            pp.plot_timeseries(df, fig_fp, panels, dpi=fig_dpi)
+    if write_excel:
+        with profiler.stage("excel"):
+            pp.export_excel(df, output_fp)
+
+    profiler.write_report(profile_dir, "01")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--profile", action="store_true",
+                        help=f"write a timing and memory profile of the run stages (or set {profiler.env_var}=1)")
+    main(**vars(parser.parse_args()))
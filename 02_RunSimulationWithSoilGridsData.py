@@ -1,49 +1,76 @@
+import argparse
 from configs.config_02 import crop, cultivar, lat, lon, CO2, NH4I, NO3I, WAV
-from configs.config_02 import agro_fp, fig_fp, output_fp, weather_fp
+from configs.config_02 import agro_fp, fig_fp, output_fp, parquet_dir, soilgrids_cache_fp, weather_fp
+from configs.config_02 import soil_profile_cache_dir
+from configs.config_02 import fig_dpi, make_figure, profile_dir, write_excel
+from libs.output_sink import ParquetOutputSink
+from libs.postprocessing import PostProcessor
+from libs.profiling import profiler
 from libs.SoilGridsDataProvider import SoilGridsDataProvider
-import matplotlib.pyplot as plt
+from libs.soil_profile_cache import SoilProfileCache
+from libs.soilgrids_cache import SoilGridsResponseCache
+from libs.weather_cache import CachedWeatherDataProvider
 import pandas as pd
 from pcse.base import ParameterProvider
-from pcse.input import ExcelWeatherDataProvider, WOFOST81SiteDataProvider_SNOMIN, YAMLCropDataProvider
+from pcse.input import WOFOST81SiteDataProvider_SNOMIN, YAMLCropDataProvider
 from pcse.models import Wofost81_NWLP_MLWB_SNOMIN
 import yaml
 
-def main():
-    agrod = yaml.safe_load(open(agro_fp))
-    cropd = YAMLCropDataProvider(Wofost81_NWLP_MLWB_SNOMIN)
+def main(profile=False):
+    if profile:
+        profiler.enable()
 
-    sdp = SoilGridsDataProvider(lat, lon, 120.)
-    soild = sdp.soil_yaml
+    with profiler.stage("agromanagement"):
+        agrod = yaml.safe_load(open(agro_fp))
+    with profiler.stage("crop_data"):
+        cropd = YAMLCropDataProvider(Wofost81_NWLP_MLWB_SNOMIN)
 
-    nlayer = len(sdp.soil_yaml["SoilProfileDescription"]["SoilLayers"])
-    NH4Ilist = [0] * nlayer
-    NO3Ilist = [0] * nlayer
-    NH4Ilist[0] = NH4I
-    NO3Ilist[0] = NO3I
-    sited = WOFOST81SiteDataProvider_SNOMIN(CO2 = CO2, NH4I = NH4Ilist, NO3I = NO3Ilist, WAV = WAV)
+    with profiler.stage("soil_data"):
+        cache = SoilGridsResponseCache(soilgrids_cache_fp)
+        profile_cache = SoilProfileCache(soil_profile_cache_dir)
+        sdp = SoilGridsDataProvider(lat, lon, 120., cache=cache, profile_cache=profile_cache)
+        soild = sdp.soil_yaml
 
-    wdp = ExcelWeatherDataProvider(weather_fp)
+    with profiler.stage("site_data"):
+        nlayer = len(sdp.soil_yaml["SoilProfileDescription"]["SoilLayers"])
+        NH4Ilist = [0] * nlayer
+        NO3Ilist = [0] * nlayer
+        NH4Ilist[0] = NH4I
+        NO3Ilist[0] = NO3I
+        sited = WOFOST81SiteDataProvider_SNOMIN(CO2 = CO2, NH4I = NH4Ilist, NO3I = NO3Ilist, WAV = WAV)
+
+    with profiler.stage("weather_data"):
+        wdp = CachedWeatherDataProvider(weather_fp)
 
     # Build model and run it
-    parameters = ParameterProvider(sitedata=sited, soildata=soild, cropdata=cropd)
-    model = Wofost81_NWLP_MLWB_SNOMIN(parameters, wdp, agrod)
-    model.run_till_terminate()
-
-    # Collect simulation output
-    df = pd.DataFrame(model.get_output()).set_index("day")
-    fig, axs = plt.subplots(nrows=1, ncols=2, figsize=(16, 8))
-    df["LAI"].plot(ax=axs[0], label="LAI", color='k')
-    df["WST"].plot(ax=axs[1], label="Stems")
-    df["WLV"].plot(ax=axs[1], label="Green leaves")
-    df["WSO"].plot(ax=axs[1], label="Tubers")
-    axs[0].set_title("Leaf Area Index")
-    axs[1].set_title("Crop biomass")
-    r = axs[1].legend()
-    fig.autofmt_xdate()
-
-    # Save output
-    fig.savefig(fig_fp, dpi=600)
-    df.to_excel(output_fp)
+    with profiler.stage("model_setup"):
+        parameters = ParameterProvider(sitedata=sited, soildata=soild, cropdata=cropd)
+        model = Wofost81_NWLP_MLWB_SNOMIN(parameters, wdp, agrod)
+    with profiler.stage("model_run"):
+        model.run_till_terminate()
+
+    # Save simulation output
+    with profiler.stage("parquet_output"):
+        output = model.get_output()
+        with ParquetOutputSink(parquet_dir, overwrite=True) as sink:
+            sink.add("02", output, model.get_summary_output())
+
+    # Optional post-processing
+    df = pd.DataFrame(output).set_index("day")
+    pp = PostProcessor()
+    if make_figure:
+        panels = [("Leaf Area Index", [("LAI", "LAI", {"color": 'k'})]),
+                  ("Crop biomass", [("WST", "Stems", {}), ("WLV", "Green leaves", {}), ("WSO", "Tubers", {})])]
+        with profiler.stage("figure"):
+            pp.plot_timeseries(df, fig_fp, panels, dpi=fig_dpi)
+    if write_excel:
+        with profiler.stage("excel"):
+            pp.export_excel(df, output_fp)
+
+    profiler.write_report(profile_dir, "02")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--profile", action="store_true",
+                        help=f"write a timing and memory profile of the run stages (or set {profiler.env_var}=1)")
+    main(**vars(parser.parse_args()))
@@ -1,56 +1,69 @@
-from configs.config_03 import (all_profiles_fp, soilcode_fp, bofek_dir, bofek_zip2_fp, bofek_shape_fp,
-                               staring_series_dir, staring_series_fp, url_bofek2020)
-from configs.config_03 import agro_fp, fig_fp, output_fp, weather_fp
+from configs.config_03 import bofek_dir, soil_profile_cache_dir, staring_series_dir
+from configs.config_03 import agro_fp, fig_fp, output_fp, parquet_dir, weather_fp
+from configs.config_03 import fig_dpi, make_figure, profile_dir, write_excel
 from configs.config_03 import CO2, lat, lon, WAV
-from libs.util import Util
-import geopandas as gpd
-import io
-import matplotlib.pyplot as plt
-import numpy as np
+import argparse
 import pandas as pd
-import py7zr
-import requests
-import zipfile
-from shapely import Point, Polygon
-from types import SimpleNamespace
 import yaml
 from pcse.base import ParameterProvider
-from pcse.input import ExcelWeatherDataProvider, WOFOST81SiteDataProvider_SNOMIN, YAMLCropDataProvider
+from pcse.input import WOFOST81SiteDataProvider_SNOMIN, YAMLCropDataProvider
 from pcse.models import Wofost81_WLP_MLWB
 from libs.BOFEK2020DataProvider import BOFEK2020DataProvider
+from libs.output_sink import ParquetOutputSink
+from libs.postprocessing import PostProcessor
+from libs.profiling import profiler
+from libs.soil_profile_cache import SoilProfileCache
+from libs.weather_cache import CachedWeatherDataProvider
 
-def main():
-    agrod = yaml.safe_load(open(agro_fp))
-    cropd = YAMLCropDataProvider(Wofost81_WLP_MLWB)
-    bd = BOFEK2020DataProvider(lat, lon, bofek_dir, staring_series_dir, 125.)
-    soild = bd.soil_yaml
-    nlayer = len(bd.soil_yaml["SoilProfileDescription"]["SoilLayers"])
-    NH4Ilist = [0] * nlayer
-    NO3Ilist = [0] * nlayer
-    NH4Ilist[0] = 100.
-    NO3Ilist[0] = 100.
-    sited = WOFOST81SiteDataProvider_SNOMIN(CO2 = CO2, NH4I = NH4Ilist, NO3I = NO3Ilist, WAV = WAV)
-    wdp = ExcelWeatherDataProvider(weather_fp)
-    parameters = ParameterProvider(sitedata=sited, soildata=soild, cropdata=cropd)
-    model = Wofost81_WLP_MLWB(parameters, wdp, agrod)
-    model.run_till_terminate()
+def main(profile=False):
+    if profile:
+        profiler.enable()
 
-    # Collect simulation output
-    df = pd.DataFrame(model.get_output()).set_index("day")
-    fig, axs = plt.subplots(nrows=1, ncols=2, figsize=(16, 8))
-    df["LAI"].plot(ax=axs[0], label="LAI", color='k')
-    df["WLV"].plot(ax=axs[1], label="Leaf DM")
-    df["WST"].plot(ax=axs[1], label="Stem DM")
-    df["WSO"].plot(ax=axs[1], label="Yield")
-    axs[0].set_title("Leaf Area Index")
-    axs[1].set_title("Crop biomass")
-    r = axs[1].legend()
-    fig.autofmt_xdate()
+    with profiler.stage("agromanagement"):
+        agrod = yaml.safe_load(open(agro_fp))
+    with profiler.stage("crop_data"):
+        cropd = YAMLCropDataProvider(Wofost81_WLP_MLWB)
+    with profiler.stage("soil_data"):
+        profile_cache = SoilProfileCache(soil_profile_cache_dir)
+        bd = BOFEK2020DataProvider(lat, lon, bofek_dir, staring_series_dir, 125., profile_cache=profile_cache)
+        soild = bd.soil_yaml
+    with profiler.stage("site_data"):
+        nlayer = len(bd.soil_yaml["SoilProfileDescription"]["SoilLayers"])
+        NH4Ilist = [0] * nlayer
+        NO3Ilist = [0] * nlayer
+        NH4Ilist[0] = 100.
+        NO3Ilist[0] = 100.
+        sited = WOFOST81SiteDataProvider_SNOMIN(CO2 = CO2, NH4I = NH4Ilist, NO3I = NO3Ilist, WAV = WAV)
+    with profiler.stage("weather_data"):
+        wdp = CachedWeatherDataProvider(weather_fp)
+    with profiler.stage("model_setup"):
+        parameters = ParameterProvider(sitedata=sited, soildata=soild, cropdata=cropd)
+        model = Wofost81_WLP_MLWB(parameters, wdp, agrod)
+    with profiler.stage("model_run"):
+        model.run_till_terminate()
 
-    # Save output
-    fig.savefig(fig_fp, dpi=600)
-    df.to_excel(output_fp)
+    # Save simulation output
+    with profiler.stage("parquet_output"):
+        output = model.get_output()
+        with ParquetOutputSink(parquet_dir, overwrite=True) as sink:
+            sink.add("03", output, model.get_summary_output())
 
-if __name__ == "__main__":
-    main()
+    # Optional post-processing
+    df = pd.DataFrame(output).set_index("day")
+    pp = PostProcessor()
+    if make_figure:
+        panels = [("Leaf Area Index", [("LAI", "LAI", {"color": 'k'})]),
+                  ("Crop biomass", [("WLV", "Leaf DM", {}), ("WST", "Stem DM", {}), ("WSO", "Yield", {})])]
+        with profiler.stage("figure"):
+            pp.plot_timeseries(df, fig_fp, panels, dpi=fig_dpi)
+    if write_excel:
+        with profiler.stage("excel"):
+            pp.export_excel(df, output_fp)
+
+    profiler.write_report(profile_dir, "03")
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--profile", action="store_true",
+                        help=f"write a timing and memory profile of the run stages (or set {profiler.env_var}=1)")
+    main(**vars(parser.parse_args()))
@@ -0,0 +1,38 @@
+from configs.config_04 import crop, cultivars, model, sites, years, CO2, NH4I, NO3I, RDMCR, WAV, max_workers
+from configs.config_04 import agro_fp, bofek_dir, output_fp, parquet_dir, staring_series_dir, weather_fp
+from configs.config_04 import write_excel
+from itertools import product
+from libs.BOFEK2020DataProvider import BOFEK2020DataProvider
+from libs.ensemble_runner import EnsembleRunner
+from libs.output_sink import ParquetOutputSink
+from libs.postprocessing import PostProcessor
+
+def main(max_workers=max_workers):
+    # Soil profiles of all sites are looked up at once
+    soilds = BOFEK2020DataProvider.get_soil_yamls(sites, bofek_dir, staring_series_dir, RDMCR)
+
+    runs = []
+    for (isite, (lat, lon)), year, cultivar in product(enumerate(sites), years, cultivars):
+        runs.append({"run_id": f"site{isite}_{year}_{cultivar}",
+                     "model": model,
+                     "weather_fp": weather_fp,
+                     "agro_fp": agro_fp,
+                     "soil": soilds[isite],
+                     "year": year,
+                     "crop": crop,
+                     "cultivar": cultivar,
+                     "site": {"CO2": CO2, "WAV": WAV, "NH4I": NH4I, "NO3I": NO3I}})
+
+    # The output of all runs is streamed to Parquet while the runs complete
+    runner = EnsembleRunner(max_workers=max_workers)
+    with ParquetOutputSink(parquet_dir, overwrite=True) as sink:
+        results, failures = runner.run(runs, sink=sink)
+
+    # Optional post-processing
+    if write_excel:
+        pp = PostProcessor()
+        df = pp.read_output(parquet_dir, table="summary").sort_values("run_id").set_index("run_id")
+        pp.export_excel(df, output_fp)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+from configs.config_05 import crop, cultivar, model, year, CO2, NH4I, NO3I, RDMCR, WAV, max_workers
+from configs.config_05 import fields_fp, grid_step, lat_max, lat_min, lon_max, lon_min, lookup, region
+from configs.config_05 import simplify_tolerance
+from configs.config_05 import agro_fp, bofek_dir, output_fp, parquet_dir, staring_series_dir, weather_fp, weather_store
+from configs.config_05 import write_excel
+import numpy as np
+from libs.output_sink import ParquetOutputSink
+from libs.postprocessing import PostProcessor
+from libs.regional_runner import RegionalRunner
+
+def main():
+    if fields_fp is not None:
+        import geopandas as gpd
+        fields = gpd.read_file(fields_fp)
+    else:
+        lats, lons = np.meshgrid(np.arange(lat_min, lat_max, grid_step), np.arange(lon_min, lon_max, grid_step))
+        fields = np.column_stack([lats.ravel(), lons.ravel()])
+
+    runner = RegionalRunner(model, bofek_dir, staring_series_dir, RDMCR,
+                            site={"CO2": CO2, "WAV": WAV, "NH4I": NH4I, "NO3I": NO3I},
+                            weather_fp=weather_fp if weather_store is None else None, weather_store=weather_store,
+                            max_workers=max_workers, region=region, simplify_tolerance=simplify_tolerance,
+                            lookup=lookup)
+    with ParquetOutputSink(parquet_dir, overwrite=True) as sink:
+        members, results, failures = runner.run(fields, agro_fp, year=year, crop=crop, cultivar=cultivar, sink=sink)
+
+    # Optional post-processing: the summary of every field
+    if write_excel:
+        pp = PostProcessor()
+        df = runner.map_to_members(members, pp.read_output(parquet_dir, table="summary"))
+        pp.export_excel(df.set_index("member_id"), output_fp)
+
+if __name__ == "__main__":
+    main()
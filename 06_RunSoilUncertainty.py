@@ -0,0 +1,37 @@
+from configs.config_06 import crop, cultivar, lat, lon, model, year, CO2, NH4I, NO3I, RDMCR, WAV, max_workers
+from configs.config_06 import daily_vars, exact_percentiles, nmembers, percentiles, sds, seed, summary_vars
+from configs.config_06 import agro_fp, bofek_dir, daily_fp, fig_fp, staring_series_dir, summary_fp, weather_fp
+from configs.config_06 import fig_dpi, make_figure, write_excel
+from libs.BOFEK2020DataProvider import BOFEK2020DataProvider
+from libs.ensemble_runner import EnsembleRunner
+from libs.output_sink import PercentileSink
+from libs.postprocessing import PostProcessor
+from libs.soil_ensemble import SoilHydraulicEnsemble
+
+def main(max_workers=max_workers):
+    # The ensemble perturbs the Van Genuchten parameters of the Staring series profile at the site
+    bd = BOFEK2020DataProvider(lat, lon, bofek_dir, staring_series_dir, RDMCR)
+    ensemble = SoilHydraulicEnsemble.from_bofek2020(bd, sds=sds)
+    base_run = {"model": model, "weather_fp": weather_fp, "agro_fp": agro_fp, "year": year, "crop": crop,
+                "cultivar": cultivar, "site": {"CO2": CO2, "WAV": WAV, "NH4I": NH4I, "NO3I": NO3I}}
+    samples, runs = ensemble.get_runs(base_run, nmembers, seed=seed)
+
+    # The output of every member is reduced to percentiles as soon as its run completes
+    runner = EnsembleRunner(max_workers=max_workers)
+    with PercentileSink(daily_vars, summary_vars, percentiles, exact=exact_percentiles) as sink:
+        results, failures = runner.run(runs, sink=sink)
+    df_daily = sink.get_daily_percentiles()
+    df_summary = sink.get_summary_percentiles()
+    print(df_summary)
+
+    # Optional post-processing
+    pp = PostProcessor()
+    if make_figure:
+        panels = [(var, [(f"{var}_p{p:g}", f"P{p:g}", {}) for p in percentiles]) for var in ["LAI", "WSO"]]
+        pp.plot_timeseries(df_daily, fig_fp, panels, dpi=fig_dpi)
+    if write_excel:
+        pp.export_excel(df_daily, daily_fp)
+        pp.export_excel(df_summary, summary_fp)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import json
+import shutil
+from pathlib import Path
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import rasterio
+from rasterio.transform import from_origin
+from shapely import box
+
+benchmarks_dir = Path(__file__).resolve().parent
+repo_dir = benchmarks_dir.parent
+soilgrids_response_fp = benchmarks_dir / "data" / "soilgrids_response.json"
+staring_series_src_dir = repo_dir / "input" / "03" / "StaringSeries"
+
+# Synthetic BOFEK2020 map: a grid of square polygons in RD New (EPSG:28992) south-west of Utrecht
+bofek_x0 = 130000.
+bofek_y0 = 440000.
+bofek_ncells = 40
+bofek_cell_size = 1000.
+# Synthetic SoilGrids tiles in EPSG:4326 around the synthetic BOFEK2020 map
+tiles_extent = (4.9, 51.9, 5.5, 52.3)
+tiles_resolution = 0.0025
+
+def make_bofek_fixture(fixture_dir, seed=0):
+    """Writes a small synthetic bod_clusters shapefile and a copy of the Staring series tables into fixture_dir and
+    returns the (bofek_dir, staring_series_dir) pair. Existing fixtures are reused."""
+    fixture_dir = Path(fixture_dir)
+    bofek_dir = fixture_dir / "BOFEK2020"
+    staring_series_dir = fixture_dir / "StaringSeries"
+    bofek_shape_fp = bofek_dir / "GIS" / "shp_files" / "bod_clusters.shp"
+    if not staring_series_dir.exists():
+        shutil.copytree(staring_series_src_dir, staring_series_dir,
+                        ignore=shutil.ignore_patterns("*.npz"))
+    if not bofek_shape_fp.exists():
+        bofek_shape_fp.parent.mkdir(parents=True, exist_ok=True)
+        bodemcodes = pd.read_csv(staring_series_dir / "BodemCode.csv")["BodemCode"].unique()
+        rng = np.random.default_rng(seed)
+        polygons = []
+        for i in range(bofek_ncells):
+            for j in range(bofek_ncells):
+                x = bofek_x0 + i * bofek_cell_size
+                y = bofek_y0 + j * bofek_cell_size
+                polygons.append(box(x, y, x + bofek_cell_size, y + bofek_cell_size))
+        gdf = gpd.GeoDataFrame({"BODEMCODE": rng.choice(bodemcodes, len(polygons))}, geometry=polygons,
+                               crs="EPSG:28992")
+        gdf.to_file(bofek_shape_fp)
+    return bofek_dir, staring_series_dir
+
+def get_sites(nsites, seed=0):
+    """Returns an (nsites, 2) array of random (lat, lon) pairs inside the synthetic BOFEK2020 map."""
+    rng = np.random.default_rng(seed)
+    # Stay clear of the map edges, so that no site falls outside the map after reprojection
+    margin = 0.5 * bofek_cell_size
+    size = bofek_ncells * bofek_cell_size
+    xs = rng.uniform(bofek_x0 + margin, bofek_x0 + size - margin, nsites)
+    ys = rng.uniform(bofek_y0 + margin, bofek_y0 + size - margin, nsites)
+    points = gpd.GeoSeries(gpd.points_from_xy(xs, ys), crs="EPSG:28992").to_crs("EPSG:4326")
+    return np.column_stack([points.y.to_numpy(), points.x.to_numpy()])
+
+def make_soilgrids_tiles_fixture(fixture_dir, seed=0):
+    """Writes synthetic SoilGrids GeoTIFF tiles (the recorded response values with +/-10% noise per pixel) in the
+    layout of SoilGridsRasterSource into fixture_dir/SoilGrids and returns that directory. Existing tiles are reused."""
+    tiles_dir = Path(fixture_dir) / "SoilGrids"
+    response = get_soilgrids_response()
+    min_lon, min_lat, max_lon, max_lat = tiles_extent
+    width = int(round((max_lon - min_lon) / tiles_resolution))
+    height = int(round((max_lat - min_lat) / tiles_resolution))
+    transform = from_origin(min_lon, max_lat, tiles_resolution, tiles_resolution)
+    rng = np.random.default_rng(seed)
+    for layer in response["properties"]["layers"]:
+        for depth in layer["depths"]:
+            fp = tiles_dir / layer["name"] / f"{layer['name']}_{depth['label']}_mean.tif"
+            if fp.exists():
+                continue
+            fp.parent.mkdir(parents=True, exist_ok=True)
+            data = np.round(depth["values"]["mean"] * rng.uniform(0.9, 1.1, (height, width))).astype(np.int16)
+            with rasterio.open(fp, "w", driver="GTiff", width=width, height=height, count=1, dtype="int16",
+                               crs="EPSG:4326", transform=transform, nodata=-32768, tiled=True, blockxsize=256,
+                               blockysize=256) as dst:
+                dst.write(data, 1)
+    return tiles_dir
+
+def get_soilgrids_response():
+    """Returns the recorded SoilGrids REST API response that is used for all sites."""
+    with open(soilgrids_response_fp) as f:
+        return json.load(f)
@@ -0,0 +1,321 @@
+"""Offline benchmarks of the soil data providers, the pedotransfer functions, the water retention curves, Util.Afgen
+and end-to-end runs of the three example models.
+
+Run from the root of the repository:
+
+    python -m benchmarks.run_benchmarks [--sites 1 100 10000] [--crop-dir <WOFOST_crop_parameters>]
+
+Every benchmark is timed at every number of sites (best of --repeat runs) and then run once more under tracemalloc to
+get its peak memory. The results are printed and written to <output-dir>/benchmarks.csv and benchmarks.json.
+"""
+import argparse
+import datetime as dt
+import gc
+import json
+import platform
+import time
+import tracemalloc
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from benchmarks.fixtures import get_sites, get_soilgrids_response, make_bofek_fixture, make_soilgrids_tiles_fixture
+from benchmarks.fixtures import repo_dir
+from libs.BOFEK2020DataProvider import BOFEK2020DataProvider
+from libs.pedotransferfunctions import PedotransferFunctionsWosten
+from libs.soil_cube import SoilParameterCube
+from libs.soil_ensemble import SoilHydraulicEnsemble
+from libs.soilgrids_raster import SoilGridsRasterSource
+from libs.SoilGridsDataProvider import SoilGridsDataProvider
+from libs.util import AfgenTable, Util
+from libs.water_retention_curves import VanGenuchten
+from libs import ensemble_runner
+
+RDMCR = 125.
+ndays = 365
+# Example table function (AMAXTB of winter wheat)
+table_function = [0.0, 35.83, 1.0, 35.83, 1.3, 35.83, 2.0, 4.48]
+
+
+class BenchmarkSuite():
+    """Collection of benchmarks; every bench_<name> method takes the number of sites, does its (untimed) set-up and
+    returns the function to time.
+
+    Benchmarks listed in per_site loop over the sites in Python and are skipped above max_per_site sites; the model run
+    benchmarks run one simulation per site and are skipped above max_runs sites (and without crop parameters).
+    """
+    per_site = {"bofek_provider", "soilgrids_provider", "soilgrids_raster_providers", "soil_cube_read", "ptf_scalar",
+                "vangenuchten_scalar", "afgen", "afgen_table"}
+    model_runs = {"run_01_Wofost72_PP", "run_02_Wofost81_NWLP_MLWB_SNOMIN", "run_03_Wofost81_WLP_MLWB"}
+
+    def __init__(self, fixture_dir, crop_dir=None, repeat=3, memory=True, max_per_site=100, max_runs=10):
+        self.fixture_dir = Path(fixture_dir)
+        self.bofek_dir, self.staring_series_dir = make_bofek_fixture(fixture_dir)
+        self.tiles_dir = make_soilgrids_tiles_fixture(fixture_dir)
+        self.soilgrids_response = get_soilgrids_response()
+        self.crop_dir = crop_dir
+        self.repeat = repeat
+        self.memory = memory
+        self.max_per_site = max_per_site
+        self.max_runs = max_runs
+        self.rng = np.random.default_rng(0)
+
+    def get_benchmark_names(self):
+        return [name[len("bench_"):] for name in dir(self) if name.startswith("bench_")]
+
+    def get_skip_reason(self, name, nsites):
+        if name in self.per_site and nsites > self.max_per_site:
+            return f"more than {self.max_per_site} sites (--max-per-site)"
+        if name in self.model_runs:
+            if self.crop_dir is None:
+                return "no crop parameters (--crop-dir)"
+            if nsites > self.max_runs:
+                return f"more than {self.max_runs} runs (--max-runs)"
+        return None
+
+    def measure(self, fn):
+        gc.collect()
+        times = []
+        for i in range(self.repeat):
+            t0 = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t0)
+        peak = None
+        if self.memory:
+            gc.collect()
+            tracemalloc.start()
+            fn()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return min(times), peak
+
+    def run(self, nsites_list, names=None):
+        records = []
+        for name in names or self.get_benchmark_names():
+            for nsites in nsites_list:
+                record = {"benchmark": name, "nsites": nsites, "status": "ok", "time_s": np.nan,
+                          "time_per_site_ms": np.nan, "peak_memory_mb": np.nan, "message": ""}
+                skip_reason = self.get_skip_reason(name, nsites)
+                if skip_reason is not None:
+                    record.update(status="skipped", message=skip_reason)
+                else:
+                    try:
+                        seconds, peak = self.measure(getattr(self, f"bench_{name}")(nsites))
+                        record.update(time_s=seconds, time_per_site_ms=1000. * seconds / nsites)
+                        if peak is not None:
+                            record["peak_memory_mb"] = peak / 1024 ** 2
+                    except Exception as e:
+                        record.update(status="failed", message=str(e).strip().splitlines()[-1])
+                print(f"{name:35s} {nsites:6d} sites: {record['status']:7s} {record['time_s']:10.4f} s "
+                      f"{record['peak_memory_mb']:10.2f} MB {record['message']}")
+                records.append(record)
+        return records
+
+    # Soil data providers
+    def bench_bofek_store_query(self, nsites):
+        store = BOFEK2020DataProvider.get_bofek2020_store(self.bofek_dir)
+        sites = get_sites(nsites)
+        return lambda: store.get_soilcodes(sites[:, 0], sites[:, 1])
+
+    def bench_bofek_raster_query(self, nsites):
+        # Cell reads of the rasterized soil map, with exact polygon tests for the points in boundary cells
+        BOFEK2020DataProvider.get_bofek2020_raster(self.bofek_dir)
+        BOFEK2020DataProvider.get_bofek2020_store(self.bofek_dir)
+        sites = get_sites(nsites)
+        return lambda: BOFEK2020DataProvider.get_soilcodes(sites[:, 0], sites[:, 1], self.bofek_dir, lookup="raster")
+
+    def bench_bofek_soil_yamls(self, nsites):
+        sites = get_sites(nsites)
+        BOFEK2020DataProvider.get_soil_yamls(sites[:1], self.bofek_dir, self.staring_series_dir, RDMCR)
+        return lambda: BOFEK2020DataProvider.get_soil_yamls(sites, self.bofek_dir, self.staring_series_dir, RDMCR)
+
+    def bench_bofek_provider(self, nsites):
+        sites = get_sites(nsites)
+        BOFEK2020DataProvider.get_bofek2020_store(self.bofek_dir)
+        def fn():
+            for lat, lon in sites:
+                BOFEK2020DataProvider(lat, lon, self.bofek_dir, self.staring_series_dir, RDMCR)
+        return fn
+
+    def bench_soilgrids_provider(self, nsites):
+        sites = get_sites(nsites)
+        def fn():
+            for lat, lon in sites:
+                SoilGridsDataProvider(lat, lon, RDMCR, soilgridsdresult=self.soilgrids_response)
+        return fn
+
+    def bench_soilgrids_soil_yamls(self, nsites):
+        sites = get_sites(nsites)
+        responses = [self.soilgrids_response] * nsites
+        return lambda: SoilGridsDataProvider.get_soil_yamls(responses, sites[:, 0], sites[:, 1], RDMCR)
+
+    # Soil parameter cube of nsites cells from local SoilGrids tiles, against SoilGrids providers per site
+    def get_cube_grid(self, nsites):
+        n = int(np.ceil(np.sqrt(nsites)))
+        return np.linspace(51.95, 52.25, n), np.linspace(4.95, 5.45, n)
+
+    def bench_soil_cube_build(self, nsites):
+        lats, lons = self.get_cube_grid(nsites)
+        source = SoilGridsRasterSource(self.tiles_dir)
+        return lambda: SoilParameterCube.build(self.fixture_dir / "soil_cube", source, lats, lons, RDMCR)
+
+    def bench_soilgrids_raster_providers(self, nsites):
+        lats, lons = self.get_cube_grid(nsites)
+        coordinates = np.column_stack([g.ravel() for g in np.meshgrid(lats, lons, indexing="ij")])
+        source = SoilGridsRasterSource(self.tiles_dir)
+        return lambda: source.get_providers(coordinates, RDMCR)
+
+    def bench_soil_cube_read(self, nsites):
+        store_dir = self.fixture_dir / "soil_cube_read"
+        lats, lons = self.get_cube_grid(nsites)
+        SoilParameterCube.build(store_dir, SoilGridsRasterSource(self.tiles_dir), lats, lons, RDMCR)
+        sites = np.column_stack([g.ravel() for g in np.meshgrid(lats, lons, indexing="ij")])
+        def fn():
+            for lat, lon in sites:
+                SoilParameterCube.get_soil_yaml(store_dir, lat, lon)
+        return fn
+
+    # Monte Carlo soil ensemble of one Staring series profile, nsites members
+    def bench_soil_ensemble(self, nsites):
+        lat, lon = get_sites(1)[0]
+        provider = BOFEK2020DataProvider(lat, lon, self.bofek_dir, self.staring_series_dir, RDMCR)
+        ensemble = SoilHydraulicEnsemble.from_bofek2020(provider)
+        return lambda: ensemble.get_soil_yamls(nsites, seed=0)
+
+    # Pedotransfer functions and water retention curves; 5 layers per site, as in SoilGrids
+    def get_layers(self, nsites):
+        nlayers = 5 * nsites
+        return {"C": self.rng.uniform(5., 35., nlayers), "D": self.rng.uniform(1.2, 1.6, nlayers),
+                "S": self.rng.uniform(10., 50., nlayers), "OM": self.rng.uniform(0.5, 5., nlayers),
+                "theta_r": np.full(nlayers, 0.01), "topSoil": self.rng.integers(0, 2, nlayers)}
+
+    def bench_ptf_vectorized(self, nsites):
+        ptf = PedotransferFunctionsWosten()
+        layers = self.get_layers(nsites)
+        return lambda: ptf.calculate_van_genuchten_parameters(**layers)
+
+    def bench_ptf_scalar(self, nsites):
+        ptf = PedotransferFunctionsWosten()
+        layers = pd.DataFrame(self.get_layers(nsites)).to_dict("records")
+        def fn():
+            for layer in layers:
+                ptf.calculate_van_genuchten_parameters(**layer)
+        return fn
+
+    def get_vangenuchten_parameters(self, nsites):
+        return PedotransferFunctionsWosten().calculate_van_genuchten_parameters(**self.get_layers(nsites))
+
+    def bench_vangenuchten_matrix(self, nsites):
+        vg = VanGenuchten()
+        pFs = np.array(SoilGridsDataProvider.pFs)
+        p = self.get_vangenuchten_parameters(nsites)
+        def fn():
+            SM = vg.calculate_soil_moisture_content_matrix(pFs, p["alpha"], p["n"], p["theta_r"], p["theta_s"])
+            CONDfromPF = vg.calculate_log10_hydraulic_conductivity_matrix(pFs, p["alpha"], p["lambda"], p["k_sat"],
+                                                                          p["n"])
+            return vg.make_xy_tables(pFs, SM), vg.make_xy_tables(pFs, CONDfromPF)
+        return fn
+
+    def bench_vangenuchten_scalar(self, nsites):
+        vg = VanGenuchten()
+        pFs = SoilGridsDataProvider.pFs
+        layers = pd.DataFrame(self.get_vangenuchten_parameters(nsites)).to_dict("records")
+        def fn():
+            for p in layers:
+                for pF in pFs:
+                    vg.calculate_soil_moisture_content(pF, p["alpha"], p["n"], p["theta_r"], p["theta_s"])
+                    vg.calculate_log10_hydraulic_conductivity(pF, p["alpha"], p["lambda"], p["k_sat"], p["n"])
+        return fn
+
+    # Table functions; one evaluation per site and day
+    def bench_afgen(self, nsites):
+        util = Util()
+        xs = self.rng.uniform(0., 2., nsites * ndays).tolist()
+        def fn():
+            for x in xs:
+                util.Afgen(x, table_function)
+        return fn
+
+    def bench_afgen_table(self, nsites):
+        table = AfgenTable(table_function)
+        xs = self.rng.uniform(0., 2., nsites * ndays).tolist()
+        def fn():
+            for x in xs:
+                table(x)
+        return fn
+
+    def bench_afgen_table_vectorized(self, nsites):
+        table = AfgenTable(table_function)
+        xs = self.rng.uniform(0., 2., nsites * ndays)
+        return lambda: table(xs)
+
+    # End-to-end runs of the example models; one run per site, in this process
+    def get_runs_fn(self, runs):
+        # Crop parameters and weather are loaded before timing, as in a warm ensemble worker
+        model_name = runs[0]["model"]
+        if model_name not in ensemble_runner.worker_state["crop_data"]:
+            model = ensemble_runner.get_model(model_name)
+            ensemble_runner.worker_state["crop_data"][model_name] = \
+                ensemble_runner.YAMLCropDataProvider(model, fpath=self.crop_dir)
+        ensemble_runner.get_weather_data(runs[0])
+        def fn():
+            for run in runs:
+                result = ensemble_runner.run_simulation(run)
+                if result["status"] != "ok":
+                    raise Exception(result["error"])
+        return fn
+
+    def bench_run_01_Wofost72_PP(self, nsites):
+        input_dir = repo_dir / "input" / "01"
+        runs = [{"run_id": i, "model": "Wofost72_PP", "weather_fp": input_dir / "weather" / "01_weather.csv",
+                 "agro_fp": input_dir / "agro" / "01_agro.yaml", "soil": input_dir / "soil" / "01_soil.yaml",
+                 "site": input_dir / "site" / "01_site.yaml"} for i in range(nsites)]
+        return self.get_runs_fn(runs)
+
+    def bench_run_02_Wofost81_NWLP_MLWB_SNOMIN(self, nsites):
+        input_dir = repo_dir / "input" / "02"
+        runs = []
+        for i, (lat, lon) in enumerate(get_sites(nsites)):
+            soild = SoilGridsDataProvider(lat, lon, 120., soilgridsdresult=self.soilgrids_response).soil_yaml
+            runs.append({"run_id": i, "model": "Wofost81_NWLP_MLWB_SNOMIN",
+                         "weather_fp": input_dir / "weather" / "02_weather.xlsx",
+                         "agro_fp": input_dir / "agro" / "02_agro.yaml", "soil": soild,
+                         "site": {"CO2": 400., "WAV": 10., "NH4I": 5., "NO3I": 25.}})
+        return self.get_runs_fn(runs)
+
+    def bench_run_03_Wofost81_WLP_MLWB(self, nsites):
+        input_dir = repo_dir / "input" / "03"
+        soilds = BOFEK2020DataProvider.get_soil_yamls(get_sites(nsites), self.bofek_dir, self.staring_series_dir,
+                                                      RDMCR)
+        runs = [{"run_id": i, "model": "Wofost81_WLP_MLWB", "weather_fp": input_dir / "weather" / "03_weather.xlsx",
+                 "agro_fp": input_dir / "agro" / "03_agro.yaml", "soil": soild,
+                 "site": {"CO2": 400., "WAV": 10., "NH4I": 100., "NO3I": 100.}} for i, soild in enumerate(soilds)]
+        return self.get_runs_fn(runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks of the wofost-examples hot paths")
+    parser.add_argument("--sites", type=int, nargs="+", default=[1, 100, 10000])
+    parser.add_argument("--benchmarks", nargs="+", default=None, help="names of the benchmarks to run (default: all)")
+    parser.add_argument("--crop-dir", type=Path, default=None,
+                        help="local copy of the WOFOST crop parameters; the model runs are skipped without it")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run for peak memory")
+    parser.add_argument("--max-per-site", type=int, default=100)
+    parser.add_argument("--max-runs", type=int, default=10)
+    parser.add_argument("--output-dir", type=Path, default=repo_dir / "output" / "benchmarks")
+    args = parser.parse_args()
+
+    suite = BenchmarkSuite(args.output_dir / "fixtures", crop_dir=args.crop_dir, repeat=args.repeat,
+                           memory=not args.no_memory, max_per_site=args.max_per_site, max_runs=args.max_runs)
+    records = suite.run(args.sites, args.benchmarks)
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    df = pd.DataFrame(records)
+    df.to_csv(args.output_dir / "benchmarks.csv", index=False)
+    meta = {"date": dt.datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+            "numpy": np.__version__, "platform": platform.platform(), "repeat": args.repeat}
+    with open(args.output_dir / "benchmarks.json", "w") as f:
+        json.dump({"meta": meta, "results": df.replace({np.nan: None}).to_dict("records")}, f, indent=1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Command-line entry point for single runs, ensemble batches and soil data preparation.
+
+    python cli.py run --agro <agro.yaml> --weather <weather.csv|xlsx> --soil <soil.yaml> --site <site.yaml> ...
+    python cli.py batch [--max-workers N]
+    python cli.py prepare-soil bofek|soilgrids|cube ...
+
+Heavy dependencies (pcse, geopandas, pyarrow, matplotlib, ...) are only imported by the subcommand that needs them, so
+that starting the CLI and short runs stay fast.
+"""
+import argparse
+import importlib
+import sys
+from pathlib import Path
+
+def run(args):
+    import yaml
+    from libs import ensemble_runner
+    from libs.output_sink import ParquetOutputSink
+    from libs.profiling import profiler
+
+    if args.crop_dir is not None:
+        model = ensemble_runner.get_model(args.model)
+        ensemble_runner.worker_state["crop_data"][args.model] = \
+            ensemble_runner.YAMLCropDataProvider(model, fpath=args.crop_dir)
+    run = {"run_id": args.run_id, "model": args.model, "agro_fp": args.agro, "site": yaml.safe_load(open(args.site)),
+           "year": args.year, "crop": args.crop, "cultivar": args.cultivar, "lat": args.lat, "lon": args.lon}
+    if args.soil_cube is not None:
+        run["soil_cube"] = args.soil_cube
+    else:
+        run["soil"] = args.soil
+    if args.weather_store is not None:
+        run["weather_store"] = args.weather_store
+    else:
+        run["weather_fp"] = args.weather
+    with profiler.stage("run_simulation"):
+        result = ensemble_runner.run_simulation(run)
+    if result["status"] != "ok":
+        print(f"Run {args.run_id} failed:\n{result['error']}")
+        return 1
+    with profiler.stage("parquet_output"):
+        with ParquetOutputSink(args.output_dir / "parquet", overwrite=True) as sink:
+            sink.add(args.run_id, result["output"], result["summary"])
+    profiler.write_report(args.output_dir / "profile", args.run_id)
+    return 0
+
+def batch(args):
+    # The ensemble is defined in configs/config_04.py
+    ensemble = importlib.import_module("04_RunEnsemble")
+    max_workers = args.max_workers if args.max_workers is not None else ensemble.max_workers
+    ensemble.main(max_workers=max_workers)
+    return 0
+
+def prepare_soil(args):
+    if args.source == "bofek":
+        from configs.config_03 import bofek_dir, staring_series_dir
+        from libs.BOFEK2020DataProvider import BOFEK2020DataProvider
+        bofek_dir = args.bofek_dir or bofek_dir
+        staring_series_dir = args.staring_series_dir or staring_series_dir
+        # Downloads the soil map when needed and compiles the polygon and Staring series stores
+        region = tuple(args.region) if args.region is not None else None
+        BOFEK2020DataProvider.get_bofek2020_store(bofek_dir, region, args.simplify_tolerance)
+        if args.raster:
+            BOFEK2020DataProvider.get_bofek2020_raster(bofek_dir, region, args.simplify_tolerance)
+        BOFEK2020DataProvider.get_staring_series_store(staring_series_dir, args.RDMCR)
+        print(f"BOFEK2020 soil data prepared in {bofek_dir} and {staring_series_dir}")
+    elif args.source == "cube":
+        import numpy as np
+        from libs.soil_cube import SoilParameterCube
+        from libs.soilgrids_raster import SoilGridsRasterSource
+        if args.tiles_dir is None or args.region is None or args.store_dir is None:
+            raise Exception("Error: prepare-soil cube requires --tiles-dir, --region and --store-dir")
+        min_lon, min_lat, max_lon, max_lat = args.region
+        lats = np.arange(min_lat, max_lat + args.grid_step / 2, args.grid_step)
+        lons = np.arange(min_lon, max_lon + args.grid_step / 2, args.grid_step)
+        source = SoilGridsRasterSource(args.tiles_dir)
+        SoilParameterCube.build(args.store_dir, source, lats, lons, args.RDMCR)
+        source.close()
+        print(f"Soil parameter cube of {len(lats)} x {len(lons)} cells written to {args.store_dir}")
+    else:
+        from configs.config_02 import soilgrids_cache_fp
+        from libs.soilgrids_cache import SoilGridsResponseCache
+        from libs.soilgrids_fetcher import SoilGridsBatchFetcher
+        cache = SoilGridsResponseCache(args.cache_fp or soilgrids_cache_fp)
+        coordinates = [tuple(float(v) for v in site.split(",")) for site in args.sites]
+        providers = SoilGridsBatchFetcher(args.RDMCR, cache=cache).get_providers(coordinates)
+        failed = [coordinate for coordinate, provider in zip(coordinates, providers)
+                  if isinstance(provider, Exception)]
+        print(f"SoilGrids data of {len(coordinates) - len(failed)}/{len(coordinates)} sites cached in {cache.db_fp}")
+        if failed:
+            print(f"Failed sites: {failed}")
+            return 1
+    return 0
+
+def get_parser():
+    parser = argparse.ArgumentParser(description="WOFOST examples")
+    parser.add_argument("--profile", action="store_true",
+                        help="write a timing and memory profile of the run stages (or set WOFOST_PROFILE=1)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    p = subparsers.add_parser("run", help="run a single simulation from input files")
+    p.add_argument("--model", default="Wofost72_PP", help="name of a pcse.models class")
+    p.add_argument("--agro", type=Path, required=True, help="agromanagement YAML file")
+    soil = p.add_mutually_exclusive_group(required=True)
+    soil.add_argument("--soil", type=Path, help="soil YAML file")
+    soil.add_argument("--soil-cube", type=Path, help="soil parameter cube (requires --lat and --lon)")
+    p.add_argument("--site", type=Path, required=True,
+                   help="site YAML file; for the WOFOST 8.1 models with CO2, WAV, NH4I and NO3I")
+    weather = p.add_mutually_exclusive_group(required=True)
+    weather.add_argument("--weather", type=Path, help="CSV or Excel weather file")
+    weather.add_argument("--weather-store", type=Path, help="gridded weather store (requires --lat and --lon)")
+    p.add_argument("--lat", type=float)
+    p.add_argument("--lon", type=float)
+    p.add_argument("--year", type=int, default=None, help="shift the agromanagement to this year")
+    p.add_argument("--crop", default=None)
+    p.add_argument("--cultivar", default=None)
+    p.add_argument("--crop-dir", type=Path, default=None, help="local copy of the WOFOST crop parameters")
+    p.add_argument("--run-id", default="run")
+    p.add_argument("--output-dir", type=Path, default=Path.cwd() / "output" / "cli")
+    p.set_defaults(func=run)
+
+    p = subparsers.add_parser("batch", help="run the ensemble of configs/config_04.py")
+    p.add_argument("--max-workers", type=int, default=None)
+    p.set_defaults(func=batch)
+
+    p = subparsers.add_parser("prepare-soil", help="download and compile soil data ahead of runs")
+    p.add_argument("source", choices=["bofek", "soilgrids", "cube"])
+    p.add_argument("--RDMCR", type=float, default=125.)
+    p.add_argument("--bofek-dir", type=Path, default=None)
+    p.add_argument("--staring-series-dir", type=Path, default=None)
+    p.add_argument("--region", type=float, nargs=4, default=None, metavar=("MIN_LON", "MIN_LAT", "MAX_LON", "MAX_LAT"),
+                   help="only compile the BOFEK2020 polygons within this bounding box; the extent of the cube")
+    p.add_argument("--simplify-tolerance", type=float, default=None, help="simplify the BOFEK2020 polygons (m)")
+    p.add_argument("--raster", action="store_true", help="also rasterize the BOFEK2020 soil map for raster lookups")
+    p.add_argument("--sites", nargs="+", default=[], metavar="LAT,LON", help="sites to fetch SoilGrids data for")
+    p.add_argument("--cache-fp", type=Path, default=None, help="SoilGrids response cache (SQLite)")
+    p.add_argument("--tiles-dir", type=Path, default=None, help="local SoilGrids tiles for the cube")
+    p.add_argument("--grid-step", type=float, default=0.0025, help="cell size of the cube (degrees)")
+    p.add_argument("--store-dir", type=Path, default=None, help="directory of the cube")
+    p.set_defaults(func=prepare_soil)
+    return parser
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    if args.command == "run" and (args.weather_store is not None or args.soil_cube is not None) and \
+            (args.lat is None or args.lon is None):
+        raise Exception("Error: --weather-store and --soil-cube require --lat and --lon")
+    if args.profile:
+        from libs.profiling import profiler
+        profiler.enable()
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -17,4 +17,11 @@ soil_fp = soil_dir / "01_soil.yaml"
 weather_dir = input_dir / "weather"
 weather_fp = weather_dir / "01_weather.csv"
 output_fp = output_dir / "output.xlsx"
-fig_fp = output_dir / "timeplots.jpeg"
\ No newline at end of file
+fig_fp = output_dir / "timeplots.jpeg"
+parquet_dir = output_dir / "parquet"
+profile_dir = output_dir / "profile"
+
+# Optional post-processing
+write_excel = True
+make_figure = True
+fig_dpi = 600
\ No newline at end of file
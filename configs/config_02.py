@@ -12,8 +12,17 @@ agro_dir = input_dir / "agro"
 agro_fp = agro_dir / "02_agro.yaml"
 weather_dir = input_dir / "weather"
 weather_fp = weather_dir / "02_weather.xlsx"
+soilgrids_cache_fp = input_dir / "soilgrids_cache.sqlite"
+soil_profile_cache_dir = input_dir / "soil_profile_cache"
 output_fp = output_dir / "output.xlsx"
 fig_fp = output_dir / "timeplots.jpeg"
+parquet_dir = output_dir / "parquet"
+profile_dir = output_dir / "profile"
+
+# Optional post-processing
+write_excel = True
+make_figure = True
+fig_dpi = 600
 
 CO2 = 400.
 NH4I = 5.
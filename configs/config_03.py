@@ -20,6 +20,13 @@ weather_fp = weather_dir / "03_weather.xlsx"
 output_dir = cwd / "output" / "03"
 output_fp = output_dir / "output.xlsx"
 fig_fp = output_dir / "timeplots.jpeg"
+parquet_dir = output_dir / "parquet"
+profile_dir = output_dir / "profile"
+
+# Optional post-processing
+write_excel = True
+make_figure = True
+fig_dpi = 600
 
 
 bofek_dir = input_dir / "BOFEK2020"
@@ -30,4 +37,5 @@ profile_info_fp = staring_series_dir / "profile_info.csv"
 staring_series_fp = staring_series_dir / "StaringReeksPARS_2018.csv"
 all_profiles_fp = staring_series_dir / "AllProfiles_368.csv"
 soilcode_fp = staring_series_dir / "BodemCode.csv"
+soil_profile_cache_dir = input_dir / "soil_profile_cache"
 
@@ -0,0 +1,30 @@
+from pathlib import Path
+
+# Ensemble of sites x years x cultivars, with soils from BOFEK2020
+model = "Wofost81_WLP_MLWB"
+crop = "wheat"
+cultivars = ["Winter_wheat_101", "Winter_wheat_102"]
+years = [2013, 2014]
+sites = [(52.01, 5.3), (52.05, 5.4), (51.95, 5.6)]
+RDMCR = 125.
+CO2 = 400.
+WAV = 10.
+NH4I = 100.
+NO3I = 100.
+max_workers = None
+
+# Set paths
+cwd = Path.cwd()
+input_dir = cwd / "input" / "03"
+agro_dir = input_dir / "agro"
+agro_fp = agro_dir / "03_agro.yaml"
+weather_dir = input_dir / "weather"
+weather_fp = weather_dir / "03_weather.xlsx"
+bofek_dir = input_dir / "BOFEK2020"
+staring_series_dir = input_dir / "StaringSeries"
+output_dir = cwd / "output" / "04"
+output_fp = output_dir / "summary.xlsx"
+parquet_dir = output_dir / "parquet"
+
+# Optional post-processing
+write_excel = True
@@ -0,0 +1,42 @@
+from pathlib import Path
+
+# Regional run over a grid of fields with soils from BOFEK2020; every unique (iProfile, weather cell,
+# agromanagement) combination is simulated only once
+model = "Wofost81_WLP_MLWB"
+crop = "wheat"
+cultivar = "Winter_wheat_102"
+year = None
+RDMCR = 125.
+CO2 = 400.
+WAV = 10.
+NH4I = 100.
+NO3I = 100.
+max_workers = None
+
+# Fields: a vector file with field polygons or points (read with geopandas), or else a regular grid of points
+fields_fp = None
+lat_min, lat_max = 51.95, 52.05
+lon_min, lon_max = 5.2, 5.4
+grid_step = 0.005
+
+# Only the soil map polygons within this (min_lon, min_lat, max_lon, max_lat) box are read (None: the whole map);
+# fields outside it are treated as outside the soil map. The polygons can be simplified within a tolerance (m).
+region = (lon_min - 0.01, lat_min - 0.01, lon_max + 0.01, lat_max + 0.01) if fields_fp is None else None
+simplify_tolerance = None
+# Soil code lookup: "polygon" (spatial index of the polygons) or "raster" (25 m grid, faster for many fields)
+lookup = "polygon"
+
+# Set paths
+cwd = Path.cwd()
+input_dir = cwd / "input" / "03"
+agro_fp = input_dir / "agro" / "03_agro.yaml"
+weather_fp = input_dir / "weather" / "03_weather.xlsx"
+weather_store = None
+bofek_dir = input_dir / "BOFEK2020"
+staring_series_dir = input_dir / "StaringSeries"
+output_dir = cwd / "output" / "05"
+output_fp = output_dir / "summary.xlsx"
+parquet_dir = output_dir / "parquet"
+
+# Optional post-processing
+write_excel = True
@@ -0,0 +1,45 @@
+from pathlib import Path
+
+# Monte Carlo ensemble of the BOFEK2020 soil profile at a site: the Van Genuchten parameters of its layers are
+# sampled nmembers times and the output is reduced to percentiles across the members
+model = "Wofost81_WLP_MLWB"
+crop = "wheat"
+cultivar = "Winter_wheat_102"
+year = None
+lat = 52.01
+lon = 5.3
+RDMCR = 125.
+CO2 = 400.
+WAV = 10.
+NH4I = 100.
+NO3I = 100.
+max_workers = None
+
+# Ensemble
+nmembers = 200
+seed = 0
+# Standard deviations of the parameter noise (None: the defaults of SoilHydraulicEnsemble); Alpha, Npar - 1 and
+# Ksfit in log units, Lambda, WCr and WCs in their own units
+sds = None
+percentiles = [5, 25, 50, 75, 95]
+# Streaming estimates of the percentiles (memory independent of nmembers), or exact ones that keep every value
+exact_percentiles = False
+daily_vars = ["LAI", "TAGP", "WSO", "WWLOW", "RFTRA"]
+summary_vars = ["TAGP", "TWSO", "LAIMAX"]
+
+# Set paths
+cwd = Path.cwd()
+input_dir = cwd / "input" / "03"
+agro_fp = input_dir / "agro" / "03_agro.yaml"
+weather_fp = input_dir / "weather" / "03_weather.xlsx"
+bofek_dir = input_dir / "BOFEK2020"
+staring_series_dir = input_dir / "StaringSeries"
+output_dir = cwd / "output" / "06"
+daily_fp = output_dir / "daily_percentiles.xlsx"
+summary_fp = output_dir / "summary_percentiles.xlsx"
+fig_fp = output_dir / "timeplots.jpeg"
+
+# Optional post-processing
+write_excel = True
+make_figure = True
+fig_dpi = 600
@@ -1,197 +1,311 @@
-from types import SimpleNamespace
-from libs.util import Util
-from libs.water_retention_curves import VanGenuchten
-from geopandas import gpd
 from pathlib import Path
-import inspect
-import io
+import hashlib
+import os
+from libs.bofek2020_store import BOFEK2020PolygonStore
+from libs.downloads import download_file, file_lock
+from libs.profiling import profiler
+from libs.soil_profile_cache import SoilProfileCache
+from libs.staring_series_store import StaringSeriesStore
 import numpy as np
-import pandas as pd
-from shapely import Point
-import py7zr
-import requests
-import yaml
-import zipfile
+import sys
 
 class BOFEK2020DataProvider():
     url_bofek2020 = "https://www.wur.nl/nl/show/bofek-2020-gis-1.htm"
+    # SHA-256 of the downloaded archive; when set, a download that does not match it is discarded
+    sha256_bofek2020 = None
+    bofek_members = "bod_clusters."
     PFFieldCapacity = 2.0
     PFWiltingPoint = 4.2
     pFs = [-1.0, 1.0, 1.3, 1.7, 2.0, 2.3, 2.4, 2.7, 3.0, 3.3, 3.7, 4.0, 4.2, 6.0]
     SurfaceConductivity = 70.
+    bofek_stores = {}
+    bofek_rasters = {}
+    raster_resolution = 25.
+    staring_series_stores = {}
+    layers = None
 
-    def __init__(self, lat, lon, bofek_dir, staring_series_dir, RDMCR):
+    def __init__(self, lat, lon, bofek_dir, staring_series_dir, RDMCR, soilcode=None, profile_cache=None, region=None,
+                 simplify_tolerance=None, lookup="polygon"):
         self.lat = lat
         self.lon = lon
         self.RDMCR = RDMCR
         self.bofek_dir = bofek_dir
+        self.region = region
+        self.simplify_tolerance = simplify_tolerance
+        self.lookup = lookup
         self.staring_series_dir = staring_series_dir
-        self.bofek_zip2_fp = bofek_dir / "BOFEK2020_GIS.7z"
-        self.bofek_shape_fp = bofek_dir / "GIS" / "shp_files" / "bod_clusters.shp"
-        self.all_profiles_fp = staring_series_dir / "AllProfiles_368.csv"
-        self.soilcode_fp = self.staring_series_dir / "BodemCode.csv"
-        self.staring_series_fp = self.staring_series_dir / "StaringReeksPARS_2018.csv"
-
-        self.gdf_bofek = self.get_bofek2020_data()
-        self.soilcode = self.get_soilcode()
-        self.soilid = self.get_soilid()
-        self.df_staring_blocks = self.get_staring_blocks_profile()
-        self.df_vangenuchten = self.get_vangenuchten_profile()
-        self.df_vangenuchten = self.get_van_genuchten_water_retention_curves()
-        self.soil_yaml = self.get_soil_yaml()
-
-    def get_bofek2020_data(self):
-        if self.bofek_shape_fp.exists():
-            pass
-        else:
-            response = requests.get(self.url_bofek2020)
-            content = response.content
-            response.close()
-            z = zipfile.ZipFile(io.BytesIO(content))
-            z.extractall(self.bofek_dir)
-            z.close()
-            s = py7zr.SevenZipFile(self.bofek_zip2_fp, 'r')
-            s.extractall(self.bofek_dir)
-            s.close()
-        gdf_bofek = gpd.read_file(self.bofek_shape_fp)
-        gdf_bofek = gdf_bofek.to_crs("EPSG:4326")
+
+        # With a SoilProfileCache, a site seen before skips the soil map lookup (its soil code is cached under its
+        # lat/lon) and a soil code seen before skips the profile computation; only soilcode and soil_yaml are set then
+        latlon_key = None
+        if profile_cache is not None and soilcode is None:
+            latlon_key = self.get_profile_key(profile_cache, lat=lat, lon=lon)
+            soilcode = profile_cache.get(latlon_key)
+        if soilcode is None:
+            soilcode = self.get_soilcode()
+            if latlon_key is not None:
+                profile_cache.put(latlon_key, soilcode)
+        self.soilcode = soilcode
+        if profile_cache is not None:
+            soilcode_key = self.get_profile_key(profile_cache, soilcode=soilcode)
+            self.soil_yaml = profile_cache.get(soilcode_key)
+            if self.soil_yaml is not None:
+                return
+        # The profile is taken from the precompiled Staring series store, as in get_soil_yamls
+        staring_series_store = self.get_staring_series_store(staring_series_dir, RDMCR)
+        self.soilid = staring_series_store.get_soilid(soilcode)
+        self.layers = staring_series_store.get_layers(soilid=self.soilid)
+        self.soil_yaml = staring_series_store.get_soil_profile(soilid=self.soilid)
+        if profile_cache is not None:
+            profile_cache.put(soilcode_key, self.soil_yaml)
+
+    def get_profile_key(self, profile_cache, soilcode=None, lat=None, lon=None):
+        shape_fp = self.bofek_dir / "GIS" / "shp_files" / "bod_clusters.shp"
+        version = [profile_cache.get_file_version(fp) for fp in [shape_fp, shape_fp.with_suffix(".dbf")]]
+        version.extend(StaringSeriesStore.get_source_version(self.staring_series_dir))
+        # Simplified polygons can give other soil codes near their boundaries
+        version.append(self.get_bofek2020_store_fp(self.bofek_dir, self.region, self.simplify_tolerance).name)
+        return profile_cache.get_key("BOFEK2020", version, self.RDMCR, self.pFs, soilcode=soilcode, lat=lat, lon=lon)
+
+    @classmethod
+    @profiler.profiled()
+    def get_soil_yamls(cls, points, bofek_dir, staring_series_dir, RDMCR, region=None, simplify_tolerance=None,
+                       lookup="polygon"):
+        """Returns one soil YAML dict per point (None for points outside the soil map or the region).
+
+        points is either a sequence/array of (lat, lon) pairs or a GeoDataFrame (see get_latlons). All soil codes
+        are resolved with one bulk query of the spatial index and the soil profiles are taken from the precompiled
+        Staring series store; points that map onto the same iProfile share the same soil YAML dict.
+        """
+        soilids = cls.get_soilids(points, bofek_dir, staring_series_dir, RDMCR, region, simplify_tolerance, lookup)
+        staring_series_store = cls.get_staring_series_store(staring_series_dir, RDMCR)
+        soil_yamls_per_soilid = {}
+        soil_yamls = []
+        for soilid in soilids:
+            if soilid is None:
+                soil_yamls.append(None)
+                continue
+            if soilid not in soil_yamls_per_soilid:
+                soil_yamls_per_soilid[soilid] = staring_series_store.get_soil_profile(soilid=soilid)
+            soil_yamls.append(soil_yamls_per_soilid[soilid])
+        return soil_yamls
+
+    @classmethod
+    @profiler.profiled()
+    def get_soilids(cls, points, bofek_dir, staring_series_dir, RDMCR, region=None, simplify_tolerance=None,
+                    lookup="polygon"):
+        """Returns the iProfile of every point (None for points outside the soil map or the region), with one bulk
+        query."""
+        lats, lons = cls.get_latlons(points)
+        soilcodes = cls.get_soilcodes(lats, lons, bofek_dir, region, simplify_tolerance, lookup)
+        staring_series_store = cls.get_staring_series_store(staring_series_dir, RDMCR)
+        soilids = [staring_series_store.get_soilid(soilcode) if soilcode is not None else None
+                   for soilcode in soilcodes]
+        return soilids
+
+    @classmethod
+    @profiler.profiled()
+    def get_soilcodes(cls, lats, lons, bofek_dir, region=None, simplify_tolerance=None, lookup="polygon"):
+        """Returns the soil code of every point (None outside the soil map). lookup "polygon" queries the polygon
+        store; lookup "raster" reads the cells of the rasterized soil map and only tests the points in cells on a
+        polygon boundary against the polygons."""
+        if lookup == "polygon":
+            return cls.get_bofek2020_store(bofek_dir, region, simplify_tolerance).get_soilcodes(lats, lons)
+        if lookup != "raster":
+            raise Exception(f"Error: unknown BOFEK2020 lookup {lookup}, should be polygon or raster")
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        raster = cls.get_bofek2020_raster(bofek_dir, region, simplify_tolerance)
+        soilcodes, on_boundary = raster.get_soilcodes(lats, lons)
+        if on_boundary.any():
+            store = cls.get_bofek2020_store(bofek_dir, region, simplify_tolerance)
+            soilcodes[on_boundary] = store.get_soilcodes(lats[on_boundary], lons[on_boundary])
+        return soilcodes
+
+    @classmethod
+    def get_latlons(cls, points):
+        """Returns the lats and lons of points: a sequence/array of (lat, lon) pairs or a GeoDataFrame. Polygons of a
+        GeoDataFrame are represented by a point that is guaranteed to lie within the polygon."""
+        # geopandas is only imported when the soil map has to be read; points can only be a GeoDataFrame when the caller
+        # has imported it
+        gpd = sys.modules.get("geopandas")
+        if gpd is not None and isinstance(points, gpd.GeoDataFrame):
+            geometry = points.geometry
+            if not (geometry.geom_type == "Point").all():
+                geometry = geometry.representative_point()
+            geometry = geometry.to_crs(BOFEK2020PolygonStore.crs)
+            return geometry.y.to_numpy(), geometry.x.to_numpy()
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        return points[:, 0], points[:, 1]
+
+    @classmethod
+    @profiler.profiled()
+    def get_staring_series_store(cls, staring_series_dir, RDMCR):
+        # All Staring series profiles are compiled once per RDMCR, pF grid and version of the Staring series tables, and
+        # shared within a process
+        store_fp = staring_series_dir / f"StaringSeries_RDMCR{RDMCR:g}.npz"
+        key = str(store_fp)
+        if key not in cls.staring_series_stores:
+            store = None
+            if store_fp.exists():
+                store = StaringSeriesStore(store_fp)
+                if store.RDMCR != RDMCR or not np.array_equal(store.pFs, cls.pFs) or \
+                        store.source_version != StaringSeriesStore.get_source_version(staring_series_dir):
+                    store = None
+            if store is None:
+                store = StaringSeriesStore.compile(staring_series_dir, RDMCR, cls.pFs, cls.PFWiltingPoint,
+                                                   cls.PFFieldCapacity, cls.SurfaceConductivity, store_fp)
+            cls.staring_series_stores[key] = store
+        return cls.staring_series_stores[key]
+
+    @classmethod
+    @profiler.profiled()
+    def get_bofek2020_data(cls, bofek_dir, region=None, simplify_tolerance=None, crs="EPSG:4326"):
+        """Reads the BODEMCODE column and the polygons of the soil map, reprojected to crs.
+
+        region limits the read to the polygons that intersect a (min_lon, min_lat, max_lon, max_lat) bounding box or a
+        shapely geometry in EPSG:4326; the filter is applied by the reader, so the rest of the map is never loaded.
+        simplify_tolerance (m) simplifies the polygons in their native RD New coordinates.
+        """
+        import geopandas as gpd
+        import shapely
+        bofek_shape_fp = bofek_dir / "GIS" / "shp_files" / "bod_clusters.shp"
+        if not bofek_shape_fp.exists():
+            # Only one process downloads; the others wait for the lock and then find the extracted shapefile
+            with file_lock(bofek_dir / "BOFEK2020.lock"):
+                if not bofek_shape_fp.exists():
+                    cls.download_bofek2020(bofek_dir)
+        with profiler.stage("read_file"):
+            kwargs = {}
+            if isinstance(region, shapely.Geometry):
+                kwargs["mask"] = gpd.GeoSeries([region], crs=BOFEK2020PolygonStore.crs)
+            elif region is not None:
+                kwargs["bbox"] = gpd.GeoSeries([shapely.box(*region)], crs=BOFEK2020PolygonStore.crs)
+            gdf_bofek = gpd.read_file(bofek_shape_fp, columns=["BODEMCODE"], **kwargs)
+        if simplify_tolerance is not None:
+            with profiler.stage("simplify"):
+                gdf_bofek["geometry"] = gdf_bofek.geometry.simplify(simplify_tolerance)
+        with profiler.stage("to_crs"):
+            gdf_bofek = gdf_bofek.to_crs(crs)
         return gdf_bofek
-    def get_soilcode(self):
-        min_lat = self.lat - 0.001
-        max_lat = self.lat + 0.001
-        min_lon = self.lon - 0.001
-        max_lon = self.lon + 0.001
-        gdf_bofek = self.gdf_bofek
-        gdf_bofek = gdf_bofek.clip([min_lon, min_lat, max_lon, max_lat])
-
-        cond = gdf_bofek.contains(Point(self.lon, self.lat))
-        soilcode = gdf_bofek[cond].BODEMCODE.iloc[0]
-        return soilcode
 
-    def get_soilid(self):
-        df_soilcode = pd.read_csv(self.soilcode_fp)
-        cond = df_soilcode.BodemCode == self.soilcode
-        soilid = df_soilcode[cond].iProfile.iloc[0]
-        return soilid
-
-    def get_staring_blocks_profile(self):
-        df_profiles = pd.read_csv(self.all_profiles_fp)
-        df_profile = df_profiles[df_profiles.iProfile == self.soilid]
-        df_profile = df_profile.replace(99999, np.nan)
-        df_profile = df_profile.replace(0, np.nan)
-        df_profile = df_profile.dropna(axis=1)
-        nlayer = int(df_profile.columns[-1][-1])
-        soil_profile = SimpleNamespace(iProfile=[], layerid=[], minimum_depth=[], maximum_depth=[], thickness=[],
-                                       isoil=[], staring_block=[])
-        minimum_depth = 0
-        for layerid in range(1, nlayer + 1):
-            maximum_depth = df_profile[f"iZ{layerid}"].iloc[0]
-            thickness = maximum_depth - minimum_depth
-            isoil = df_profile[f"iSoil{layerid}"].iloc[0]
-            staring_block = self.get_staring_block(isoil)
-            soil_profile.iProfile.append(self.soilid)
-            soil_profile.layerid.append(layerid)
-            soil_profile.minimum_depth.append(minimum_depth)
-            soil_profile.maximum_depth.append(maximum_depth)
-            soil_profile.thickness.append(thickness)
-            soil_profile.isoil.append(isoil)
-            soil_profile.staring_block.append(staring_block)
-            minimum_depth = maximum_depth
-
-        if maximum_depth < self.RDMCR:
-            maximum_depth = self.RDMCR
-            thickness = maximum_depth - minimum_depth
-            isoil = df_profile[f"iSoil{layerid}"].iloc[0]
-            soil_profile.iProfile.append(self.soilid)
-            soil_profile.layerid.append(layerid)
-            soil_profile.minimum_depth.append(minimum_depth)
-            soil_profile.maximum_depth.append(maximum_depth)
-            soil_profile.thickness.append(thickness)
-            soil_profile.isoil.append(isoil)
-            soil_profile.staring_block.append(staring_block)
-
-        df_staring_blocks = pd.DataFrame.from_dict(vars(soil_profile))
-        return df_staring_blocks
-
-    def get_staring_block(self,isoil):
-        ntopsoils = 18
-        if isoil <= ntopsoils:
-            staring_block = f"B{str(isoil).zfill(1)}"
-        else:
-            staring_block = f"O{str(isoil - ntopsoils).zfill(1)}"
-        return staring_block
-
-    def get_vangenuchten_profile(self):
-        df_vgn_profiles = pd.read_csv(self.staring_series_fp)
-        df_vgn_profile = pd.merge(how='left',
-                                  left=self.df_staring_blocks,
-                                  right=df_vgn_profiles,
-                                  left_on=["staring_block"],
-                                  right_on=["Name"])
-        return df_vgn_profile
-
-    def get_van_genuchten_water_retention_curves(self):
-        vgn = VanGenuchten()
-        df = self.df_vangenuchten
-        CONDfromPF_perlayer = []
-        SMfromPF_perlayer = []
-        for i in range(len(df)):
-            CONDfromPF = []
-            SMfromPF = []
-            for j, pF in enumerate(self.pFs):
-                r = vgn.calculate_soil_moisture_content(pF, df.Alpha.iloc[i], df.Npar.iloc[i], df.WCr.iloc[i],
-                                                        df.WCs.iloc[i])
-                SMfromPF.extend([pF, float(r)])
-                r = vgn.calculate_log10_hydraulic_conductivity(pF, df.Alpha.iloc[i], df.Lambda.iloc[i],
-                                                               df.Ksfit.iloc[i], df.Npar.iloc[i])
-                CONDfromPF.extend([pF, float(r)])
-            CONDfromPF_perlayer.append(CONDfromPF)
-            SMfromPF_perlayer.append(SMfromPF)
-        df["CONDfromPF"] = CONDfromPF_perlayer
-        df["SMfromPF"] = SMfromPF_perlayer
-        return df
-
-    def get_soil_yaml(self):
-        # below we generate the header of the soil input file as YAML input structure
-        soil_input_yaml = f"""
-            RDMSOL: {self.df_vangenuchten.thickness.sum()}
-            SoilProfileDescription:
-                PFWiltingPoint: {self.PFWiltingPoint}
-                PFFieldCapacity: {self.PFFieldCapacity}
-                SurfaceConductivity: {self.SurfaceConductivity}
-                GroundWater: false
-                SoilLayers:
-            """
-
-        # Here we generate the properties for each soil layer including layer thickness, hydraulic properties,
-        # organic matter content, etc.
-        nlayers = len(self.df_vangenuchten.thickness)
-        ut = Util()
-        for i in range(nlayers):
-            s = f"""    - Thickness: {self.df_vangenuchten.thickness.iloc[i]}
-                  CNRatioSOMI: {20.0}
-                  CRAIRC: {0.01}
-                  FSOMI: {0.03}
-                  RHOD: {1.0}
-                  Soil_pH: {5.}                              
-                  SMfromPF: {self.df_vangenuchten.SMfromPF.iloc[i]}
-                  CONDfromPF: {self.df_vangenuchten.CONDfromPF.iloc[i]}                  
-            """
-            soil_input_yaml += s
-
-        # A SubSoilType needs to be defined. In this case we make the subsoil equal to the properties
-        # of the deepest soil layer.
-        soil_input_yaml += \
-            f"""    SubSoilType:
-                  Thickness: {self.df_vangenuchten.thickness.iloc[-1]}
-                  CNRatioSOMI: {20.0}
-                  CRAIRC: {0.01}
-                  FSOMI: {0.03}
-                  RHOD: {1.0}
-                  Soil_pH: {5.}                                      
-                  SMfromPF: {self.df_vangenuchten.SMfromPF[len(self.df_vangenuchten.SMfromPF) - 1]}
-                  CONDfromPF: {self.df_vangenuchten.CONDfromPF[len(self.df_vangenuchten.CONDfromPF) - 1]}                   
-            """
-        soil_yaml = yaml.safe_load(soil_input_yaml)
-        return soil_yaml
+    @classmethod
+    @profiler.profiled()
+    def download_bofek2020(cls, bofek_dir):
+        """Streams the BOFEK2020 archive to disk (resuming an interrupted download) and extracts only the
+        bod_clusters.* files of the soil map from the inner BOFEK2020_GIS.7z."""
+        import py7zr
+        import shutil
+        import zipfile
+        bofek_dir.mkdir(parents=True, exist_ok=True)
+        bofek_zip_fp = bofek_dir / "BOFEK2020_GIS.zip"
+        bofek_zip2_fp = bofek_dir / "BOFEK2020_GIS.7z"
+        with profiler.stage("download"):
+            if not bofek_zip2_fp.exists() and not bofek_zip_fp.exists():
+                download_file(cls.url_bofek2020, bofek_zip_fp, sha256=cls.sha256_bofek2020)
+        with profiler.stage("extract"):
+            if not bofek_zip2_fp.exists():
+                with zipfile.ZipFile(bofek_zip_fp) as z:
+                    names = [name for name in z.namelist() if Path(name).name == bofek_zip2_fp.name]
+                    if not names:
+                        raise Exception(f"Error: {bofek_zip_fp} does not contain {bofek_zip2_fp.name}")
+                    tmp_fp = bofek_zip2_fp.with_name(bofek_zip2_fp.name + ".part")
+                    with z.open(names[0]) as src, open(tmp_fp, "wb") as dst:
+                        shutil.copyfileobj(src, dst, 1 << 20)
+                os.replace(tmp_fp, bofek_zip2_fp)
+            tmp_dir = bofek_dir / f"extract.tmp{os.getpid()}"
+            with py7zr.SevenZipFile(bofek_zip2_fp, "r") as s:
+                targets = [name for name in s.getnames() if Path(name).name.startswith(cls.bofek_members)]
+                if not targets:
+                    raise Exception(f"Error: {bofek_zip2_fp} does not contain the {cls.bofek_members}* files")
+                s.extract(path=tmp_dir, targets=targets)
+            # The .shp file is moved last, as its presence marks a complete extraction
+            for name in sorted(targets, key=lambda name: name.endswith(".shp")):
+                fp = bofek_dir / "GIS" / "shp_files" / Path(name).name
+                fp.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp_dir / name, fp)
+            shutil.rmtree(tmp_dir)
+
+    @staticmethod
+    def get_bofek2020_store_fp(bofek_dir, region=None, simplify_tolerance=None, name="bod_clusters_EPSG4326.npz"):
+        name = Path(name)
+        if region is None and simplify_tolerance is None:
+            return bofek_dir / name
+        # Every region and tolerance gets its own store file
+        if region is not None and not isinstance(region, tuple | list):
+            region = region.wkb_hex
+        elif region is not None:
+            region = [round(float(v), 6) for v in region]
+        digest = hashlib.sha256(repr((region, simplify_tolerance)).encode()).hexdigest()[:12]
+        return bofek_dir / f"{name.stem}_{digest}{name.suffix}"
+
+    @staticmethod
+    def get_bofek2020_source_version(bofek_dir):
+        """Returns the version (size and mtime) of the bod_clusters shapefile, or None when it has not been
+        downloaded."""
+        bofek_shape_fp = bofek_dir / "GIS" / "shp_files" / "bod_clusters.shp"
+        if not bofek_shape_fp.exists():
+            return None
+        return [SoilProfileCache.get_file_version(bofek_shape_fp.with_suffix(suffix))
+                for suffix in [".shp", ".shx", ".dbf", ".prj"]]
+
+    @classmethod
+    def is_bofek2020_store_stale(cls, store, bofek_dir):
+        # A store built from another version of the shapefile is rebuilt; without a shapefile, an existing store is
+        # used as it is
+        source_version = cls.get_bofek2020_source_version(bofek_dir)
+        return source_version is not None and store.source_version != source_version
 
+    @classmethod
+    @profiler.profiled()
+    def get_bofek2020_store(cls, bofek_dir, region=None, simplify_tolerance=None):
+        # The reprojected polygons and their index are built once per version of the shapefile, written to disk and
+        # shared read-only by all instances within a process
+        bofek_store_fp = cls.get_bofek2020_store_fp(bofek_dir, region, simplify_tolerance)
+        key = str(bofek_store_fp)
+        if key not in cls.bofek_stores:
+            store = None
+            if bofek_store_fp.exists():
+                store = BOFEK2020PolygonStore(bofek_store_fp)
+                if cls.is_bofek2020_store_stale(store, bofek_dir):
+                    store = None
+            if store is None:
+                gdf_bofek = cls.get_bofek2020_data(bofek_dir, region, simplify_tolerance)
+                store = BOFEK2020PolygonStore.build(gdf_bofek, bofek_store_fp,
+                                                    cls.get_bofek2020_source_version(bofek_dir))
+            cls.bofek_stores[key] = store
+        return cls.bofek_stores[key]
+
+    @classmethod
+    @profiler.profiled()
+    def get_bofek2020_raster(cls, bofek_dir, region=None, simplify_tolerance=None):
+        # The rasterized soil map is built from the same polygons as the polygon store (and rebuilt for another version
+        # of the shapefile) and memory-mapped; it is shared read-only by all instances within a process
+        from libs.bofek2020_raster import BOFEK2020RasterStore
+        raster_fp = cls.get_bofek2020_store_fp(bofek_dir, region, simplify_tolerance,
+                                               name=f"bod_clusters_RD{cls.raster_resolution:g}m.npy")
+        key = str(raster_fp)
+        if key not in cls.bofek_rasters:
+            raster = None
+            if raster_fp.exists() and raster_fp.with_suffix(".json").exists():
+                raster = BOFEK2020RasterStore(raster_fp)
+                if cls.is_bofek2020_store_stale(raster, bofek_dir):
+                    raster = None
+            if raster is None:
+                gdf_bofek = cls.get_bofek2020_data(bofek_dir, region, simplify_tolerance, crs=BOFEK2020RasterStore.crs)
+                with profiler.stage("rasterize"):
+                    raster = BOFEK2020RasterStore.build(gdf_bofek, raster_fp, cls.raster_resolution,
+                                                        cls.get_bofek2020_source_version(bofek_dir))
+            cls.bofek_rasters[key] = raster
+        return cls.bofek_rasters[key]
+
+    @profiler.profiled()
+    def get_soilcode(self):
+        if self.lookup == "polygon":
+            self.bofek_store = self.get_bofek2020_store(self.bofek_dir, self.region, self.simplify_tolerance)
+            return self.bofek_store.get_soilcode(self.lat, self.lon)
+        soilcode = self.get_soilcodes([self.lat], [self.lon], self.bofek_dir, self.region, self.simplify_tolerance,
+                                      self.lookup)[0]
+        if soilcode is None:
+            raise Exception(f"Error: no BOFEK2020 polygon found at lat={self.lat}, lon={self.lon}")
+        return soilcode
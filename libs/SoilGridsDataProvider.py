@@ -1,22 +1,22 @@
-import pandas as pd
-import requests
-import sqlalchemy as sa
+import numpy as np
 import time
-from pcse.input import WOFOST81SiteDataProvider_SNOMIN, YAMLCropDataProvider, CSVWeatherDataProvider
 from libs.pedotransferfunctions import PedotransferFunctionsWosten
+from libs.profiling import profiler
+from libs.soil_profile_builder import SoilProfileBuilder
 from libs.water_retention_curves import VanGenuchten
-from types import SimpleNamespace
-from libs.util import Util
-import yaml
 
 pct_to_frac = 0.01
 pml_to_pct = 0.1
 
 class SoilGridsDataProvider():
-    vgnd = None
+    """Soil profile for a site from SoilGrids data.
+
+    The SoilGrids properties of all layers, the derived properties, the Van Genuchten parameters and the water retention
+    and conductivity curves are carried through the pipeline in one NumPy structured array (the layer table, see
+    get_layer_table). Every step works on layer tables of any shape, so get_soil_yamls processes many profiles at once.
+    """
     soilgridsdresult = None
-    soild = None
-    vgnd = None
+    layers = None
     request_url = "https://rest.isric.org/soilgrids/v2.0/properties/query"
     soilgrids_vars = ["bdod", "clay", "phh2o", "sand", "silt", "soc", "nitrogen"]
     soilgrids_soillayers = ['0-5cm', '5-15cm', '15-30cm', '30-60cm', '60-100cm']
@@ -28,8 +28,47 @@ class SoilGridsDataProvider():
     PFWiltingPoint = 4.2
     pFs = [-1.0, 1.0, 1.3, 1.7, 2.0, 2.3, 2.4, 2.7, 3.0, 3.3, 3.7, 4.0, 4.2, 6.0]
     SurfaceConductivity = 70.
+    layer_fields = ([("layerid", "i4"), ("latitude", "f8"), ("longitude", "f8"), ("zmin", "f8"), ("zmax", "f8"),
+                     ("Thickness", "f8")] +
+                    [(var, "f8") for var in soilgrids_vars] +
+                    [("OM", "f8"), ("FSOMI", "f8"), ("CNRatioSOMI", "f8"), ("CRAIRC", "f8"), ("is_topsoil", "?"),
+                     ("theta_r", "f8"), ("alpha", "f8"), ("k_sat", "f8"), ("labda", "f8"), ("n", "f8"),
+                     ("theta_s", "f8")])
+
+    def __init__(self, lat, lon, RDMCR, cache=None, soilgridsdresult=None, raster_source=None, profile_cache=None):
+        # With a SoilProfileCache, a site seen before skips the data retrieval and the profile computation; only
+        # soil_yaml is set then. Data that are passed in directly are never cached, as their source is unknown.
+        profile_key = None
+        if profile_cache is not None and soilgridsdresult is None:
+            version = raster_source.get_version() if raster_source is not None else self.request_url
+            profile_key = profile_cache.get_key("SoilGrids", version, RDMCR, self.pFs, lat=lat, lon=lon)
+            self.soil_yaml = profile_cache.get(profile_key)
+            if self.soil_yaml is not None:
+                return
+        # The SoilGrids data either come from the REST API, from local raster tiles (SoilGridsRasterSource) or are
+        # passed in directly
+        if soilgridsdresult is None:
+            if raster_source is not None:
+                soilgridsdresult = raster_source.get_response(lat, lon)
+            else:
+                soilgridsdresult = self.get_soilgrids_response(lat, lon, cache)
+        self.soilgridsdresult = soilgridsdresult
+        self.layers = self.get_layer_table([soilgridsdresult], [lat], [lon], RDMCR)[0]
+        self.calculate_derived_soil_properties(self.layers)
+        self.get_vangenuchten_parameters(self.layers)
+        self.get_van_genuchten_water_retention_curves(self.layers)
+        self.soil_yaml = self.get_soil_yaml(self.layers)
+        if profile_key is not None:
+            profile_cache.put(profile_key, self.soil_yaml)
 
-    def __init__(self, lat, lon, RDMCR):
+    @profiler.profiled()
+    def get_soilgrids_response(self, lat, lon, cache=None):
+        # Responses are taken from the (optional) SoilGridsResponseCache and only requested when not cached
+        if cache is not None:
+            response = cache.get(lat, lon, self.soilgrids_vars, self.soilgrids_soillayers)
+            if response is not None:
+                return response
+        import requests
         p1 = {"lat": lat, "lon": lon}
         props = {"property": self.soilgrids_vars, "depth": self.soilgrids_soillayers}
         # Necessary, because the SoilGrid API only allows a maximum of 5 requests per minute
@@ -40,167 +79,122 @@ class SoilGridsDataProvider():
             if(status_code == 429):
                 print("Too many requests to SoilGrids API. After 15 seconds, another attempt is made to retrieve SoilGrids data")
                 time.sleep(15)
-        self.soilgridsdresult = res.json()
-        self.get_soilgridsd(lat, lon, RDMCR)
-        self.calculate_derived_soil_properties()
-        self.get_vangenuchten_parameters()
-        self.get_van_genuchten_water_retention_curves()
-        self.get_soil_yaml()
-
-    def get_soil_yaml(self):
-        vgnd = SimpleNamespace(**self.vgnd)
-        soild = SimpleNamespace(**self.soild)
-        # below we generate the header of the soil input file as YAML input structure
-        soil_input_yaml = f"""
-            RDMSOL: {sum(list(vgnd.Thickness.values()))}
-            SoilProfileDescription:
-                PFWiltingPoint: {self.PFFieldCapacity}
-                PFFieldCapacity: {self.PFWiltingPoint}
-                SurfaceConductivity: {self.SurfaceConductivity}
-                GroundWater: false
-                SoilLayers:
-            """
-
-        # Here we generate the properties for each soil layer including layer thickness, hydraulic properties,
-        # organic matter content, etc.
-        nlayers = len(vgnd.Thickness)
-        ut = Util()
-        for i in range(nlayers):
-            s = f"""    - Thickness: {vgnd.Thickness[i]}
-                  CNRatioSOMI: {soild.CNRatioSOMI[i]}
-                  CRAIRC: {soild.CRAIRC[i]}
-                  FSOMI: {soild.FSOMI[i]}
-                  RHOD: {soild.bdod[i]}
-                  Soil_pH: {soild.phh2o[i]}
-                  SMfromPF: {vgnd.SMfromPF[i]}
-                  CONDfromPF: {vgnd.CONDfromPF[i]}
-            """
-            soil_input_yaml += s
-
-        # A SubSoilType needs to be defined. In this case we make the subsoil equal to the properties
-        # of the deepest soil layer.
-        soil_input_yaml += \
-            f"""    SubSoilType:
-                  CNRatioSOMI: {list(soild.CNRatioSOMI)[-1]}
-                  CRAIRC: {list(soild.CRAIRC)[-1]}
-                  FSOMI: {list(soild.FSOMI)[-1]}
-                  RHOD: {list(soild.bdod)[-1]}
-                  Soil_pH: {list(soild.phh2o)[-1]}
-                  Thickness: {list(soild.CNRatioSOMI)[-1]}
-                  SMfromPF: {vgnd.SMfromPF[len(vgnd.SMfromPF) - 1]}
-                  CONDfromPF: {vgnd.CONDfromPF[len(vgnd.CONDfromPF) - 1]}
-            """
-        soil_yaml = yaml.safe_load(soil_input_yaml)
-        self.soil_yaml = soil_yaml
-
-    def get_soilgridsd(self, lat, lon, RDMCR):
-        soilgridsd = {}
-        soilgridsd["latitude"] = []
-        soilgridsd["longitude"] = []
-        soilgridsd["layerid"] = []
-        soilgridsd["zmin"] = []
-        soilgridsd["zmax"] = []
-        soilgridsd["Thickness"] = []
-        for j in range(0, len(self.soilgrids_soillayers)):
-            zmin = self.get_zmin(self.soilgrids_soillayers[j])
-            zmax = self.get_zmax(self.soilgrids_soillayers[j])
-            soilgridsd["layerid"].append(j)
-            soilgridsd["zmin"].append(zmin)
-            soilgridsd["zmax"].append(zmax)
-            soilgridsd["Thickness"].append(zmax - zmin)
-            soilgridsd["latitude"].append(lat)
-            soilgridsd["longitude"].append(lon)
-        for j, var in enumerate(self.soilgrids_vars):
-            var_name = self.soilgridsdresult['properties']["layers"][j]['name']
-            if (var_name in self.soilgrids_vars):
-                soilgridsd[var_name] = []
-                for k in range(0, len(self.soilgrids_soillayers)):
-                    raw_value = self.soilgridsdresult['properties']["layers"][j]["depths"][k]["values"]["mean"]
-                    d_factor = self.soilgridsdresult["properties"]["layers"][j]["unit_measure"]["d_factor"]
-                    value = raw_value / d_factor
-                    soilgridsd[var_name].append(value)
-        if (soilgridsd["zmax"][-1] < RDMCR):
-            zmin = soilgridsd["zmax"][-1]
-            dz = RDMCR - zmin
-            zmax = zmin + dz
-            layerid = soilgridsd["layerid"][-1] + 1
-            soilgridsd["layerid"].append(layerid)
-            soilgridsd["zmin"].append(zmin)
-            soilgridsd["zmax"].append(zmax)
-            soilgridsd["Thickness"].append(dz)
-            soilgridsd["latitude"].append(lat)
-            soilgridsd["longitude"].append(lon)
-            for var in self.soilgrids_vars:
-                soilgridsd[var].append(soilgridsd[var][-1])
-        self.soild = soilgridsd
-
-    def calculate_derived_soil_properties(self):
-        df_soil = pd.DataFrame.from_dict(self.soild)
-        df_soil["OM"] = df_soil.soc.copy() * pml_to_pct * self.f_C_to_OM
-        df_soil["FSOMI"] = df_soil.OM.copy() * pct_to_frac
-        df_soil["CNRatioSOMI"] = df_soil.soc.copy() / df_soil.nitrogen.copy()
-        df_soil["CRAIRC"] = self.CRAIRC
-        self.soild = df_soil.to_dict()
-
-    def get_vangenuchten_parameters(self):
+        # Error responses (e.g. 500 or 503 during maintenance) are raised and never cached
+        res.raise_for_status()
+        response = res.json()
+        if cache is not None:
+            cache.put(lat, lon, self.soilgrids_vars, self.soilgrids_soillayers, response)
+        return response
+
+    @classmethod
+    @profiler.profiled()
+    def get_soil_yamls(cls, soilgridsdresults, lats, lons, RDMCR):
+        """Returns the soil YAML dicts of many SoilGrids responses, processed together in one layer table."""
+        layers = cls.get_layer_table(soilgridsdresults, lats, lons, RDMCR)
+        cls.calculate_derived_soil_properties(layers)
+        cls.get_vangenuchten_parameters(layers)
+        cls.get_van_genuchten_water_retention_curves(layers)
+        return [cls.get_soil_yaml(profile_layers) for profile_layers in layers]
+
+    @classmethod
+    def get_layer_dtype(cls):
+        npFs = len(cls.pFs)
+        return np.dtype(cls.layer_fields + [("SMfromPF", "f8", (npFs,)), ("CONDfromPF", "f8", (npFs,))])
+
+    @classmethod
+    @profiler.profiled()
+    def get_layer_table(cls, soilgridsdresults, lats, lons, RDMCR):
+        """Returns the (nprofiles, nlayers) layer table of SoilGrids responses (see get_layer_table_from_values).
+
+        The properties are looked up in the responses by name and depth label.
+        """
+        values = {var: np.zeros((len(soilgridsdresults), len(cls.soilgrids_soillayers))) for var in cls.soilgrids_vars}
+        for i, soilgridsdresult in enumerate(soilgridsdresults):
+            properties = {layer["name"]: layer for layer in soilgridsdresult["properties"]["layers"]}
+            for var in cls.soilgrids_vars:
+                means = {depth["label"]: depth["values"]["mean"] for depth in properties[var]["depths"]}
+                # Missing values (None) become NaN
+                means = np.array([means[soillayer] for soillayer in cls.soilgrids_soillayers], dtype=float)
+                values[var][i] = means / properties[var]["unit_measure"]["d_factor"]
+        return cls.get_layer_table_from_values(values, lats, lons, RDMCR)
+
+    @classmethod
+    def get_layer_table_from_values(cls, values, lats, lons, RDMCR):
+        """Returns the (nprofiles, nlayers) layer table of SoilGrids properties given as arrays.
+
+        values maps every SoilGrids property to an (nprofiles, ndepths) array in the units of the SoilGrids responses
+        after applying their d_factor. When the SoilGrids layers are shallower than RDMCR, an extra layer down to RDMCR
+        gets the properties of the deepest SoilGrids layer. The fields of the derived properties, the Van Genuchten
+        parameters and the curves are filled in by the later steps.
+        """
+        zmins = [cls.get_zmin(soillayer) for soillayer in cls.soilgrids_soillayers]
+        zmaxs = [cls.get_zmax(soillayer) for soillayer in cls.soilgrids_soillayers]
+        nsoilgrids = len(zmins)
+        if zmaxs[-1] < RDMCR:
+            zmins.append(zmaxs[-1])
+            zmaxs.append(RDMCR)
+        layers = np.zeros((len(lats), len(zmins)), dtype=cls.get_layer_dtype())
+        layers["layerid"] = np.arange(len(zmins))
+        layers["zmin"] = zmins
+        layers["zmax"] = zmaxs
+        layers["Thickness"] = layers["zmax"] - layers["zmin"]
+        layers["latitude"] = np.asarray(lats, dtype=float)[:, np.newaxis]
+        layers["longitude"] = np.asarray(lons, dtype=float)[:, np.newaxis]
+        for var in cls.soilgrids_vars:
+            layers[var][:, :nsoilgrids] = values[var]
+            layers[var][:, nsoilgrids:] = layers[var][:, nsoilgrids - 1:nsoilgrids]
+        return layers
+
+    @classmethod
+    @profiler.profiled()
+    def calculate_derived_soil_properties(cls, layers):
+        layers["OM"] = layers["soc"] * pml_to_pct * cls.f_C_to_OM
+        layers["FSOMI"] = layers["OM"] * pct_to_frac
+        layers["CNRatioSOMI"] = layers["soc"] / layers["nitrogen"]
+        layers["CRAIRC"] = cls.CRAIRC
+
+    @classmethod
+    @profiler.profiled()
+    def get_vangenuchten_parameters(cls, layers):
         ptfw = PedotransferFunctionsWosten()
-        df_soilgridsd = pd.DataFrame(self.soild)
-        df_soilgridsd["is_topsoil"] = df_soilgridsd.apply(lambda x:
-                                                          ptfw.calculate_isTopsoil(x.zmin,
-                                                                                   x.zmax,
-                                                                                   self.lower_boundary_topsoil),
-                                            axis=1)
-        df_vgn = pd.DataFrame()
-        df_vgn["layerid"] = df_soilgridsd["layerid"]
-        df_vgn["zmin"] = df_soilgridsd["zmin"]
-        df_vgn["zmax"] = df_soilgridsd["zmax"]
-        df_vgn["Thickness"] = df_soilgridsd.zmax - df_soilgridsd.zmin
-        df_vgn["theta_r"] = 0.01
-        df_vgn["is_topsoil"] = df_soilgridsd.apply(lambda x:
-                                              ptfw.calculate_isTopsoil(x.zmin, x.zmax, self.lower_boundary_topsoil),
-                                            axis=1)
-        df_vgn["alpha"] = df_soilgridsd.apply(lambda x:
-                                         ptfw.calculate_alpha(x.clay, x.bdod, x.silt, x.OM, x.is_topsoil),
-                                       axis=1)
-        df_vgn["k_sat"] = df_soilgridsd.apply(lambda x:
-                                         ptfw.calculate_k_sat(x.clay, x.bdod, x.silt, x.OM, x.is_topsoil),
-                                       axis=1)
-        df_vgn["labda"] = df_soilgridsd.apply(lambda x:
-                                         ptfw.calculate_lambda(x.clay, x.bdod, x.silt, x.OM, x.is_topsoil),
-                                       axis=1)
-        df_vgn["n"] = df_soilgridsd.apply(lambda x:
-                                     ptfw.calculate_n(x.clay, x.bdod, x.silt, x.OM, x.is_topsoil),
-                                   axis=1)
-        df_vgn["theta_s"] = df_soilgridsd.apply(lambda x:
-                                           ptfw.calculate_theta_s(x.clay, x.bdod, x.silt, x.OM, x.is_topsoil),
-                                         axis=1)
-        self.vgnd = df_vgn.to_dict()
-
-    def get_van_genuchten_water_retention_curves(self):
+        layers["is_topsoil"] = ptfw.calculate_isTopsoil(layers["zmin"], layers["zmax"], cls.lower_boundary_topsoil)
+        vgd = ptfw.calculate_van_genuchten_parameters(layers["clay"], layers["bdod"], layers["silt"], layers["OM"],
+                                                      0.01, layers["is_topsoil"])
+        layers["theta_r"] = vgd["theta_r"]
+        layers["alpha"] = vgd["alpha"]
+        layers["k_sat"] = vgd["k_sat"]
+        layers["labda"] = vgd["lambda"]
+        layers["n"] = vgd["n"]
+        layers["theta_s"] = vgd["theta_s"]
+
+    @classmethod
+    @profiler.profiled()
+    def get_van_genuchten_water_retention_curves(cls, layers):
         vgn = VanGenuchten()
-        df_vgn = pd.DataFrame.from_dict(self.vgnd)
-        CONDfromPF_perlayer = []
-        SMfromPF_perlayer = []
-        for i in range(len(df_vgn)):
-            CONDfromPF = []
-            SMfromPF = []
-            for j, pF in enumerate(self.pFs):
-                r = vgn.calculate_soil_moisture_content(pF, df_vgn.alpha.iloc[i], df_vgn.n.iloc[i], df_vgn.theta_r.iloc[i],
-                                                        df_vgn.theta_s.iloc[i])
-                SMfromPF.extend([pF, float(r)])
-                r = vgn.calculate_log10_hydraulic_conductivity(pF, df_vgn.alpha.iloc[i], df_vgn.labda.iloc[i],
-                                                               df_vgn.k_sat.iloc[i], df_vgn.n.iloc[i])
-                CONDfromPF.extend([pF, float(r)])
-            CONDfromPF_perlayer.append(CONDfromPF)
-            SMfromPF_perlayer.append(SMfromPF)
-        df_vgn["CONDfromPF"] = CONDfromPF_perlayer
-        df_vgn["SMfromPF"] = SMfromPF_perlayer
-        self.vgnd = df_vgn.to_dict()
-
-    def get_zmin(self, val):
+        # The curve kernels work on flat parameter arrays; the (nlayers, npFs) results are put back in layer shape
+        shape = layers.shape + (len(cls.pFs),)
+        flat = layers.reshape(-1)
+        SMfromPF = vgn.calculate_soil_moisture_content_matrix(cls.pFs, flat["alpha"], flat["n"], flat["theta_r"],
+                                                              flat["theta_s"])
+        CONDfromPF = vgn.calculate_log10_hydraulic_conductivity_matrix(cls.pFs, flat["alpha"], flat["labda"],
+                                                                       flat["k_sat"], flat["n"])
+        layers["SMfromPF"] = SMfromPF.reshape(shape)
+        layers["CONDfromPF"] = CONDfromPF.reshape(shape)
+
+    @classmethod
+    @profiler.profiled()
+    def get_soil_yaml(cls, layers):
+        builder = SoilProfileBuilder(cls.pFs, cls.PFWiltingPoint, cls.PFFieldCapacity, cls.SurfaceConductivity)
+        soil_yaml = builder.build(layers["Thickness"], layers["SMfromPF"], layers["CONDfromPF"], layers["CNRatioSOMI"],
+                                  layers["CRAIRC"], layers["FSOMI"], layers["bdod"], layers["phh2o"])
+        return soil_yaml
+
+    @staticmethod
+    def get_zmin(val):
         zmin = float(val.split("-")[0])
         return zmin
 
-    def get_zmax(self, val):
+    @staticmethod
+    def get_zmax(val):
         zmax = float(val.split("-")[1].replace("cm",""))
         return zmax
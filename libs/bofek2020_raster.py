@@ -0,0 +1,95 @@
+import json
+import numpy as np
+import os
+import rasterio.features
+import shapely
+from pyproj import Transformer
+from rasterio.transform import Affine, from_origin
+
+class BOFEK2020RasterStore():
+    """Rasterized BOFEK2020 soil map: a fixed-resolution grid of soil code ids in RD New (EPSG:28992).
+
+    The grid is a memory-mapped .npy file (uint16 ids: 0 outside the soil map, 1..n the soil codes, boundary for cells
+    touched by a polygon boundary) with a .json file holding its affine transform, the soil codes and the version of the
+    shapefile it was built from. A point lookup transforms lat/lon to a cell and reads it directly; only points in
+    boundary cells need an exact polygon test.
+    """
+    crs = "EPSG:28992"
+    nodata = 0
+    boundary = np.iinfo(np.uint16).max
+    band_rows = 1024
+
+    def __init__(self, store_fp):
+        self.store_fp = store_fp
+        with open(store_fp.with_suffix(".json")) as f:
+            meta = json.load(f)
+        self.transform = Affine(*meta["transform"])
+        self.resolution = meta["resolution"]
+        self.soilcodes = np.array([None] + meta["soilcodes"], dtype=object)
+        self.source_version = meta.get("source_version")
+        self.grid = np.load(store_fp, mmap_mode="r")
+        self.transformer = Transformer.from_crs("EPSG:4326", self.crs, always_xy=True)
+
+    @classmethod
+    def build(cls, gdf_bofek, store_fp, resolution=25., source_version=None):
+        """Rasterizes gdf_bofek (BODEMCODE and polygons) at resolution (m) in bands of rows, straight into the
+        memory-mapped grid, so the full grid is never held in memory."""
+        gdf_bofek = gdf_bofek[["BODEMCODE", "geometry"]].to_crs(cls.crs)
+        geometries = gdf_bofek.geometry.values
+        soilcodes, ids = np.unique(gdf_bofek.BODEMCODE.to_numpy().astype(str), return_inverse=True)
+        if len(soilcodes) >= cls.boundary:
+            raise Exception("Error: too many BOFEK2020 soil codes for a uint16 grid")
+        ids = ids + 1
+
+        xmin, ymin, xmax, ymax = shapely.total_bounds(geometries)
+        xmin = np.floor(xmin / resolution) * resolution
+        ymax = np.ceil(ymax / resolution) * resolution
+        width = int(np.ceil((xmax - xmin) / resolution))
+        height = int(np.ceil((ymax - ymin) / resolution))
+        grid_transform = from_origin(xmin, ymax, resolution, resolution)
+
+        tree = shapely.STRtree(geometries)
+        boundaries = shapely.boundary(geometries)
+        tmp_fp = store_fp.with_name(f"{store_fp.stem}.tmp{os.getpid()}.npy")
+        grid = np.lib.format.open_memmap(tmp_fp, mode="w+", dtype=np.uint16, shape=(height, width))
+        for row0 in range(0, height, cls.band_rows):
+            row1 = min(row0 + cls.band_rows, height)
+            band_transform = grid_transform * Affine.translation(0, row0)
+            band = np.zeros((row1 - row0, width), dtype=np.uint16)
+            ind = np.sort(tree.query(shapely.box(xmin, ymax - row1 * resolution, xmin + width * resolution,
+                                                 ymax - row0 * resolution)))
+            if len(ind) > 0:
+                # Later shapes overwrite earlier ones, so reversing gives overlaps to the first polygon, as in
+                # BOFEK2020PolygonStore
+                rasterio.features.rasterize(zip(geometries[ind[::-1]], ids[ind[::-1]].tolist()), out=band,
+                                            transform=band_transform)
+                rasterio.features.rasterize(((boundary, int(cls.boundary)) for boundary in boundaries[ind]),
+                                            out=band, transform=band_transform, all_touched=True)
+            grid[row0:row1] = band
+        grid.flush()
+        del grid
+        # The .json holds the source version, so it replaces the old one only after the grid did: an interrupted build
+        # leaves a store that is stale and rebuilt rather than a grid paired with the wrong soil codes
+        tmp_json_fp = tmp_fp.with_suffix(".json")
+        with open(tmp_json_fp, "w") as f:
+            json.dump({"transform": list(grid_transform)[:6], "resolution": resolution,
+                       "soilcodes": soilcodes.tolist(), "source_version": source_version or []}, f)
+        os.replace(tmp_fp, store_fp)
+        os.replace(tmp_json_fp, store_fp.with_suffix(".json"))
+        return cls(store_fp)
+
+    def get_cells(self, lats, lons):
+        xs, ys = self.transformer.transform(np.asarray(lons, dtype=float), np.asarray(lats, dtype=float))
+        cols, rows = ~self.transform * (xs, ys)
+        return np.floor(rows).astype(np.int64), np.floor(cols).astype(np.int64)
+
+    def get_soilcodes(self, lats, lons):
+        """Returns the soil code of every point (None outside the soil map) and a mask of the points in boundary cells,
+        whose soil code is None and should be looked up with an exact polygon test."""
+        rows, cols = self.get_cells(lats, lons)
+        inside = (rows >= 0) & (rows < self.grid.shape[0]) & (cols >= 0) & (cols < self.grid.shape[1])
+        ids = np.zeros(len(rows), dtype=np.uint16)
+        ids[inside] = self.grid[rows[inside], cols[inside]]
+        on_boundary = ids == self.boundary
+        ids[on_boundary] = self.nodata
+        return self.soilcodes[ids], on_boundary
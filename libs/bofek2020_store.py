@@ -0,0 +1,57 @@
+import numpy as np
+import shapely
+from shapely import Point, STRtree
+
+class BOFEK2020PolygonStore():
+    """Persistent, spatially indexed store of the BOFEK2020 soil map.
+
+    The national bod_clusters layer is reduced once to its BODEMCODE column plus the polygons in EPSG:4326 and written
+    to a single .npz file (geometries as WKB), together with the version of the shapefile it was built from. Loading
+    the store rebuilds an STRtree in bulk, after which a soil code lookup for a point is a single index query.
+    """
+    crs = "EPSG:4326"
+
+    def __init__(self, store_fp):
+        self.store_fp = store_fp
+        with np.load(store_fp) as data:
+            self.soilcodes = data["soilcodes"]
+            self.bounds = data["bounds"]
+            wkb = data["wkb"].tobytes()
+            offsets = data["wkb_offsets"]
+            self.source_version = data["source_version"].tolist() if "source_version" in data.files else None
+        wkbs = [wkb[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+        self.geometries = shapely.from_wkb(wkbs)
+        self.tree = STRtree(self.geometries)
+
+    @classmethod
+    def build(cls, gdf_bofek, store_fp, source_version=None):
+        gdf_bofek = gdf_bofek[["BODEMCODE", "geometry"]].to_crs(cls.crs)
+        geometries = gdf_bofek.geometry.values
+        wkbs = shapely.to_wkb(geometries)
+        offsets = np.zeros(len(wkbs) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(w) for w in wkbs])
+        np.savez(store_fp,
+                 soilcodes=gdf_bofek.BODEMCODE.to_numpy().astype(str),
+                 bounds=shapely.bounds(geometries),
+                 wkb=np.frombuffer(b"".join(wkbs), dtype=np.uint8),
+                 wkb_offsets=offsets,
+                 source_version=np.array(source_version or []))
+        return cls(store_fp)
+
+    def get_soilcode(self, lat, lon):
+        ind = self.tree.query(Point(lon, lat), predicate="within")
+        if len(ind) == 0:
+            raise Exception(f"Error: no BOFEK2020 polygon found at lat={lat}, lon={lon}")
+        soilcode = self.soilcodes[ind.min()]
+        return soilcode
+
+    def get_soilcodes(self, lats, lons):
+        # A single bulk query of the index for all points; points outside the soil map get None
+        points = shapely.points(np.asarray(lons, dtype=float), np.asarray(lats, dtype=float))
+        ind_points, ind_polygons = self.tree.query(points, predicate="within")
+        ind = np.full(len(points), len(self.soilcodes), dtype=np.int64)
+        np.minimum.at(ind, ind_points, ind_polygons)
+        soilcodes = np.full(len(points), None, dtype=object)
+        found = ind < len(self.soilcodes)
+        soilcodes[found] = self.soilcodes[ind[found]]
+        return soilcodes
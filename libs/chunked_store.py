@@ -0,0 +1,88 @@
+from collections import OrderedDict
+import json
+import numpy as np
+import os
+from pathlib import Path
+
+class ChunkedArrayStore():
+    """On-disk store of gridded arrays, split into spatial chunks.
+
+    Every variable is an array with shape (nlat, nlon, ...) that is stored as one .npy file per (lat, lon) chunk in
+    <store_dir>/<variable>/<ilat>_<ilon>.npy; the trailing dimensions (e.g. time or soil layer) are never split.
+    Chunks are read lazily (memory-mapped) and kept in an LRU cache, so reads of neighbouring cells share chunk reads.
+    """
+    def __init__(self, store_dir, cache_size=64):
+        self.store_dir = Path(store_dir)
+        with open(self.store_dir / "meta.json") as f:
+            self.meta = json.load(f)
+        self.lats = np.array(self.meta["lats"])
+        self.lons = np.array(self.meta["lons"])
+        self.chunks = tuple(self.meta["chunks"])
+        self.variables = self.meta["variables"]
+        self.attrs = self.meta.get("attrs", {})
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+
+    @classmethod
+    def create(cls, store_dir, lats, lons, variables, chunks=(16, 16), attrs=None):
+        """Creates an empty store; variables maps each variable name to the shape of its trailing dimensions."""
+        store_dir = Path(store_dir)
+        store_dir.mkdir(parents=True, exist_ok=True)
+        meta = {"lats": [float(lat) for lat in lats], "lons": [float(lon) for lon in lons], "chunks": list(chunks),
+                "variables": {var: list(shape) for var, shape in variables.items()}, "attrs": attrs or {}}
+        for var in variables:
+            (store_dir / var).mkdir(exist_ok=True)
+        with open(store_dir / "meta.json", "w") as f:
+            json.dump(meta, f)
+        return cls(store_dir)
+
+    def get_chunk_fp(self, var, ichunk, jchunk):
+        return self.store_dir / var / f"{ichunk}_{jchunk}.npy"
+
+    def get_chunk(self, var, ichunk, jchunk):
+        key = (var, ichunk, jchunk)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        chunk = np.load(self.get_chunk_fp(var, ichunk, jchunk), mmap_mode="r")
+        self.cache[key] = chunk
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return chunk
+
+    def write(self, var, i0, j0, values):
+        """Writes values (shape (ni, nj, ...)) with its first cell at grid index (i0, j0); i0 and j0 must be aligned
+        with the chunk grid and values must cover whole chunks (except at the edges of the grid)."""
+        ci, cj = self.chunks
+        if i0 % ci != 0 or j0 % cj != 0:
+            raise Exception("Error: writes to a ChunkedArrayStore must be aligned with its chunks")
+        for i in range(0, values.shape[0], ci):
+            for j in range(0, values.shape[1], cj):
+                fp = self.get_chunk_fp(var, (i0 + i) // ci, (j0 + j) // cj)
+                tmp_fp = fp.with_name(f"{fp.stem}.tmp{os.getpid()}.npy")
+                np.save(tmp_fp, np.ascontiguousarray(values[i:i + ci, j:j + cj]))
+                os.replace(tmp_fp, fp)
+                self.cache.pop((var, (i0 + i) // ci, (j0 + j) // cj), None)
+
+    @staticmethod
+    def get_half_step(coords):
+        return 0.5 * np.abs(np.diff(coords)).max() if len(coords) > 1 else 0.
+
+    def contains(self, lat, lon):
+        """Whether lat, lon lies in a grid cell, i.e. at most half a cell outside the outer cell centres."""
+        tolerance = 1e-9
+        return bool(np.abs(self.lats - lat).min() <= self.get_half_step(self.lats) + tolerance and
+                    np.abs(self.lons - lon).min() <= self.get_half_step(self.lons) + tolerance)
+
+    def get_index(self, lat, lon):
+        # Index of the nearest grid cell; points outside the grid raise rather than getting an edge cell
+        if not self.contains(lat, lon):
+            raise Exception(f"Error: lat={lat}, lon={lon} is outside the grid of {self.store_dir}")
+        i = int(np.abs(self.lats - lat).argmin())
+        j = int(np.abs(self.lons - lon).argmin())
+        return i, j
+
+    def read_cell(self, var, i, j):
+        ci, cj = self.chunks
+        chunk = self.get_chunk(var, i // ci, j // cj)
+        return np.array(chunk[i % ci, j % cj])
@@ -0,0 +1,91 @@
+from contextlib import contextmanager
+import hashlib
+import os
+from pathlib import Path
+import time
+
+def get_sha256(fp, chunk_size=1 << 20):
+    sha256 = hashlib.sha256()
+    with open(fp, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def download_file(url, fp, sha256=None, chunk_size=1 << 20, timeout=60., max_retries=3):
+    """Streams url to fp in chunks, so that the file is never held in memory.
+
+    The download goes to <fp>.part first. An interrupted download is resumed with an HTTP Range request (servers
+    without range support send the whole file again). The size is checked against Content-Length and, when sha256 is
+    given, the content against that checksum, before the file is moved to fp.
+    """
+    import requests
+    fp = Path(fp)
+    part_fp = fp.with_name(fp.name + ".part")
+    for attempt in range(max_retries + 1):
+        offset = part_fp.stat().st_size if part_fp.exists() else 0
+        headers = {"Range": f"bytes={offset}-"} if offset > 0 else {}
+        try:
+            with requests.get(url, headers=headers, stream=True, timeout=timeout) as response:
+                if response.status_code == 416:
+                    # The part file already holds the whole file
+                    size = offset
+                else:
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        offset = 0
+                    size = offset + int(response.headers["Content-Length"]) \
+                        if "Content-Length" in response.headers else None
+                    with open(part_fp, "ab" if offset > 0 else "wb") as f:
+                        for chunk in response.iter_content(chunk_size=chunk_size):
+                            f.write(chunk)
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+            # A broken connection leaves the part file, from which the next attempt resumes
+            if attempt == max_retries:
+                raise
+            time.sleep(2 ** attempt)
+            continue
+        if size is not None and part_fp.stat().st_size < size:
+            if attempt == max_retries:
+                raise Exception(f"Error: download of {url} stopped at {part_fp.stat().st_size} of {size} bytes")
+            continue
+        break
+    if size is not None and part_fp.stat().st_size != size:
+        nbytes = part_fp.stat().st_size
+        part_fp.unlink()
+        raise Exception(f"Error: download of {url} has {nbytes} bytes instead of {size}")
+    if sha256 is not None and get_sha256(part_fp) != sha256.lower():
+        part_fp.unlink()
+        raise Exception(f"Error: checksum of the download of {url} does not match {sha256}")
+    os.replace(part_fp, fp)
+    return fp
+
+@contextmanager
+def file_lock(lock_fp, timeout=3600., poll_interval=1., stale_after=7200.):
+    """Holds lock_fp while the block runs; other processes wait until it is released (or raise after timeout).
+
+    The lock is a file created with O_EXCL, so it also works between independent worker processes. A lock file older
+    than stale_after seconds is left behind by a killed process and is removed.
+    """
+    lock_fp = Path(lock_fp)
+    lock_fp.parent.mkdir(parents=True, exist_ok=True)
+    t0 = time.monotonic()
+    while True:
+        try:
+            fd = os.open(lock_fp, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - lock_fp.stat().st_mtime > stale_after:
+                    lock_fp.unlink()
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() - t0 > timeout:
+                raise Exception(f"Error: timed out waiting for lock {lock_fp}")
+            time.sleep(poll_interval)
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        yield lock_fp
+    finally:
+        lock_fp.unlink(missing_ok=True)
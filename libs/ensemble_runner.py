@@ -0,0 +1,163 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import copy
+import datetime as dt
+import os
+import traceback
+import yaml
+from pcse import models
+from pcse.base import ParameterProvider
+from pcse.input import WOFOST81SiteDataProvider_SNOMIN, YAMLCropDataProvider
+from libs.gridded_weather import GriddedWeatherDataProvider
+from libs.soil_cube import SoilParameterCube
+from libs.weather_cache import CachedWeatherDataProvider
+
+# Per-process state of the workers; crop data and weather providers are built once per worker and reused by all runs
+# that the worker executes
+worker_state = {"crop_data": {}, "weather": {}, "agro": {}}
+
+def get_model(model_name):
+    return getattr(models, model_name)
+
+def get_crop_data(model_name):
+    if model_name not in worker_state["crop_data"]:
+        worker_state["crop_data"][model_name] = YAMLCropDataProvider(get_model(model_name))
+    return worker_state["crop_data"][model_name]
+
+def get_weather_data(run):
+    # Weather comes either from a single-site weather file or from the cell of a gridded weather store
+    if "weather_store" in run:
+        store = GriddedWeatherDataProvider.get_store(run["weather_store"])
+        key = (str(run["weather_store"]), store.get_index(run["lat"], run["lon"]))
+        if key not in worker_state["weather"]:
+            worker_state["weather"][key] = GriddedWeatherDataProvider(run["weather_store"], run["lat"], run["lon"])
+    else:
+        key = str(run["weather_fp"])
+        if key not in worker_state["weather"]:
+            worker_state["weather"][key] = CachedWeatherDataProvider(run["weather_fp"])
+    return worker_state["weather"][key]
+
+def get_soil_data(run):
+    # The soil is a soil dict, a soil YAML file or the cell of a soil parameter cube
+    if "soil_cube" in run:
+        return SoilParameterCube.get_soil_yaml(run["soil_cube"], run["lat"], run["lon"])
+    soild = run["soil"]
+    if not isinstance(soild, dict):
+        soild = yaml.safe_load(open(soild))
+    return soild
+
+def get_agromanagement(agro_fp, year=None, crop=None, cultivar=None):
+    """Returns the agromanagement of agro_fp, shifted to the given year and with the given crop and cultivar.
+
+    The year is the year of the first campaign start date; all dates in the agromanagement are shifted by the same
+    number of years.
+    """
+    key = str(agro_fp)
+    if key not in worker_state["agro"]:
+        worker_state["agro"][key] = yaml.safe_load(open(agro_fp))
+    agrod = copy.deepcopy(worker_state["agro"][key])
+    campaigns = agrod["AgroManagement"]
+    if year is not None:
+        first_year = list(campaigns[0].keys())[0].year
+        campaigns = [shift_years(campaign, year - first_year) for campaign in campaigns]
+        agrod["AgroManagement"] = campaigns
+    for campaign in campaigns:
+        for campaign_d in campaign.values():
+            crop_calendar = campaign_d.get("CropCalendar") if campaign_d else None
+            if crop_calendar is None:
+                continue
+            if crop is not None:
+                crop_calendar["crop_name"] = crop
+            if cultivar is not None:
+                crop_calendar["variety_name"] = cultivar
+    return agrod
+
+def shift_years(value, nyears):
+    if isinstance(value, dt.date):
+        try:
+            return value.replace(year=value.year + nyears)
+        except ValueError:
+            # 29 February in a target year that is not a leap year
+            return value.replace(year=value.year + nyears, day=28)
+    elif isinstance(value, dict):
+        return {shift_years(k, nyears): shift_years(v, nyears) for k, v in value.items()}
+    elif isinstance(value, list):
+        return [shift_years(v, nyears) for v in value]
+    return value
+
+def get_site_data(run, soild):
+    site = run.get("site", {})
+    if not isinstance(site, dict):
+        site = yaml.safe_load(open(site))
+    if run["model"] == "Wofost72_PP":
+        return site
+    # For the WOFOST 8.1 models the initial mineral N is given for the top layer only
+    nlayer = len(soild["SoilProfileDescription"]["SoilLayers"])
+    NH4Ilist = [0] * nlayer
+    NO3Ilist = [0] * nlayer
+    NH4Ilist[0] = site.get("NH4I", 0.)
+    NO3Ilist[0] = site.get("NO3I", 0.)
+    sited = WOFOST81SiteDataProvider_SNOMIN(CO2=site["CO2"], NH4I=NH4Ilist, NO3I=NO3Ilist, WAV=site["WAV"])
+    return sited
+
+def run_simulation(run):
+    """Runs a single simulation; run is a dict describing one ensemble member (see EnsembleRunner)."""
+    try:
+        soild = get_soil_data(run)
+        agrod = get_agromanagement(run["agro_fp"], run.get("year"), run.get("crop"), run.get("cultivar"))
+        parameters = ParameterProvider(sitedata=get_site_data(run, soild), soildata=soild,
+                                       cropdata=get_crop_data(run["model"]))
+        model = get_model(run["model"])(parameters, get_weather_data(run), agrod)
+        model.run_till_terminate()
+        result = {"run_id": run["run_id"], "status": "ok", "output": model.get_output(),
+                  "summary": model.get_summary_output()}
+    except Exception:
+        result = {"run_id": run["run_id"], "status": "failed", "error": traceback.format_exc()}
+    return result
+
+
+class EnsembleRunner():
+    """Runs many site x year x cultivar x soil combinations on a process pool.
+
+    Every run is a dict with the keys run_id, model (name of a pcse.models class), weather_fp, agro_fp and soil (a PCSE
+    soil dict or the path of a soil YAML file), and optionally year, crop, cultivar and site. For Wofost72_PP site is
+    the site data dict (or the path of a site YAML file); for the WOFOST 8.1 models it holds CO2, WAV, NH4I and NO3I.
+    Instead of weather_fp, a run can give weather_store, lat and lon to take its weather from a gridded weather store.
+    Likewise, instead of soil, a run can give soil_cube, lat and lon to take its soil from a SoilParameterCube.
+    The optional attrs dict of a run is written as extra columns of its rows when the output goes to a sink.
+    """
+    def __init__(self, max_workers=None, progress_interval=10, run_function=run_simulation):
+        # run_function runs a single run dict in a worker and returns its result (see run_simulation); it should be a
+        # module-level function, so that it can be sent to the worker processes
+        self.max_workers = max_workers if max_workers is not None else os.cpu_count()
+        self.progress_interval = progress_interval
+        self.run_function = run_function
+
+    def run(self, runs, sink=None):
+        """Runs all runs and returns their results (in the order of runs) and the failed results.
+
+        When a ParquetOutputSink is given, the daily and summary output of every run is written to it as soon as the
+        run completes and is not kept in the returned results.
+        """
+        results = {}
+        nfailures = 0
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.run_function, run): (i, run) for i, run in enumerate(runs)}
+            for n, future in enumerate(as_completed(futures), start=1):
+                i, run = futures[future]
+                try:
+                    result = future.result()
+                except Exception:
+                    # An exception raised by the run function itself (run_simulation catches those of the model)
+                    result = {"run_id": run["run_id"], "status": "failed", "error": traceback.format_exc()}
+                if sink is not None and result["status"] == "ok":
+                    sink.add(result["run_id"], result.pop("output"), result.pop("summary"),
+                             run_attrs=run.get("attrs"))
+                results[i] = result
+                if result["status"] != "ok":
+                    nfailures += 1
+                    print(f"Run {result['run_id']} failed:\n{result['error']}")
+                if n % self.progress_interval == 0 or n == len(futures):
+                    print(f"{n}/{len(futures)} runs done, {nfailures} failed")
+        results = [results[i] for i in range(len(results))]
+        failures = [result for result in results if result["status"] != "ok"]
+        return results, failures
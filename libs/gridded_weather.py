@@ -0,0 +1,63 @@
+import datetime as dt
+import numpy as np
+from pcse.base import WeatherDataContainer, WeatherDataProvider
+from pcse.util import reference_ET
+from libs.chunked_store import ChunkedArrayStore
+
+class GriddedWeatherDataProvider(WeatherDataProvider):
+    """Weather data provider for a single cell of a gridded weather store covering a region and a period.
+
+    The store is a ChunkedArrayStore with one (nlat, nlon, ntime) array per weather variable in PCSE units (IRRAD in
+    J/m2/day, TMIN/TMAX in Celsius, VAP in hPa, RAIN in cm/day, WIND in m/sec and optionally E0/ES0/ET0 in cm/day) and
+    an (nlat, nlon) ELEV array. Only the chunks holding the requested cell are read. Stores are shared per process,
+    so the providers of neighbouring sites share the chunk reads through the LRU chunk cache of the store.
+    """
+    stores = {}
+    weather_vars = ["IRRAD", "TMIN", "TMAX", "VAP", "RAIN", "WIND"]
+    et_vars = ["E0", "ES0", "ET0"]
+
+    def __init__(self, store_dir, lat, lon):
+        WeatherDataProvider.__init__(self)
+        store = self.get_store(store_dir)
+        i, j = store.get_index(lat, lon)
+        self.latitude = float(store.lats[i])
+        self.longitude = float(store.lons[j])
+        self.elevation = float(store.read_cell("ELEV", i, j))
+        self.angstA = store.attrs["angstA"]
+        self.angstB = store.attrs["angstB"]
+        self.description = [f"Gridded weather data from {store.store_dir}, cell ({self.latitude}, {self.longitude})"]
+
+        first_day = dt.date.fromisoformat(store.attrs["first_day"])
+        columns = {var: store.read_cell(var, i, j).tolist() for var in self.weather_vars + self.et_vars
+                   if var in store.variables}
+        for k in range(len(columns["IRRAD"])):
+            day = first_day + dt.timedelta(days=k)
+            values = {var: column[k] for var, column in columns.items()}
+            if "ET0" not in values:
+                e0, es0, et0 = reference_ET(DAY=day, LAT=self.latitude, ELEV=self.elevation, ANGSTA=self.angstA,
+                                            ANGSTB=self.angstB, ETMODEL=self.ETmodel, **values)
+                values["E0"] = e0 / 10.
+                values["ES0"] = es0 / 10.
+                values["ET0"] = et0 / 10.
+            wdc = WeatherDataContainer(LAT=self.latitude, LON=self.longitude, ELEV=self.elevation, DAY=day, **values)
+            self._store_WeatherDataContainer(wdc, day)
+
+    @classmethod
+    def get_store(cls, store_dir):
+        key = str(store_dir)
+        if key not in cls.stores:
+            cls.stores[key] = ChunkedArrayStore(store_dir)
+        return cls.stores[key]
+
+    @classmethod
+    def write_store(cls, store_dir, lats, lons, first_day, data, elevation, angstA=0.18, angstB=0.55, chunks=(16, 16)):
+        """Writes a gridded weather store; data maps each weather variable to an (nlat, nlon, ntime) array."""
+        ntime = data["IRRAD"].shape[2]
+        variables = {var: (ntime,) for var in data}
+        variables["ELEV"] = ()
+        attrs = {"first_day": first_day.isoformat(), "angstA": angstA, "angstB": angstB}
+        store = ChunkedArrayStore.create(store_dir, lats, lons, variables, chunks=chunks, attrs=attrs)
+        for var, values in data.items():
+            store.write(var, 0, 0, np.asarray(values, dtype=float))
+        store.write("ELEV", 0, 0, np.asarray(elevation, dtype=float))
+        return store
@@ -0,0 +1,303 @@
+import datetime as dt
+import numbers
+import os
+import shutil
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+class ParquetOutputSink():
+    """Streams the daily and summary output of many runs into Parquet datasets.
+
+    Rows are buffered in memory and written as a new part file under <output_dir>/daily and <output_dir>/summary as
+    soon as max_rows rows are buffered, so memory use is bounded however many runs are added. Every row carries the
+    run_id and the optional run attributes as columns; the datasets can be partitioned on any of these columns. The
+    type of an attribute column is fixed by its first value that is not None (numbers as float64, dates as date32,
+    anything else as string), or given in attr_types ({name: pyarrow type}).
+    """
+    date_vars = {"day", "DOS", "DOE", "DOA", "DOM", "DOH", "DOV"}
+
+    def __init__(self, output_dir, daily_vars=None, summary_vars=None, partition_cols=None, max_rows=100000,
+                 overwrite=False, attr_types=None):
+        self.output_dir = Path(output_dir)
+        if overwrite:
+            for table in ["daily", "summary"]:
+                shutil.rmtree(self.output_dir / table, ignore_errors=True)
+        self.daily_vars = daily_vars
+        self.summary_vars = summary_vars
+        self.partition_cols = partition_cols
+        self.max_rows = max_rows
+        self.buffers = {"daily": [], "summary": []}
+        self.attr_names = set()
+        self.attr_types = dict(attr_types or {})
+        self.list_vars = set()
+        self.nparts = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def add(self, run_id, output, summary, run_attrs=None):
+        run_attrs = {"run_id": run_id, **(run_attrs or {})}
+        self.attr_names.update(run_attrs)
+        for name, value in run_attrs.items():
+            if value is not None and name not in self.attr_types:
+                self.attr_types[name] = self.get_attr_type(value)
+        for table, rows, variables in [("daily", output, self.daily_vars), ("summary", summary, self.summary_vars)]:
+            for row in rows:
+                if variables is not None:
+                    row = {var: value for var, value in row.items() if var == "day" or var in variables}
+                self.buffers[table].append({**run_attrs, **row})
+        if max(len(rows) for rows in self.buffers.values()) >= self.max_rows:
+            self.flush()
+
+    @staticmethod
+    def get_attr_type(value):
+        if isinstance(value, (bool, np.bool_)):
+            return pa.bool_()
+        if isinstance(value, numbers.Real):
+            return pa.float64()
+        if isinstance(value, dt.date):
+            return pa.date32()
+        return pa.string()
+
+    def get_table(self, rows):
+        # Attributes and output variables get fixed types, so that part files written by different runs have the same
+        # schema, also when an attribute is None or only has integer values in some of them.
+        # Per-layer variables (e.g. SM and WC of the MLWB models) are one array per day and get list columns.
+        names = dict.fromkeys(name for row in rows for name in row)
+        columns = {}
+        for name in names:
+            values = [row.get(name) for row in rows]
+            if name in self.attr_names:
+                # Attributes that were None in all runs so far are written as strings
+                attr_type = self.attr_types.get(name, pa.string())
+                if attr_type == pa.string():
+                    values = [None if value is None else str(value) for value in values]
+                columns[name] = pa.array(values, type=attr_type)
+            elif name in self.date_vars:
+                columns[name] = pa.array(values, type=pa.date32())
+            elif name in self.list_vars or any(isinstance(value, (np.ndarray, list, tuple)) for value in values):
+                self.list_vars.add(name)
+                values = [None if value is None else np.asarray(value, dtype=float).ravel() for value in values]
+                columns[name] = pa.array(values, type=pa.list_(pa.float64()))
+            else:
+                columns[name] = pa.array(values, type=pa.float64())
+        return pa.table(columns)
+
+    def flush(self):
+        for table, rows in self.buffers.items():
+            if not rows:
+                continue
+            table_dir = self.output_dir / table
+            basename = f"part-{os.getpid()}-{self.nparts:05d}"
+            if self.partition_cols:
+                pq.write_to_dataset(self.get_table(rows), root_path=table_dir, partition_cols=self.partition_cols,
+                                    basename_template=basename + "-{i}.parquet")
+            else:
+                table_dir.mkdir(parents=True, exist_ok=True)
+                pq.write_table(self.get_table(rows), table_dir / f"{basename}.parquet")
+            self.buffers[table] = []
+        self.nparts += 1
+
+    def close(self):
+        self.flush()
+
+
+class P2Percentiles():
+    """Streaming estimates of percentiles of the values added to every row (e.g. day), with the P-square algorithm of
+    Jain and Chlamtac (1985).
+
+    Every row keeps five markers per percentile, so memory does not depend on the number of added values; rows with
+    fewer than five values give exact percentiles. For a few hundred values or more the estimates are typically within
+    a few hundredths of a standard deviation of the exact percentiles, but in the tails (e.g. P5 and P95) single rows
+    can be off by up to about 0.3 standard deviation.
+    """
+    def __init__(self, percentiles, nrows=366):
+        self.ps = np.asarray(percentiles, dtype=float) / 100.
+        # Increments of the desired marker positions per added value, (npercentiles, 5)
+        self.dn = np.stack([np.zeros_like(self.ps), self.ps / 2, self.ps, (1 + self.ps) / 2, np.ones_like(self.ps)],
+                           axis=1)
+        self.q = np.full((len(self.ps), nrows, 5), np.nan)
+        self.n = np.zeros((len(self.ps), nrows, 5))
+        self.desired = np.zeros((len(self.ps), nrows, 5))
+        self.count = np.zeros(nrows, dtype=np.int64)
+
+    def grow(self, nrows):
+        # Capacity is doubled when needed, so that adding values is amortized O(1)
+        size = len(self.count)
+        if nrows <= size:
+            return
+        nrows = max(nrows, 2 * size)
+        for name, fill in [("q", np.nan), ("n", 0.), ("desired", 0.)]:
+            grown = np.full((len(self.ps), nrows, 5), fill)
+            grown[:, :size] = getattr(self, name)
+            setattr(self, name, grown)
+        self.count = np.concatenate([self.count, np.zeros(nrows - size, dtype=np.int64)])
+
+    def add(self, rows, values):
+        """Adds one value to every row in rows; NaN values are skipped."""
+        rows = np.asarray(rows, dtype=np.int64)
+        values = np.asarray(values, dtype=float)
+        self.grow(rows.max() + 1 if len(rows) else 0)
+        rows, values = rows[~np.isnan(values)], values[~np.isnan(values)]
+
+        # The first five values of a row are stored as they are and sorted into the initial markers
+        init = self.count[rows] < 5
+        r = rows[init]
+        self.q[:, r, self.count[r]] = values[init]
+        self.count[r] += 1
+        full = r[self.count[r] == 5]
+        self.q[:, full] = np.sort(self.q[:, full], axis=-1)
+        self.n[:, full] = np.arange(1, 6)
+        self.desired[:, full] = 1 + 4 * self.dn[:, None, :]
+
+        # Later values move the markers, (npercentiles, nrows, 5)
+        r, x = rows[~init], values[~init]
+        if not len(r):
+            return
+        self.count[r] += 1
+        q, n = self.q[:, r], self.n[:, r]
+        desired = self.desired[:, r] + self.dn[:, None, :]
+        q[..., 0] = np.minimum(q[..., 0], x)
+        q[..., 4] = np.maximum(q[..., 4], x)
+        cell = (x[None, :, None] >= q[..., 1:4]).sum(axis=-1)
+        n += np.arange(5) > cell[..., None]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for i in (1, 2, 3):
+                qi, qm, qp = q[..., i], q[..., i - 1], q[..., i + 1]
+                ni, nm, np_ = n[..., i], n[..., i - 1], n[..., i + 1]
+                d = desired[..., i] - ni
+                up = (d >= 1) & (np_ - ni > 1)
+                move = up | ((d <= -1) & (nm - ni < -1))
+                s = np.where(up, 1., -1.)
+                parabolic = qi + s / (np_ - nm) * ((ni - nm + s) * (qp - qi) / (np_ - ni) +
+                                                   (np_ - ni - s) * (qi - qm) / (ni - nm))
+                linear = qi + s * (np.where(up, qp, qm) - qi) / (np.where(up, np_, nm) - ni)
+                adjusted = np.where((qm < parabolic) & (parabolic < qp), parabolic, linear)
+                q[..., i] = np.where(move, adjusted, qi)
+                n[..., i] = np.where(move, ni + s, ni)
+        self.q[:, r], self.n[:, r], self.desired[:, r] = q, n, desired
+
+    def get(self, nrows):
+        """Returns the percentiles of the first nrows rows, (npercentiles, nrows); rows without values give NaN."""
+        self.grow(nrows)
+        percentiles = np.full((len(self.ps), nrows), np.nan)
+        count = self.count[:nrows]
+        estimated = count >= 5
+        # The outer markers are the exact minimum and maximum
+        markers = np.where(self.ps == 0, 0, np.where(self.ps == 1, 4, 2))
+        for k, marker in enumerate(markers):
+            percentiles[k, estimated] = self.q[k, :nrows][estimated, marker]
+        few = (count > 0) & ~estimated
+        if few.any():
+            percentiles[:, few] = np.nanpercentile(self.q[0, :nrows][few], 100 * self.ps, axis=1)
+        return percentiles
+
+
+class ExactPercentiles():
+    """Exact percentiles of the values added to every row, kept as float32 values in a (row, member) matrix.
+
+    Memory grows with the number of members: 4 bytes per row and member (about 1.5 MB per variable for 1000 members
+    over a year).
+    """
+    def __init__(self, percentiles, nrows=366):
+        self.percentiles = list(percentiles)
+        self.values = np.full((nrows, 64), np.nan, dtype=np.float32)
+        self.nmembers = 0
+
+    def grow(self, nrows, ncols):
+        # Capacity is doubled when needed, so that adding a member is amortized O(1)
+        if nrows <= self.values.shape[0] and ncols <= self.values.shape[1]:
+            return
+        shape = [size if n <= size else max(n, 2 * size) for n, size in zip((nrows, ncols), self.values.shape)]
+        grown = np.full(shape, np.nan, dtype=np.float32)
+        grown[:self.values.shape[0], :self.values.shape[1]] = self.values
+        self.values = grown
+
+    def add(self, rows, values):
+        """Adds the values of one member to the rows in rows."""
+        rows = np.asarray(rows, dtype=np.int64)
+        self.grow(rows.max() + 1 if len(rows) else 0, self.nmembers + 1)
+        self.values[rows, self.nmembers] = values
+        self.nmembers += 1
+
+    def get(self, nrows):
+        """Returns the percentiles of the first nrows rows, (npercentiles, nrows); rows without values give NaN."""
+        self.grow(nrows, self.nmembers)
+        values = self.values[:nrows, :self.nmembers]
+        percentiles = np.full((len(self.percentiles), nrows), np.nan)
+        has_values = ~np.isnan(values).all(axis=1)
+        if has_values.any():
+            percentiles[:, has_values] = np.nanpercentile(values[has_values], self.percentiles, axis=1)
+        return percentiles
+
+
+class PercentileSink():
+    """Reduces the output of an ensemble to percentiles across its members while the runs complete.
+
+    Only the selected (scalar) daily and summary variables of every added run are used; the rest of its output is
+    dropped right away. By default the percentiles are streaming P-square estimates (P2Percentiles), so memory only
+    grows with the number of days and not with the number of members. With exact=True every value is kept
+    (ExactPercentiles) and the percentiles are exact, at 4 bytes per day and member for every daily variable.
+    """
+    def __init__(self, daily_vars, summary_vars, percentiles=(5, 25, 50, 75, 95), exact=False):
+        self.daily_vars = list(daily_vars)
+        self.summary_vars = list(summary_vars)
+        self.percentiles = list(percentiles)
+        self.exact = exact
+        self.days = {}
+        self.nmembers = 0
+        self.nsummary_rows = 0
+        estimator = ExactPercentiles if exact else P2Percentiles
+        self.daily = {var: estimator(self.percentiles) for var in self.daily_vars}
+        self.summary = {var: estimator(self.percentiles, nrows=1) for var in self.summary_vars}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @staticmethod
+    def get_values(rows, var):
+        values = np.array([np.nan if row.get(var) is None else row[var] for row in rows], dtype=np.float32)
+        if values.ndim != 1:
+            raise Exception(f"Error: {var} is not a scalar output variable (per-layer variables are not supported)")
+        return values
+
+    def add(self, run_id, output, summary, run_attrs=None):
+        self.nmembers += 1
+        ind = np.array([self.days.setdefault(row["day"], len(self.days)) for row in output], dtype=np.int64)
+        for var in self.daily_vars:
+            self.daily[var].add(ind, self.get_values(output, var))
+        self.nsummary_rows = max(self.nsummary_rows, len(summary))
+        for var in self.summary_vars:
+            self.summary[var].add(np.arange(len(summary)), self.get_values(summary, var))
+
+    def get_daily_percentiles(self):
+        """Returns the percentiles of the daily variables: one row per day and a <var>_p<percentile> column per
+        variable and percentile."""
+        days = sorted(self.days)
+        ind = [self.days[day] for day in days]
+        columns = {"day": days}
+        for var in self.daily_vars:
+            percentiles = self.daily[var].get(len(self.days))[:, ind]
+            for p, percentile in zip(self.percentiles, percentiles):
+                columns[f"{var}_p{p:g}"] = percentile
+        return pd.DataFrame(columns).set_index("day")
+
+    def get_summary_percentiles(self):
+        """Returns the percentiles of the summary variables: one row per percentile (and summary row, e.g. crop
+        cycle) and one column per variable."""
+        nrows = self.nsummary_rows
+        index = pd.MultiIndex.from_product([range(nrows), self.percentiles], names=["row", "percentile"])
+        columns = {var: self.summary[var].get(nrows).T.ravel() for var in self.summary_vars}
+        return pd.DataFrame(columns, index=index)
+
+    def close(self):
+        pass
@@ -0,0 +1,24 @@
+import pandas as pd
+
+class PostProcessor():
+    """Optional post-processing of simulation output: reading back the Parquet output, figures and Excel export."""
+    def read_output(self, output_dir, table="daily", run_ids=None):
+        filters = [("run_id", "in", list(run_ids))] if run_ids is not None else None
+        df = pd.read_parquet(output_dir / table, filters=filters)
+        return df
+
+    def plot_timeseries(self, df, fig_fp, panels, dpi=600):
+        """Plots one panel per (title, series) item of panels; series is a list of (variable, label, plot kwargs)."""
+        import matplotlib.pyplot as plt
+        fig, axs = plt.subplots(nrows=1, ncols=len(panels), figsize=(16, 8), squeeze=False)
+        for ax, (title, series) in zip(axs[0], panels):
+            for var, label, kwargs in series:
+                df[var].plot(ax=ax, label=label, **kwargs)
+            ax.set_title(title)
+        r = axs[0, -1].legend()
+        fig.autofmt_xdate()
+        fig.savefig(fig_fp, dpi=dpi)
+        plt.close(fig)
+
+    def export_excel(self, df, output_fp):
+        df.to_excel(output_fp)
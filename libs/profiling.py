@@ -0,0 +1,100 @@
+from contextlib import contextmanager
+import csv
+import functools
+import json
+import os
+import sys
+import time
+from pathlib import Path
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak RSS is then not reported
+    resource = None
+
+def get_peak_rss_mb():
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak_rss / 1024 ** 2 if sys.platform == "darwin" else peak_rss / 1024
+
+
+class StageProfiler():
+    """Opt-in wall time, call count and peak RSS per stage of the run pipeline.
+
+    Profiling is off unless enable() is called or the environment variable WOFOST_PROFILE is set (to anything but 0);
+    when off, stages are not timed at all. Stages that run inside another stage are reported as "<outer>/<inner>", so the
+    time of an outer stage includes that of its inner stages. The peak RSS of a stage is the peak RSS of the process
+    at the end of the stage.
+    """
+    env_var = "WOFOST_PROFILE"
+
+    def __init__(self, enabled=None):
+        if enabled is None:
+            enabled = os.environ.get(self.env_var, "0") not in ("", "0")
+        self.enabled = enabled
+        self.reset()
+
+    def enable(self):
+        self.enabled = True
+
+    def reset(self):
+        self.stages = {}
+        self.stack = []
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        self.stack.append(name)
+        key = "/".join(self.stack)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - t0
+            self.stack.pop()
+            stats = self.stages.setdefault(key, {"stage": key, "calls": 0, "wall_time_s": 0., "peak_rss_mb": None})
+            stats["calls"] += 1
+            stats["wall_time_s"] += wall_time
+            stats["peak_rss_mb"] = get_peak_rss_mb()
+
+    def profiled(self, name=None):
+        """Decorator that runs every call of the decorated function as a stage (named after the function by default)."""
+        def decorator(func):
+            stage_name = name or func.__qualname__
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self.stage(stage_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def get_report(self, run_id):
+        return {"run_id": run_id, "peak_rss_mb": get_peak_rss_mb(), "stages": list(self.stages.values())}
+
+    def write_report(self, report_dir, run_id):
+        """Writes the report of a run to <report_dir>/profile_<run_id>.json and .csv; does nothing when disabled."""
+        if not self.enabled:
+            return None
+        report_dir = Path(report_dir)
+        report_dir.mkdir(parents=True, exist_ok=True)
+        report = self.get_report(run_id)
+        report_fp = report_dir / f"profile_{run_id}.json"
+        with open(report_fp, "w") as f:
+            json.dump(report, f, indent=1)
+        with open(report_fp.with_suffix(".csv"), "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["run_id", "stage", "calls", "wall_time_s", "peak_rss_mb"])
+            writer.writeheader()
+            for stats in report["stages"]:
+                writer.writerow({"run_id": run_id, **stats})
+        print(f"Profile of run {run_id} written to {report_fp}")
+        return report_fp
+
+
+# Profiler shared by the data providers and the run scripts
+profiler = StageProfiler()
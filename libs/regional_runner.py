@@ -0,0 +1,118 @@
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from libs.BOFEK2020DataProvider import BOFEK2020DataProvider
+from libs.ensemble_runner import EnsembleRunner
+from libs.gridded_weather import GriddedWeatherDataProvider
+
+class RegionalRunner():
+    """Regional simulations for many fields (points or polygons) with soils from the BOFEK2020 soil map.
+
+    The BOFEK2020 polygons map onto only 368 iProfile soil profiles, so fields are grouped by (iProfile, weather cell,
+    agromanagement): every unique combination is simulated once and its results are mapped back to all member fields.
+    Weather comes either from a single weather file (one weather cell for all fields) or from a gridded weather store
+    (the nearest grid cell of each field). With a region (see BOFEK2020DataProvider.get_bofek2020_data), only the
+    part of the soil map around the fields is read; with lookup "raster", soil codes are read from the rasterized soil
+    map (see BOFEK2020DataProvider.get_soilcodes).
+    """
+    def __init__(self, model, bofek_dir, staring_series_dir, RDMCR, site, weather_fp=None, weather_store=None,
+                 max_workers=None, progress_interval=10, region=None, simplify_tolerance=None, lookup="polygon"):
+        if (weather_fp is None) == (weather_store is None):
+            raise Exception("Error: a RegionalRunner needs either a weather_fp or a weather_store")
+        self.model = model
+        self.bofek_dir = bofek_dir
+        self.staring_series_dir = staring_series_dir
+        self.RDMCR = RDMCR
+        self.site = site
+        self.weather_fp = weather_fp
+        self.weather_store = weather_store
+        self.region = region
+        self.simplify_tolerance = simplify_tolerance
+        self.lookup = lookup
+        self.runner = EnsembleRunner(max_workers=max_workers, progress_interval=progress_interval)
+
+    def get_members(self, fields, agro_fps):
+        """Returns one row per field with its lat, lon, iProfile, weather cell, agromanagement and the run_id of its
+        unique simulation (None for fields outside the soil map or the weather grid).
+
+        fields is a sequence/array of (lat, lon) pairs or a GeoDataFrame; agro_fps is one agromanagement file for all
+        fields or one per field.
+        """
+        lats, lons = BOFEK2020DataProvider.get_latlons(fields)
+        soilids = BOFEK2020DataProvider.get_soilids(fields, self.bofek_dir, self.staring_series_dir, self.RDMCR,
+                                                    self.region, self.simplify_tolerance, self.lookup)
+        if isinstance(agro_fps, (str, Path)):
+            agro_fps = [agro_fps] * len(lats)
+        agro_fps = [str(agro_fp) for agro_fp in agro_fps]
+        if self.weather_store is not None:
+            store = GriddedWeatherDataProvider.get_store(self.weather_store)
+            cells = [store.get_index(lat, lon) if store.contains(lat, lon) else None
+                     for lat, lon in zip(lats, lons)]
+        else:
+            cells = [(0, 0)] * len(lats)
+
+        agro_ids = {agro_fp: i for i, agro_fp in enumerate(dict.fromkeys(agro_fps))}
+        run_ids = [f"p{soilid}_c{cell[0]}_{cell[1]}_a{agro_ids[agro_fp]}"
+                   if soilid is not None and cell is not None else None
+                   for soilid, cell, agro_fp in zip(soilids, cells, agro_fps)]
+        members = pd.DataFrame({"member_id": np.arange(len(lats)), "lat": lats, "lon": lons,
+                                "iProfile": pd.array(soilids, dtype="Int64"),
+                                "weather_cell": [f"{cell[0]}_{cell[1]}" if cell is not None else None
+                                                 for cell in cells],
+                                "agro_fp": agro_fps,
+                                "run_id": run_ids})
+        return members
+
+    def get_runs(self, members, year=None, crop=None, cultivar=None):
+        """Returns one run (see EnsembleRunner) per unique run_id of members."""
+        staring_series_store = BOFEK2020DataProvider.get_staring_series_store(self.staring_series_dir, self.RDMCR)
+        nmembers = members.run_id.value_counts()
+        runs = []
+        for member in members.dropna(subset=["run_id"]).drop_duplicates("run_id").itertuples():
+            run = {"run_id": member.run_id,
+                   "model": self.model,
+                   "agro_fp": member.agro_fp,
+                   "soil": staring_series_store.get_soil_profile(soilid=int(member.iProfile)),
+                   "year": year,
+                   "crop": crop,
+                   "cultivar": cultivar,
+                   "site": self.site,
+                   "attrs": {"iProfile": int(member.iProfile), "weather_cell": member.weather_cell,
+                             "nmembers": int(nmembers[member.run_id])}}
+            if self.weather_store is not None:
+                # All members of a run share the weather of its grid cell
+                run.update(weather_store=self.weather_store, lat=member.lat, lon=member.lon)
+            else:
+                run["weather_fp"] = self.weather_fp
+            runs.append(run)
+        return runs
+
+    def run(self, fields, agro_fps, year=None, crop=None, cultivar=None, sink=None):
+        """Simulates every unique (iProfile, weather cell, agromanagement) combination of fields once.
+
+        Returns the members table, the results and the failed results of the unique runs. When a ParquetOutputSink is
+        given, the output goes to the sink and the members table is written to <output_dir>/members.parquet.
+        """
+        members = self.get_members(fields, agro_fps)
+        runs = self.get_runs(members, year, crop, cultivar)
+        print(f"{len(members)} fields, {members.run_id.isna().sum()} outside the soil map or weather grid, "
+              f"{len(runs)} unique runs")
+        results, failures = self.runner.run(runs, sink=sink)
+        if sink is not None:
+            sink.output_dir.mkdir(parents=True, exist_ok=True)
+            members.to_parquet(sink.output_dir / "members.parquet", index=False)
+        return members, results, failures
+
+    @staticmethod
+    def get_results_table(results, table="summary"):
+        """Returns the summary or daily output of results (not sent to a sink) as one DataFrame with a run_id column."""
+        key = "output" if table == "daily" else table
+        rows = [{"run_id": result["run_id"], **row} for result in results if result["status"] == "ok"
+                for row in result[key]]
+        return pd.DataFrame(rows)
+
+    @staticmethod
+    def map_to_members(members, df):
+        """Maps per-run output (a DataFrame with a run_id column) back to the member fields."""
+        df = df.drop(columns=[column for column in members.columns if column in df.columns and column != "run_id"])
+        return members.merge(df, on="run_id", how="left")
@@ -0,0 +1,74 @@
+import numpy as np
+from libs.chunked_store import ChunkedArrayStore
+from libs.profiling import profiler
+from libs.soil_profile_builder import SoilProfileBuilder
+from libs.SoilGridsDataProvider import SoilGridsDataProvider
+
+class SoilParameterCube():
+    """Regional cube of soil parameters on a regular lat/lon grid, computed from SoilGrids properties.
+
+    build() runs the SoilGridsDataProvider pipeline (pedotransfer functions of Wösten and Van Genuchten curves) for all
+    cells of a chunk of the grid at once and writes the (nlat, nlon, nlayers) parameters and (nlat, nlon, nlayers, npFs)
+    SMfromPF/CONDfromPF curves to a ChunkedArrayStore, one chunk at a time. Simulations then take the soil profile of a
+    cell from the store (see get_soil_yaml) without requests or recomputation.
+    """
+    cubes = {}
+    layer_vars = ["zmin", "zmax", "Thickness", "bdod", "clay", "silt", "sand", "phh2o", "OM", "FSOMI", "CNRatioSOMI",
+                  "CRAIRC", "theta_r", "alpha", "k_sat", "labda", "n", "theta_s"]
+    curve_vars = ["SMfromPF", "CONDfromPF"]
+
+    @classmethod
+    @profiler.profiled()
+    def build(cls, store_dir, source, lats, lons, RDMCR, chunks=(16, 16)):
+        """Computes the cube for the grid of lats x lons; source gives the SoilGrids properties of arrays of points
+        (get_values(lats, lons), as SoilGridsRasterSource). Only one chunk of the grid is held in memory at a time."""
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        sg = SoilGridsDataProvider
+        nlayers = len(sg.soilgrids_soillayers) + int(sg.get_zmax(sg.soilgrids_soillayers[-1]) < RDMCR)
+        variables = {var: (nlayers,) for var in cls.layer_vars}
+        variables.update({var: (nlayers, len(sg.pFs)) for var in cls.curve_vars})
+        attrs = {"RDMCR": RDMCR, "pFs": sg.pFs, "PFWiltingPoint": sg.PFWiltingPoint,
+                 "PFFieldCapacity": sg.PFFieldCapacity, "SurfaceConductivity": sg.SurfaceConductivity}
+        store = ChunkedArrayStore.create(store_dir, lats, lons, variables, chunks=chunks, attrs=attrs)
+        ci, cj = chunks
+        for i0 in range(0, len(lats), ci):
+            for j0 in range(0, len(lons), cj):
+                chunk_lats, chunk_lons = np.meshgrid(lats[i0:i0 + ci], lons[j0:j0 + cj], indexing="ij")
+                with profiler.stage("sample"):
+                    values = source.get_values(chunk_lats.ravel(), chunk_lons.ravel())
+                with profiler.stage("pipeline"):
+                    layers = sg.get_layer_table_from_values(values, chunk_lats.ravel(), chunk_lons.ravel(), RDMCR)
+                    sg.calculate_derived_soil_properties(layers)
+                    sg.get_vangenuchten_parameters(layers)
+                    sg.get_van_genuchten_water_retention_curves(layers)
+                with profiler.stage("write"):
+                    for var in cls.layer_vars + cls.curve_vars:
+                        store.write(var, i0, j0, layers[var].reshape(chunk_lats.shape + layers[var].shape[1:]))
+        cls.cubes.pop(str(store_dir), None)
+        return store
+
+    @classmethod
+    def get_store(cls, store_dir):
+        # Cubes are shared per process, so neighbouring cells share the chunk reads
+        key = str(store_dir)
+        if key not in cls.cubes:
+            cls.cubes[key] = ChunkedArrayStore(store_dir)
+        return cls.cubes[key]
+
+    @classmethod
+    def get_soil_yaml(cls, store_dir, lat, lon):
+        """Returns the soil YAML dict of the grid cell of lat, lon; points outside the cube raise."""
+        store = cls.get_store(store_dir)
+        if not store.contains(lat, lon):
+            raise Exception(f"Error: lat={lat}, lon={lon} is outside the soil parameter cube {store_dir}")
+        i, j = store.get_index(lat, lon)
+        cell = {var: store.read_cell(var, i, j) for var in ["Thickness", "CNRatioSOMI", "CRAIRC", "FSOMI", "bdod",
+                                                             "phh2o"] + cls.curve_vars}
+        if np.isnan(cell["SMfromPF"]).any():
+            raise Exception(f"Error: no SoilGrids data in the cell of lat={lat}, lon={lon} in {store_dir}")
+        attrs = store.attrs
+        builder = SoilProfileBuilder(attrs["pFs"], attrs["PFWiltingPoint"], attrs["PFFieldCapacity"],
+                                     attrs["SurfaceConductivity"])
+        return builder.build(cell["Thickness"], cell["SMfromPF"], cell["CONDfromPF"], cell["CNRatioSOMI"],
+                             cell["CRAIRC"], cell["FSOMI"], cell["bdod"], cell["phh2o"])
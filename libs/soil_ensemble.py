@@ -0,0 +1,108 @@
+import copy
+import numpy as np
+from libs.soil_profile_builder import SoilProfileBuilder
+from libs.staring_series_store import StaringSeriesStore
+from libs.water_retention_curves import VanGenuchten
+
+class SoilHydraulicEnsemble():
+    """Monte Carlo ensemble of a soil profile with uncertain Van Genuchten parameters.
+
+    The parameters of every layer (named as in StaringReeksPARS_2018.csv) are perturbed around their nominal values:
+    Alpha, Ksfit and Npar - 1 with log-normal noise (sds in log units), Lambda, WCr and WCs with normal noise (sds in
+    their own units). All members x layers are sampled in one step, optionally with correlated noise (corr is the 6 x 6
+    correlation matrix of the noise of params), and all their retention and conductivity curves are computed at once.
+    """
+    params = ["Alpha", "Npar", "Lambda", "Ksfit", "WCr", "WCs"]
+    log_params = ["Alpha", "Npar", "Ksfit"]
+    sds = {"Alpha": 0.3, "Npar": 0.1, "Lambda": 1.0, "Ksfit": 0.5, "WCr": 0.01, "WCs": 0.02}
+    layer_params = ["Thickness", "CNRatioSOMI", "CRAIRC", "FSOMI", "RHOD", "Soil_pH"]
+
+    def __init__(self, layers, pFs, PFWiltingPoint, PFFieldCapacity, SurfaceConductivity, sds=None, corr=None):
+        nlayers = len(layers["Thickness"])
+        self.layers = {name: np.broadcast_to(np.asarray(layers[name], dtype=float), (nlayers,))
+                       for name in self.layer_params + self.params}
+        self.pFs = np.asarray(pFs, dtype=float)
+        self.builder = SoilProfileBuilder(pFs, PFWiltingPoint, PFFieldCapacity, SurfaceConductivity)
+        self.sds = {**self.sds, **(sds or {})}
+        self.chol = np.linalg.cholesky(np.asarray(corr, dtype=float)) if corr is not None else None
+
+    @classmethod
+    def from_bofek2020(cls, provider, **kwargs):
+        """Ensemble around the Staring series profile of a BOFEK2020DataProvider (one computed without a cache hit)."""
+        layers = provider.layers
+        if layers is None:
+            raise Exception("Error: the BOFEK2020DataProvider has no layer parameters (taken from a profile cache)")
+        layers = {"Thickness": layers["Thickness"], "CNRatioSOMI": StaringSeriesStore.CNRatioSOMI,
+                  "CRAIRC": StaringSeriesStore.CRAIRC, "FSOMI": StaringSeriesStore.FSOMI,
+                  "RHOD": StaringSeriesStore.RHOD, "Soil_pH": StaringSeriesStore.Soil_pH,
+                  **{param: layers[param] for param in cls.params}}
+        return cls(layers, provider.pFs, provider.PFWiltingPoint, provider.PFFieldCapacity,
+                   provider.SurfaceConductivity, **kwargs)
+
+    @classmethod
+    def from_soilgrids(cls, provider, **kwargs):
+        """Ensemble around the Wösten pedotransfer estimates of a SoilGridsDataProvider (one computed without a cache
+        hit)."""
+        layers = provider.layers
+        if layers is None:
+            raise Exception("Error: the SoilGridsDataProvider has no layer table (taken from a profile cache)")
+        layers = {"Thickness": layers["Thickness"], "CNRatioSOMI": layers["CNRatioSOMI"], "CRAIRC": layers["CRAIRC"],
+                  "FSOMI": layers["FSOMI"], "RHOD": layers["bdod"], "Soil_pH": layers["phh2o"],
+                  "Alpha": layers["alpha"], "Npar": layers["n"], "Lambda": layers["labda"], "Ksfit": layers["k_sat"],
+                  "WCr": layers["theta_r"], "WCs": layers["theta_s"]}
+        return cls(layers, provider.pFs, provider.PFWiltingPoint, provider.PFFieldCapacity,
+                   provider.SurfaceConductivity, **kwargs)
+
+    def sample(self, nmembers, seed=None):
+        """Returns the sampled parameters as (nmembers, nlayers) arrays."""
+        rng = np.random.default_rng(seed)
+        nlayers = len(self.layers["Thickness"])
+        noise = rng.standard_normal((nmembers, nlayers, len(self.params)))
+        if self.chol is not None:
+            noise = noise @ self.chol.T
+        samples = {}
+        for k, param in enumerate(self.params):
+            nominal = self.layers[param]
+            delta = self.sds[param] * noise[:, :, k]
+            if param == "Npar":
+                samples[param] = 1 + (nominal - 1) * np.exp(delta)
+            elif param in self.log_params:
+                samples[param] = nominal * np.exp(delta)
+            else:
+                samples[param] = nominal + delta
+        # Keep the water contents physical: 0 <= WCr < WCs <= 1
+        samples["WCs"] = np.clip(samples["WCs"], 0.05, 1.)
+        samples["WCr"] = np.clip(samples["WCr"], 0., samples["WCs"] - 0.01)
+        return samples
+
+    def get_curves(self, samples):
+        """Returns the SMfromPF and CONDfromPF curves of all members as (nmembers, nlayers, npFs) arrays."""
+        vgn = VanGenuchten()
+        shape = samples["Alpha"].shape + (len(self.pFs),)
+        flat = {param: values.ravel() for param, values in samples.items()}
+        SMfromPF = vgn.calculate_soil_moisture_content_matrix(self.pFs, flat["Alpha"], flat["Npar"], flat["WCr"],
+                                                              flat["WCs"])
+        CONDfromPF = vgn.calculate_log10_hydraulic_conductivity_matrix(self.pFs, flat["Alpha"], flat["Lambda"],
+                                                                       flat["Ksfit"], flat["Npar"])
+        return SMfromPF.reshape(shape), CONDfromPF.reshape(shape)
+
+    def get_soil_yamls(self, nmembers, seed=None):
+        """Returns the sampled parameters and one soil YAML dict per member."""
+        samples = self.sample(nmembers, seed)
+        SMfromPF, CONDfromPF = self.get_curves(samples)
+        layers = self.layers
+        soil_yamls = [self.builder.build(layers["Thickness"], SMfromPF[i], CONDfromPF[i], layers["CNRatioSOMI"],
+                                         layers["CRAIRC"], layers["FSOMI"], layers["RHOD"], layers["Soil_pH"])
+                      for i in range(nmembers)]
+        return samples, soil_yamls
+
+    def get_runs(self, base_run, nmembers, seed=None):
+        """Returns the sampled parameters and one run (see EnsembleRunner) per member: base_run with the soil of the
+        member, a run_id m<member> and the member in attrs."""
+        samples, soil_yamls = self.get_soil_yamls(nmembers, seed)
+        runs = []
+        for i, soil_yaml in enumerate(soil_yamls):
+            run = copy.copy(base_run)
+            run.update(run_id=f"m{i:05d}", soil=soil_yaml, attrs={**base_run.get("attrs", {}), "member": i})
+            runs.append(run)
+        return samples, runs
@@ -0,0 +1,82 @@
+import numpy as np
+
+class SoilProfileBuilder():
+    """Builds PCSE soil profile dicts (the soil_yaml of the soil data providers) directly from per-layer arrays.
+
+    All layer parameters are given as arrays with one value per layer (scalars apply to all layers) and the water
+    retention and conductivity curves as (nlayers, npFs) matrices on the pF grid of the builder. The subsoil gets the
+    properties of the deepest layer. Every profile is validated before it is returned.
+    """
+    layer_params = ["Thickness", "CNRatioSOMI", "CRAIRC", "FSOMI", "RHOD", "Soil_pH"]
+
+    def __init__(self, pFs, PFWiltingPoint, PFFieldCapacity, SurfaceConductivity):
+        self.pFs = np.asarray(pFs, dtype=float)
+        self.PFWiltingPoint = float(PFWiltingPoint)
+        self.PFFieldCapacity = float(PFFieldCapacity)
+        self.SurfaceConductivity = float(SurfaceConductivity)
+        if np.any(np.diff(self.pFs) <= 0):
+            raise Exception("Error: the pF grid of a soil profile should be strictly increasing")
+        if not self.pFs[0] <= self.PFFieldCapacity < self.PFWiltingPoint <= self.pFs[-1]:
+            raise Exception("Error: PFFieldCapacity should be smaller than PFWiltingPoint and both should be on the "
+                            "pF grid")
+        if not self.SurfaceConductivity > 0:
+            raise Exception("Error: SurfaceConductivity should be positive")
+
+    def build(self, Thickness, SMfromPF, CONDfromPF, CNRatioSOMI, CRAIRC, FSOMI, RHOD, Soil_pH, RDMSOL=None):
+        SMfromPF = np.asarray(SMfromPF, dtype=float)
+        CONDfromPF = np.asarray(CONDfromPF, dtype=float)
+        nlayers = len(Thickness)
+        params = {}
+        for name, values in zip(self.layer_params, [Thickness, CNRatioSOMI, CRAIRC, FSOMI, RHOD, Soil_pH]):
+            params[name] = np.broadcast_to(np.asarray(values, dtype=float), (nlayers,))
+        self.validate_layers(params, SMfromPF, CONDfromPF)
+        if RDMSOL is None:
+            RDMSOL = params["Thickness"].sum()
+
+        # Layers are built from plain Python lists, so that the profile holds no numpy types
+        columns = {name: values.tolist() for name, values in params.items()}
+        SM_tables = self.make_tables(SMfromPF)
+        COND_tables = self.make_tables(CONDfromPF)
+        soil_layers = [self.get_layer(columns, SM_tables, COND_tables, i) for i in range(nlayers)]
+        soil_profile = {
+            "RDMSOL": float(RDMSOL),
+            "SoilProfileDescription": {
+                "PFWiltingPoint": self.PFWiltingPoint,
+                "PFFieldCapacity": self.PFFieldCapacity,
+                "SurfaceConductivity": self.SurfaceConductivity,
+                "GroundWater": False,
+                "SoilLayers": soil_layers,
+                "SubSoilType": self.get_layer(columns, SM_tables, COND_tables, nlayers - 1),
+            },
+        }
+        return soil_profile
+
+    def get_layer(self, columns, SM_tables, COND_tables, i):
+        layer = {name: columns[name][i] for name in self.layer_params}
+        layer["SMfromPF"] = list(SM_tables[i])
+        layer["CONDfromPF"] = list(COND_tables[i])
+        return layer
+
+    def make_tables(self, matrix):
+        # Flat [pF0, v0, pF1, v1, ...] table per layer
+        tables = np.empty((matrix.shape[0], 2 * len(self.pFs)))
+        tables[:, 0::2] = self.pFs
+        tables[:, 1::2] = matrix
+        return tables.tolist()
+
+    def validate_layers(self, params, SMfromPF, CONDfromPF):
+        nlayers = len(params["Thickness"])
+        if nlayers == 0:
+            raise Exception("Error: a soil profile should have at least one layer")
+        for name, values in params.items():
+            if not np.all(np.isfinite(values)):
+                raise Exception(f"Error: {name} of a soil layer should be a finite number")
+        if np.any(params["Thickness"] <= 0):
+            raise Exception("Error: the Thickness of a soil layer should be positive")
+        for name, matrix in [("SMfromPF", SMfromPF), ("CONDfromPF", CONDfromPF)]:
+            if matrix.shape != (nlayers, len(self.pFs)):
+                raise Exception(f"Error: {name} should have one value per soil layer and pF, got shape {matrix.shape}")
+            if not np.all(np.isfinite(matrix)):
+                raise Exception(f"Error: {name} of a soil layer contains NaN or infinite values")
+        if np.any((SMfromPF < 0) | (SMfromPF > 1)):
+            raise Exception("Error: SMfromPF of a soil layer should be between 0 and 1")
@@ -0,0 +1,60 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+class SoilProfileCache():
+    """Disk and memory cache of generated soil profile dicts (the soil_yaml of the soil data providers).
+
+    Entries are content-addressed: the key is the SHA-256 hash of the data source, the version of its source files,
+    the soil code (or the rounded lat/lon), RDMCR and the pF grid, so a changed source file or setting simply gives new
+    keys. Entries are JSON files in <cache_dir>/<key[:2]>/<key>.json and are kept in memory once read.
+    """
+    # Increase when the way soil profiles are generated changes, so that old entries are no longer used
+    format_version = 2
+
+    def __init__(self, cache_dir, ndigits=4):
+        self.cache_dir = Path(cache_dir)
+        self.ndigits = ndigits
+        self.entries = {}
+
+    @staticmethod
+    def get_file_version(fp):
+        # File size and modification time identify a version of a source file without reading it
+        fp = Path(fp)
+        if not fp.exists():
+            return f"{fp.name}:missing"
+        stat = fp.stat()
+        return f"{fp.name}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def get_key(self, source, version, RDMCR, pFs, soilcode=None, lat=None, lon=None):
+        parts = {"format_version": self.format_version, "source": source, "version": version, "RDMCR": float(RDMCR),
+                 "pFs": [float(pF) for pF in pFs]}
+        if soilcode is not None:
+            parts["soilcode"] = str(soilcode).strip()
+        else:
+            parts["lat"] = round(float(lat), self.ndigits)
+            parts["lon"] = round(float(lon), self.ndigits)
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+    def get_fp(self, key):
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key):
+        if key not in self.entries:
+            fp = self.get_fp(key)
+            if not fp.exists():
+                return None
+            with open(fp) as f:
+                self.entries[key] = json.load(f)
+        return self.entries[key]
+
+    def put(self, key, value):
+        self.entries[key] = value
+        fp = self.get_fp(key)
+        fp.parent.mkdir(parents=True, exist_ok=True)
+        # Written to a temporary file first, so that parallel workers never read a partially written entry
+        tmp_fp = fp.with_name(f"{fp.stem}.tmp{os.getpid()}.json")
+        with open(tmp_fp, "w") as f:
+            json.dump(value, f)
+        os.replace(tmp_fp, fp)
@@ -0,0 +1,71 @@
+import json
+import time
+import sqlalchemy as sa
+
+class SoilGridsResponseCache():
+    """On-disk cache of raw SoilGrids properties/query responses, stored in SQLite.
+
+    Entries are keyed by the rounded latitude/longitude plus the requested properties and depths. Entries older than
+    ttl seconds are dropped on access, and when the total size of the cached responses exceeds max_size bytes the
+    least recently used entries are evicted.
+    """
+    def __init__(self, db_fp, ttl=30 * 24 * 3600., max_size=256 * 1024 ** 2, ndigits=4):
+        self.db_fp = db_fp
+        self.ttl = ttl
+        self.max_size = max_size
+        self.ndigits = ndigits
+        self.engine = sa.create_engine(f"sqlite:///{db_fp}")
+        metadata = sa.MetaData()
+        self.responses = sa.Table("responses", metadata,
+                                  sa.Column("key", sa.String, primary_key=True),
+                                  sa.Column("response", sa.Text, nullable=False),
+                                  sa.Column("size", sa.Integer, nullable=False),
+                                  sa.Column("created", sa.Float, nullable=False),
+                                  sa.Column("accessed", sa.Float, nullable=False, index=True))
+        metadata.create_all(self.engine)
+
+    def get_key(self, lat, lon, properties, depths):
+        key = f"{lat:.{self.ndigits}f},{lon:.{self.ndigits}f}|{','.join(sorted(properties))}|{','.join(depths)}"
+        return key
+
+    def get(self, lat, lon, properties, depths):
+        key = self.get_key(lat, lon, properties, depths)
+        now = time.time()
+        with self.engine.begin() as conn:
+            row = conn.execute(sa.select(self.responses.c.response, self.responses.c.created)
+                               .where(self.responses.c.key == key)).first()
+            if row is None:
+                return None
+            if now - row.created > self.ttl:
+                conn.execute(sa.delete(self.responses).where(self.responses.c.key == key))
+                return None
+            conn.execute(sa.update(self.responses).where(self.responses.c.key == key).values(accessed=now))
+        return json.loads(row.response)
+
+    def put(self, lat, lon, properties, depths, response):
+        key = self.get_key(lat, lon, properties, depths)
+        text = json.dumps(response)
+        now = time.time()
+        with self.engine.begin() as conn:
+            conn.execute(sa.delete(self.responses).where(self.responses.c.key == key))
+            conn.execute(sa.insert(self.responses).values(key=key, response=text, size=len(text), created=now,
+                                                          accessed=now))
+        self.evict()
+
+    def evict(self):
+        now = time.time()
+        with self.engine.begin() as conn:
+            conn.execute(sa.delete(self.responses).where(self.responses.c.created < now - self.ttl))
+            total_size = conn.execute(sa.select(sa.func.coalesce(sa.func.sum(self.responses.c.size), 0))).scalar()
+            if total_size <= self.max_size:
+                return
+            rows = conn.execute(sa.select(self.responses.c.key, self.responses.c.size)
+                                .order_by(self.responses.c.accessed.desc())).all()
+            total_size = 0
+            evicted = []
+            for row in rows:
+                total_size += row.size
+                if total_size > self.max_size:
+                    evicted.append(row.key)
+            if evicted:
+                conn.execute(sa.delete(self.responses).where(self.responses.c.key.in_(evicted)))
@@ -0,0 +1,108 @@
+import asyncio
+import time
+import requests
+from libs.SoilGridsDataProvider import SoilGridsDataProvider
+
+class TokenBucket():
+    """Asyncio token bucket that hands out at most rate tokens per per seconds.
+
+    The bucket holds a single token, so tokens are spaced per / rate seconds apart and never come in a burst.
+    """
+    def __init__(self, rate=5, per=60.):
+        self.capacity = 1.
+        self.tokens = 1.
+        self.fill_rate = rate / per
+        self.timestamp = time.monotonic()
+        self.blocked_until = 0.
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.timestamp) * self.fill_rate)
+                self.timestamp = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.fill_rate)
+
+    def block(self, delay):
+        # Called when the server answers 429: no tokens are handed out until delay seconds have passed
+        now = time.monotonic()
+        self.blocked_until = max(self.blocked_until, now + delay)
+        self.tokens = 0.
+        self.timestamp = self.blocked_until
+
+
+class SoilGridsBatchFetcher():
+    """Fetches SoilGrids data for many coordinates while keeping to the API quota of 5 requests per minute.
+
+    Requests are scheduled through a token bucket and back off on HTTP 429 and 5xx responses, using the Retry-After
+    header or else an exponentially growing delay. As soon as a
+    response arrives, its parsing and pedotransfer computation run in a worker thread while later requests still wait
+    for a token.
+    """
+    def __init__(self, RDMCR, cache=None, request_url=SoilGridsDataProvider.request_url, rate=5, per=60.,
+                 max_retries=5, timeout=60.):
+        self.RDMCR = RDMCR
+        self.cache = cache
+        self.request_url = request_url
+        self.rate = rate
+        self.per = per
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+    def get_providers(self, coordinates):
+        """Returns one SoilGridsDataProvider per (lat, lon) pair, in input order.
+
+        A coordinate for which fetching or processing failed gets the raised exception instead of a provider.
+        """
+        return asyncio.run(self.fetch_all(coordinates))
+
+    async def fetch_all(self, coordinates):
+        bucket = TokenBucket(self.rate, self.per)
+        tasks = [self.fetch_provider(bucket, lat, lon) for lat, lon in coordinates]
+        providers = await asyncio.gather(*tasks, return_exceptions=True)
+        return providers
+
+    async def fetch_provider(self, bucket, lat, lon):
+        response = await self.fetch_response(bucket, lat, lon)
+        provider = await asyncio.to_thread(SoilGridsDataProvider, lat, lon, self.RDMCR, soilgridsdresult=response)
+        return provider
+
+    async def fetch_response(self, bucket, lat, lon):
+        props = SoilGridsDataProvider.soilgrids_vars
+        depths = SoilGridsDataProvider.soilgrids_soillayers
+        if self.cache is not None:
+            response = self.cache.get(lat, lon, props, depths)
+            if response is not None:
+                return response
+        params = {"lat": lat, "lon": lon, "property": props, "depth": depths}
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire()
+            res = await asyncio.to_thread(requests.get, self.request_url, params=params, timeout=self.timeout)
+            if res.status_code == 429:
+                bucket.block(self.get_retry_after(res, attempt))
+            elif res.status_code >= 500:
+                # Server errors are retried by this request only; other requests keep to the quota meanwhile
+                await asyncio.sleep(self.get_retry_after(res, attempt))
+            else:
+                break
+        else:
+            raise Exception(f"Error: SoilGrids API kept answering {res.status_code} for lat={lat}, lon={lon}")
+        res.raise_for_status()
+        response = res.json()
+        if self.cache is not None:
+            self.cache.put(lat, lon, props, depths, response)
+        return response
+
+    def get_retry_after(self, res, attempt=0):
+        try:
+            delay = float(res.headers["Retry-After"])
+        except (KeyError, ValueError):
+            delay = self.per / self.rate * 2 ** attempt
+        return delay
@@ -0,0 +1,110 @@
+import numpy as np
+import rasterio
+from rasterio.transform import rowcol
+from rasterio.warp import transform
+from rasterio.windows import Window
+from libs.soil_profile_cache import SoilProfileCache
+from libs.SoilGridsDataProvider import SoilGridsDataProvider
+
+class SoilGridsRasterSource():
+    """Offline SoilGrids backend that samples local GeoTIFF/VRT tiles instead of the REST API.
+
+    Tiles are expected at <tiles_dir>/<property>/<property>_<depth>_mean.tif (or .vrt), as in the SoilGrids WebDAV
+    download. Points are grouped per raster block so that every block is read once, however many points it holds.
+    get_responses() returns dicts with the structure of a properties/query response, so the remainder of the
+    SoilGridsDataProvider pipeline is unchanged.
+    """
+    d_factors = {"bdod": 100, "clay": 10, "phh2o": 10, "sand": 10, "silt": 10, "soc": 10, "nitrogen": 100}
+    extensions = [".tif", ".vrt"]
+
+    def __init__(self, tiles_dir):
+        self.tiles_dir = tiles_dir
+        self.datasets = {}
+        self.version = None
+
+    def get_dataset(self, var, depth):
+        key = (var, depth)
+        if key not in self.datasets:
+            for extension in self.extensions:
+                fp = self.tiles_dir / var / f"{var}_{depth}_mean{extension}"
+                if fp.exists():
+                    self.datasets[key] = rasterio.open(fp)
+                    break
+            else:
+                raise Exception(f"Error: no SoilGrids tile found for {var} at {depth} in {self.tiles_dir}")
+        return self.datasets[key]
+
+    def get_version(self):
+        """Returns the version (size and mtime) of every tile file, including the sources of VRT tiles, so that
+        replaced tiles give new soil profile cache keys."""
+        if self.version is None:
+            self.version = [SoilProfileCache.get_file_version(fp)
+                            for var in SoilGridsDataProvider.soilgrids_vars
+                            for depth in SoilGridsDataProvider.soilgrids_soillayers
+                            for fp in self.get_dataset(var, depth).files]
+        return self.version
+
+    def close(self):
+        for dataset in self.datasets.values():
+            dataset.close()
+        self.datasets = {}
+
+    def sample(self, dataset, lats, lons):
+        xs, ys = transform("EPSG:4326", dataset.crs, lons, lats)
+        rows, cols = rowcol(dataset.transform, xs, ys)
+        rows = np.asarray(rows)
+        cols = np.asarray(cols)
+        values = np.full(len(rows), np.nan)
+        inside = (rows >= 0) & (rows < dataset.height) & (cols >= 0) & (cols < dataset.width)
+        block_height, block_width = dataset.block_shapes[0]
+        block_ids = (rows // block_height) * (dataset.width // block_width + 1) + cols // block_width
+        for block_id in np.unique(block_ids[inside]):
+            ind = np.flatnonzero(inside & (block_ids == block_id))
+            row0 = rows[ind].min()
+            col0 = cols[ind].min()
+            window = Window(col0, row0, cols[ind].max() - col0 + 1, rows[ind].max() - row0 + 1)
+            data = dataset.read(1, window=window, masked=True)
+            block_values = data[rows[ind] - row0, cols[ind] - col0]
+            values[ind] = np.ma.filled(block_values.astype(float), np.nan)
+        return values
+
+    def get_raw_values(self, lats, lons):
+        # The stored (integer) values of every property as an (npoints, ndepths) array, NaN where there are no data
+        return {var: np.column_stack([self.sample(self.get_dataset(var, depth), lats, lons)
+                                      for depth in SoilGridsDataProvider.soilgrids_soillayers])
+                for var in SoilGridsDataProvider.soilgrids_vars}
+
+    def get_values(self, lats, lons):
+        """Returns the properties of all points as (npoints, ndepths) arrays in the units of the SoilGrids responses
+        after applying their d_factor (see SoilGridsDataProvider.get_layer_table_from_values)."""
+        lats = np.atleast_1d(np.asarray(lats, dtype=float))
+        lons = np.atleast_1d(np.asarray(lons, dtype=float))
+        return {var: values / self.d_factors[var] for var, values in self.get_raw_values(lats, lons).items()}
+
+    def get_responses(self, lats, lons):
+        lats = np.atleast_1d(np.asarray(lats, dtype=float))
+        lons = np.atleast_1d(np.asarray(lons, dtype=float))
+        responses = [{"type": "Feature",
+                      "geometry": {"type": "Point", "coordinates": [float(lon), float(lat)]},
+                      "properties": {"layers": []}} for lat, lon in zip(lats, lons)]
+        raw_values = self.get_raw_values(lats, lons)
+        for var in SoilGridsDataProvider.soilgrids_vars:
+            for i, response in enumerate(responses):
+                depths = []
+                for k, depth in enumerate(SoilGridsDataProvider.soilgrids_soillayers):
+                    value = raw_values[var][i, k]
+                    depths.append({"label": depth, "values": {"mean": None if np.isnan(value) else float(value)}})
+                response["properties"]["layers"].append({"name": var,
+                                                         "unit_measure": {"d_factor": self.d_factors[var]},
+                                                         "depths": depths})
+        return responses
+
+    def get_response(self, lat, lon):
+        return self.get_responses([lat], [lon])[0]
+
+    def get_providers(self, coordinates, RDMCR):
+        coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+        responses = self.get_responses(coordinates[:, 0], coordinates[:, 1])
+        providers = [SoilGridsDataProvider(lat, lon, RDMCR, soilgridsdresult=response)
+                     for (lat, lon), response in zip(coordinates, responses)]
+        return providers
@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+from libs.soil_profile_builder import SoilProfileBuilder
+from libs.soil_profile_cache import SoilProfileCache
+from libs.water_retention_curves import VanGenuchten
+
+class StaringSeriesStore():
+    """Precompiled soil profiles of the Staring series (all iProfiles of AllProfiles_368.csv).
+
+    compile() turns every profile into its layer thicknesses, Van Genuchten parameters and SMfromPF/CONDfromPF tables
+    for a given RDMCR and pF grid, and writes them as flat arrays to a single .npz file together with the version of
+    the source tables. Loading the store only builds two small lookup dicts, after which soil profiles are looked up by
+    iProfile or BodemCode without any pandas parsing.
+    """
+    ntopsoils = 18
+    max_layers = 9
+    CNRatioSOMI = 20.0
+    CRAIRC = 0.01
+    FSOMI = 0.03
+    RHOD = 1.0
+    Soil_pH = 5.
+    source_files = ["AllProfiles_368.csv", "BodemCode.csv", "StaringReeksPARS_2018.csv"]
+    vgn_params = ["Alpha", "Npar", "Lambda", "Ksfit", "WCr", "WCs"]
+
+    def __init__(self, store_fp):
+        self.store_fp = store_fp
+        with np.load(store_fp) as data:
+            self.RDMCR = float(data["RDMCR"])
+            self.pFs = data["pFs"]
+            self.header = data["header"]
+            self.soilids = data["soilids"]
+            self.layer_offsets = data["layer_offsets"]
+            self.thickness = data["thickness"]
+            self.SMfromPF = data["SMfromPF"]
+            self.CONDfromPF = data["CONDfromPF"]
+            self.layer_params = data["layer_params"] if "layer_params" in data.files else None
+            self.source_version = data["source_version"].tolist() if "source_version" in data.files else None
+            bodemcodes = data["bodemcodes"]
+            bodemcode_soilids = data["bodemcode_soilids"]
+        self.builder = SoilProfileBuilder(self.pFs, *self.header.tolist())
+        self.profile_index = {int(soilid): i for i, soilid in enumerate(self.soilids)}
+        self.bodemcode_soilids = {}
+        for bodemcode, soilid in zip(bodemcodes, bodemcode_soilids):
+            # The first occurrence of a BodemCode wins. Some codes in BodemCode.csv have trailing spaces that the
+            # shapefile does not have
+            self.bodemcode_soilids.setdefault(str(bodemcode).strip(), int(soilid))
+
+    @classmethod
+    def get_source_version(cls, staring_series_dir):
+        return [SoilProfileCache.get_file_version(staring_series_dir / name) for name in cls.source_files]
+
+    @classmethod
+    def get_staring_block(cls, isoil):
+        if isoil <= cls.ntopsoils:
+            staring_block = f"B{str(isoil).zfill(2)}"
+        else:
+            staring_block = f"O{str(isoil - cls.ntopsoils).zfill(2)}"
+        return staring_block
+
+    @classmethod
+    def compile(cls, staring_series_dir, RDMCR, pFs, PFWiltingPoint, PFFieldCapacity, SurfaceConductivity, store_fp):
+        # The version is taken before reading, so that a table changed while compiling gives a stale store
+        source_version = cls.get_source_version(staring_series_dir)
+        df_profiles = pd.read_csv(staring_series_dir / "AllProfiles_368.csv")
+        df_soilcode = pd.read_csv(staring_series_dir / "BodemCode.csv")
+        df_vgn = pd.read_csv(staring_series_dir / "StaringReeksPARS_2018.csv").set_index("Name")
+
+        isoils = df_profiles[[f"iSoil{i}" for i in range(1, cls.max_layers + 1)]].to_numpy()
+        zs = df_profiles[[f"iZ{i}" for i in range(1, cls.max_layers + 1)]].to_numpy().astype(float)
+        is_layer = (isoils != 0) & (zs != 99999)
+        nlayers = is_layer.sum(axis=1)
+
+        # Layers of all profiles are flattened; profiles shallower than RDMCR get one extra layer with the properties
+        # of their deepest layer
+        layer_isoil = []
+        thickness = []
+        layer_offsets = [0]
+        for i in range(len(df_profiles)):
+            z = zs[i, :nlayers[i]]
+            isoil = isoils[i, :nlayers[i]]
+            dz = np.diff(z, prepend=0.)
+            if z[-1] < RDMCR:
+                dz = np.append(dz, RDMCR - z[-1])
+                isoil = np.append(isoil, isoil[-1])
+            thickness.extend(dz)
+            layer_isoil.extend(isoil)
+            layer_offsets.append(len(thickness))
+
+        df_layers = df_vgn.loc[[cls.get_staring_block(isoil) for isoil in layer_isoil]]
+        vgn = VanGenuchten()
+        pFs = np.asarray(pFs, dtype=float)
+        SMfromPF = vgn.calculate_soil_moisture_content_matrix(pFs, df_layers.Alpha, df_layers.Npar, df_layers.WCr,
+                                                              df_layers.WCs)
+        CONDfromPF = vgn.calculate_log10_hydraulic_conductivity_matrix(pFs, df_layers.Alpha, df_layers.Lambda,
+                                                                       df_layers.Ksfit, df_layers.Npar)
+        np.savez(store_fp,
+                 RDMCR=RDMCR,
+                 pFs=pFs,
+                 header=np.array([PFWiltingPoint, PFFieldCapacity, SurfaceConductivity]),
+                 soilids=df_profiles.iProfile.to_numpy(),
+                 layer_offsets=np.array(layer_offsets),
+                 thickness=np.array(thickness),
+                 SMfromPF=SMfromPF,
+                 CONDfromPF=CONDfromPF,
+                 layer_params=df_layers[cls.vgn_params].to_numpy(dtype=float),
+                 source_version=np.array(source_version),
+                 bodemcodes=df_soilcode.BodemCode.to_numpy().astype(str),
+                 bodemcode_soilids=df_soilcode.iProfile.to_numpy())
+        return cls(store_fp)
+
+    def get_soilid(self, bodemcode):
+        return self.bodemcode_soilids[str(bodemcode).strip()]
+
+    def get_layer_slice(self, soilid=None, bodemcode=None):
+        if soilid is None:
+            soilid = self.get_soilid(bodemcode)
+        i = self.profile_index[int(soilid)]
+        return slice(self.layer_offsets[i], self.layer_offsets[i + 1])
+
+    def get_layers(self, soilid=None, bodemcode=None):
+        """Returns the Thickness and the Van Genuchten parameters (named as in StaringReeksPARS_2018.csv) of the layers
+        of a profile."""
+        layers = self.get_layer_slice(soilid, bodemcode)
+        return {"Thickness": self.thickness[layers],
+                **{param: self.layer_params[layers, k] for k, param in enumerate(self.vgn_params)}}
+
+    def get_soil_profile(self, soilid=None, bodemcode=None):
+        layers = self.get_layer_slice(soilid, bodemcode)
+        soil_profile = self.builder.build(self.thickness[layers], self.SMfromPF[layers], self.CONDfromPF[layers],
+                                          self.CNRatioSOMI, self.CRAIRC, self.FSOMI, self.RHOD, self.Soil_pH)
+        return soil_profile
@@ -1,55 +1,52 @@
-class Util:
-    def Afgen(self, x, table_function):
+from bisect import bisect_left
+import numpy as np
+
+class AfgenTable:
+    """Compiled table function.
+
+    The flat [x0, y0, x1, y1, ...] list is validated once and stored as arrays. Scalars are evaluated with a binary
+    search and arrays with np.interp; x values outside the table are clamped to the first or last y, as in Util.Afgen.
+    """
+    def __init__(self, table_function):
         if (len(table_function) % 2 != 0):
             raise Exception("Error: table function should have an even number of elements")
-        else:
-            # Do nothing and continue; table function has an even number of elements
-            pass
         if (len(table_function) < 4):
             raise Exception("Error: table function should have at least 4 elements (2 xs and 2 ys")
-        else:
-            # There are at least two x-y combinations in the table function. Extract the xs and ys
-            xs = [None] * int(len(table_function) / 2)
-            ys = [None] * int(len(table_function) / 2)
-            for i in range(0, len(table_function)):
-                if (i % 2 == 0):
-                    xs[int(i / 2)] = table_function[i]
-                else:
-                    ys[int((i - 1) / 2)] = table_function[i]
+        xs = [float(x) for x in table_function[0::2]]
+        ys = [float(y) for y in table_function[1::2]]
         for i in range(1, len(xs)):
             if (xs[i] < xs[i - 1]):
                 raise Exception("Error: a x element of a table function cannot be smaller than the previous x")
             elif (xs[i] == xs[i - 1]):
                 raise Exception("Error: a x element of a table function cannot be equal to the previous x")
-            else:
-                # Do nothing; for each x in xs, the value of x is higher than its previous value
-                pass
-        if (x < xs[0]):
-            x = xs[0]
-            # raise Exception("Error: x is smaller than the lowest value of x in the table function")
-        elif (x > xs[-1]):
-            x = xs[-1]
-            # raise Exception("Error: x is higher than the highest value of the x in the table function ")
-        else:
-            # Do nothing; for each x, the value is within of the defined range of xs in the table function.
-            pass
-
-        ind = 0
-        x0 = xs[ind]
-        x1 = xs[ind + 1]
-        y0 = ys[ind]
-        y1 = ys[ind + 1]
-
-        while (x > x1):
-            x0 = xs[ind]
-            x1 = xs[ind + 1]
-            y0 = ys[ind]
-            y1 = ys[ind + 1]
-            ind += 1
+        self.xs_list = xs
+        self.ys_list = ys
+        self.xs = np.array(xs)
+        self.ys = np.array(ys)
 
+    def __call__(self, x):
+        if not isinstance(x, (int, float)) and np.ndim(x) > 0:
+            return np.interp(x, self.xs, self.ys)
+        xs = self.xs_list
+        ys = self.ys_list
+        if (x <= xs[0]):
+            return ys[0]
+        elif (x >= xs[-1]):
+            return ys[-1]
+        ind = bisect_left(xs, x)
+        x0 = xs[ind - 1]
+        x1 = xs[ind]
+        y0 = ys[ind - 1]
+        y1 = ys[ind]
         y = y0 * ((x1 - x) / (x1 - x0)) + y1 * ((x - x0) / (x1 - x0))
         return y
 
+
+class Util:
+    def Afgen(self, x, table_function):
+        # For repeated evaluation of the same table, build an AfgenTable once and call that instead
+        return AfgenTable(table_function)(x)
+
     def make_string_table(XY_table):
         """Converts a list of X,Y pairs into a formatted string table.
         """
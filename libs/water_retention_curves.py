@@ -21,6 +21,33 @@ class VanGenuchten():
         COND = np.log10(k_h)
         return COND
 
+    def calculate_soil_moisture_content_matrix(self, pFs, alpha, n, theta_r, theta_s):
+        """Returns the soil moisture content as an (n_layers x n_pF) matrix.
+
+        The Van Genuchten parameters are vectors with one value per layer; they are broadcast against the pF vector.
+        """
+        pFs = np.asarray(pFs, dtype=float).reshape(1, -1)
+        alpha, n, theta_r, theta_s = [np.asarray(p, dtype=float).reshape(-1, 1) for p in (alpha, n, theta_r, theta_s)]
+        soil_moisture_content = self.calculate_soil_moisture_content(pFs, alpha, n, theta_r, theta_s)
+        return soil_moisture_content
+
+    def calculate_log10_hydraulic_conductivity_matrix(self, pFs, alpha, labda, k_sat, n):
+        """Returns the log10 of the hydraulic conductivity as an (n_layers x n_pF) matrix.
+
+        The Van Genuchten parameters are vectors with one value per layer; they are broadcast against the pF vector.
+        """
+        pFs = np.asarray(pFs, dtype=float).reshape(1, -1)
+        alpha, labda, k_sat, n = [np.asarray(p, dtype=float).reshape(-1, 1) for p in (alpha, labda, k_sat, n)]
+        COND = self.calculate_log10_hydraulic_conductivity(pFs, alpha, labda, k_sat, n)
+        return COND
+
+    def make_xy_tables(self, pFs, matrix):
+        """Converts an (n_layers x n_pF) matrix into one flat [pF, value, pF, value, ...] list per layer.
+        """
+        pFs = np.broadcast_to(np.asarray(pFs, dtype=float), np.shape(matrix))
+        XY_tables = np.stack([pFs, matrix], axis=-1).reshape(len(matrix), -1).tolist()
+        return XY_tables
+
     def make_string_table(self, XY_table):
         """Converts a list of X,Y pairs into a formatted string table.
         """
@@ -0,0 +1,116 @@
+from collections.abc import Mapping
+import datetime as dt
+import hashlib
+import json
+import numpy as np
+import os
+import shutil
+from pathlib import Path
+from pcse.base import WeatherDataContainer, WeatherDataProvider
+
+class MappedWeatherStore(Mapping):
+    """Read-only replacement of the store dict of a WeatherDataProvider, backed by memory-mapped daily arrays.
+
+    Keys are (day, member_id) like in the store of PCSE; the WeatherDataContainer of a day is only built when the day
+    is requested, and then kept.
+    """
+    def __init__(self, days, columns, latitude, longitude, elevation):
+        self.days = days
+        self.columns = columns
+        self.latitude = latitude
+        self.longitude = longitude
+        self.elevation = elevation
+        self.containers = {}
+
+    def __getitem__(self, key):
+        if key not in self.containers:
+            day, member_id = key
+            i = int(np.searchsorted(self.days, day.toordinal()))
+            if member_id != 0 or i == len(self.days) or self.days[i] != day.toordinal():
+                raise KeyError(key)
+            # NaN marks a variable that is missing on this day
+            values = {var: float(column[i]) for var, column in self.columns.items() if column[i] == column[i]}
+            self.containers[key] = WeatherDataContainer(LAT=self.latitude, LON=self.longitude, ELEV=self.elevation,
+                                                        DAY=day, **values)
+        return self.containers[key]
+
+    def __iter__(self):
+        return ((dt.date.fromordinal(ordinal), 0) for ordinal in self.days.tolist())
+
+    def __len__(self):
+        return len(self.days)
+
+
+class CachedWeatherDataProvider(WeatherDataProvider):
+    """Weather data provider that reads CSV/Excel weather files through a columnar binary cache.
+
+    The first time a weather file is seen it is parsed with the CSVWeatherDataProvider or ExcelWeatherDataProvider and
+    converted into one .npy array per weather variable plus a JSON file with the site characteristics (including the
+    Angstrom coefficients). The cache directory is keyed by the SHA-256 hash of the weather file, so a changed file gets
+    a new cache. Later loads memory-map the arrays and never parse the original file; the WeatherDataContainer of a day
+    is only built when a simulation requests that day (see MappedWeatherStore).
+    """
+    # Increase when the cache layout or contents change, so that old caches are no longer used
+    format_version = 2
+    site_attributes = ["latitude", "longitude", "elevation", "description", "angstA", "angstB", "ETmodel"]
+    variables = WeatherDataContainer.required + WeatherDataContainer.optional
+
+    def __init__(self, weather_fp, cache_dir=None):
+        WeatherDataProvider.__init__(self)
+        weather_fp = Path(weather_fp)
+        if cache_dir is None:
+            cache_dir = weather_fp.parent / "cache"
+        self.weather_fp = weather_fp
+        self.cache_fp = Path(cache_dir) / \
+            f"{weather_fp.stem}_{self.get_file_hash(weather_fp)[:16]}_v{self.format_version}"
+        if not (self.cache_fp / "site.json").exists():
+            self.write_cache()
+        self.read_cache()
+
+    def get_file_hash(self, fp):
+        h = hashlib.sha256()
+        with open(fp, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def write_cache(self):
+        # The pcse file readers are only needed the first time a weather file is seen. Their own pickle cache is
+        # bypassed, as it does not hold the Angstrom coefficients
+        from pcse.input import CSVWeatherDataProvider, ExcelWeatherDataProvider
+        if self.weather_fp.suffix.lower() == ".csv":
+            wdp = CSVWeatherDataProvider(self.weather_fp, force_reload=True)
+        else:
+            wdp = ExcelWeatherDataProvider(self.weather_fp, force_reload=True)
+        days = sorted(day for day, member_id in wdp.store.keys())
+        wdcs = [wdp(day) for day in days]
+        # The cache is written to a temporary directory that is renamed when complete, so that parallel workers never
+        # read a partially written cache
+        tmp_fp = self.cache_fp.with_name(f"{self.cache_fp.name}.tmp{os.getpid()}")
+        tmp_fp.mkdir(parents=True, exist_ok=True)
+        np.save(tmp_fp / "DAY.npy", np.array([day.toordinal() for day in days], dtype=np.int64))
+        variables = []
+        for var in self.variables:
+            values = np.array([getattr(wdc, var, np.nan) for wdc in wdcs], dtype=float)
+            if np.isnan(values).all():
+                continue
+            np.save(tmp_fp / f"{var}.npy", values)
+            variables.append(var)
+        site = {attr: getattr(wdp, attr) for attr in self.site_attributes}
+        site["variables"] = variables
+        with open(tmp_fp / "site.json", "w") as f:
+            json.dump(site, f)
+        try:
+            os.rename(tmp_fp, self.cache_fp)
+        except OSError:
+            # Another process has written the same cache in the meantime
+            shutil.rmtree(tmp_fp)
+
+    def read_cache(self):
+        with open(self.cache_fp / "site.json") as f:
+            site = json.load(f)
+        for attr in self.site_attributes:
+            setattr(self, attr, site[attr])
+        days = np.load(self.cache_fp / "DAY.npy", mmap_mode="r")
+        columns = {var: np.load(self.cache_fp / f"{var}.npy", mmap_mode="r") for var in site["variables"]}
+        self.store = MappedWeatherStore(days, columns, self.latitude, self.longitude, self.elevation)
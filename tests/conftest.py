@@ -0,0 +1,29 @@
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+import pytest
+
+repo_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(repo_dir))
+
+@pytest.fixture
+def http_server():
+    """Starts local HTTP servers with a given BaseHTTPRequestHandler class and returns their base URL."""
+    servers = []
+
+    def start(handler_class):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+@pytest.fixture
+def soilgrids_response():
+    from benchmarks.fixtures import get_soilgrids_response
+    return get_soilgrids_response()
@@ -0,0 +1,137 @@
+import shutil
+import geopandas as gpd
+import numpy as np
+import pytest
+import shapely
+from benchmarks.fixtures import get_sites, make_bofek_fixture
+from libs.BOFEK2020DataProvider import BOFEK2020DataProvider
+
+@pytest.fixture
+def bofek_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(BOFEK2020DataProvider, "bofek_stores", {})
+    monkeypatch.setattr(BOFEK2020DataProvider, "bofek_rasters", {})
+    bofek_dir, staring_series_dir = make_bofek_fixture(tmp_path)
+    return bofek_dir
+
+def get_expected_soilcodes(bofek_dir, sites):
+    gdf_bofek = gpd.read_file(bofek_dir / "GIS" / "shp_files" / "bod_clusters.shp").to_crs("EPSG:4326")
+    points = gpd.GeoDataFrame(geometry=gpd.points_from_xy(sites[:, 1], sites[:, 0]), crs="EPSG:4326")
+    joined = points.sjoin(gdf_bofek, predicate="within", how="left")
+    return joined.groupby(level=0).BODEMCODE.first().to_numpy()
+
+def replace_soilcodes(bofek_dir, seed):
+    # A new version of the soil map with the same polygons but other soil codes
+    shape_fp = bofek_dir / "GIS" / "shp_files" / "bod_clusters.shp"
+    gdf_bofek = gpd.read_file(shape_fp)
+    gdf_bofek["BODEMCODE"] = np.random.default_rng(seed).permutation(gdf_bofek.BODEMCODE.to_numpy())
+    gdf_bofek.to_file(shape_fp)
+
+def test_soilcodes(bofek_dir):
+    sites = get_sites(500)
+    store = BOFEK2020DataProvider.get_bofek2020_store(bofek_dir)
+    soilcodes = store.get_soilcodes(sites[:, 0], sites[:, 1])
+    assert (soilcodes == get_expected_soilcodes(bofek_dir, sites)).all()
+    assert store.get_soilcode(*sites[0]) == soilcodes[0]
+
+def test_rebuilt_when_shapefile_changes(bofek_dir):
+    sites = get_sites(500)
+    store = BOFEK2020DataProvider.get_bofek2020_store(bofek_dir)
+    assert store.source_version == BOFEK2020DataProvider.get_bofek2020_source_version(bofek_dir)
+    replace_soilcodes(bofek_dir, seed=1)
+    BOFEK2020DataProvider.bofek_stores.clear()
+    store = BOFEK2020DataProvider.get_bofek2020_store(bofek_dir)
+    assert store.source_version == BOFEK2020DataProvider.get_bofek2020_source_version(bofek_dir)
+    assert (store.get_soilcodes(sites[:, 0], sites[:, 1]) == get_expected_soilcodes(bofek_dir, sites)).all()
+
+def test_store_used_without_shapefile(bofek_dir):
+    sites = get_sites(100)
+    store = BOFEK2020DataProvider.get_bofek2020_store(bofek_dir)
+    soilcodes = store.get_soilcodes(sites[:, 0], sites[:, 1])
+    shutil.rmtree(bofek_dir / "GIS")
+    BOFEK2020DataProvider.bofek_stores.clear()
+    store = BOFEK2020DataProvider.get_bofek2020_store(bofek_dir)
+    assert (store.get_soilcodes(sites[:, 0], sites[:, 1]) == soilcodes).all()
+
+def test_raster_soilcodes(bofek_dir):
+    sites = get_sites(500)
+    soilcodes = BOFEK2020DataProvider.get_soilcodes(sites[:, 0], sites[:, 1], bofek_dir, lookup="raster")
+    assert (soilcodes == get_expected_soilcodes(bofek_dir, sites)).all()
+
+def test_raster_rebuilt_when_shapefile_changes(bofek_dir):
+    sites = get_sites(500)
+    raster = BOFEK2020DataProvider.get_bofek2020_raster(bofek_dir)
+    assert raster.source_version == BOFEK2020DataProvider.get_bofek2020_source_version(bofek_dir)
+    replace_soilcodes(bofek_dir, seed=2)
+    BOFEK2020DataProvider.bofek_stores.clear()
+    BOFEK2020DataProvider.bofek_rasters.clear()
+    raster = BOFEK2020DataProvider.get_bofek2020_raster(bofek_dir)
+    assert raster.source_version == BOFEK2020DataProvider.get_bofek2020_source_version(bofek_dir)
+    soilcodes, on_boundary = raster.get_soilcodes(sites[:, 0], sites[:, 1])
+    expected = get_expected_soilcodes(bofek_dir, sites)
+    assert (soilcodes[~on_boundary] == expected[~on_boundary]).all()
+    soilcodes = BOFEK2020DataProvider.get_soilcodes(sites[:, 0], sites[:, 1], bofek_dir, lookup="raster")
+    assert (soilcodes == expected).all()
+
+def test_interrupted_raster_build(bofek_dir, monkeypatch):
+    import libs.bofek2020_raster
+    sites = get_sites(500)
+    BOFEK2020DataProvider.get_bofek2020_raster(bofek_dir)
+    replace_soilcodes(bofek_dir, seed=3)
+    BOFEK2020DataProvider.bofek_rasters.clear()
+    # A rebuild that stops after the new grid replaced the old one, but before its .json did
+    replace = libs.bofek2020_raster.os.replace
+
+    def interrupted_replace(src, dst):
+        if str(dst).endswith(".json"):
+            raise KeyboardInterrupt
+        replace(src, dst)
+    with monkeypatch.context() as m:
+        m.setattr(libs.bofek2020_raster.os, "replace", interrupted_replace)
+        with pytest.raises(KeyboardInterrupt):
+            BOFEK2020DataProvider.get_bofek2020_raster(bofek_dir)
+    # The old .json marks the store as stale, so it is rebuilt instead of pairing the new grid with old soil codes
+    BOFEK2020DataProvider.bofek_rasters.clear()
+    raster = BOFEK2020DataProvider.get_bofek2020_raster(bofek_dir)
+    assert raster.source_version == BOFEK2020DataProvider.get_bofek2020_source_version(bofek_dir)
+    soilcodes = BOFEK2020DataProvider.get_soilcodes(sites[:, 0], sites[:, 1], bofek_dir, lookup="raster")
+    assert (soilcodes == get_expected_soilcodes(bofek_dir, sites)).all()
+
+@pytest.mark.parametrize("lookup", ["polygon", "raster"])
+def test_region_soilcodes(bofek_dir, lookup):
+    sites = get_sites(500)
+    full = BOFEK2020DataProvider.get_soilcodes(sites[:, 0], sites[:, 1], bofek_dir, lookup=lookup)
+    # The middle of the map, as a bounding box and as a geometry
+    (min_lat, min_lon), (max_lat, max_lon) = np.quantile(sites, [0.25, 0.75], axis=0)
+    inside = ((sites[:, 0] >= min_lat) & (sites[:, 0] <= max_lat) & (sites[:, 1] >= min_lon) &
+              (sites[:, 1] <= max_lon))
+    assert 0 < inside.sum() < len(sites)
+    for region in [(min_lon, min_lat, max_lon, max_lat), shapely.box(min_lon, min_lat, max_lon, max_lat)]:
+        soilcodes = BOFEK2020DataProvider.get_soilcodes(sites[inside, 0], sites[inside, 1], bofek_dir, region=region,
+                                                        lookup=lookup)
+        assert (soilcodes == full[inside]).all()
+    # The region store only holds the polygons around the region
+    if lookup == "polygon":
+        full_fp = BOFEK2020DataProvider.get_bofek2020_store_fp(bofek_dir)
+        region_fp = BOFEK2020DataProvider.get_bofek2020_store_fp(bofek_dir, (min_lon, min_lat, max_lon, max_lat))
+        assert region_fp.stat().st_size < full_fp.stat().st_size
+
+def test_store_file_per_region_and_tolerance(bofek_dir):
+    region, other_region = (5.1, 52.0, 5.2, 52.1), (5.1, 52.0, 5.2, 52.2)
+    fps = [BOFEK2020DataProvider.get_bofek2020_store_fp(bofek_dir, *args)
+           for args in [(None, None), (region, None), (other_region, None), (None, 1.), (None, 5.), (region, 1.),
+                        (shapely.box(*region), None)]]
+    assert len(set(fps)) == len(fps)
+    assert all(fp.parent == bofek_dir for fp in fps)
+    # The same region and tolerance give the same file
+    assert BOFEK2020DataProvider.get_bofek2020_store_fp(bofek_dir, list(region), 1.) == fps[5]
+    raster_fp = BOFEK2020DataProvider.get_bofek2020_store_fp(bofek_dir, region, name="bod_clusters_RD25m.npy")
+    assert raster_fp.name == f"bod_clusters_RD25m_{fps[1].stem.rsplit('_', 1)[1]}.npy"
+
+    # Loading them writes separate stores, with the polygons of their own region and tolerance
+    sites = get_sites(200)
+    (min_lat, min_lon), (max_lat, max_lon) = np.quantile(sites, [0.25, 0.75], axis=0)
+    stores = [BOFEK2020DataProvider.get_bofek2020_store(bofek_dir, *args)
+              for args in [(None, None), ((min_lon, min_lat, max_lon, max_lat), None), (None, 5.)]]
+    assert len({store.store_fp for store in stores}) == 3
+    assert all(store.store_fp.exists() for store in stores)
+    assert len(stores[1].geometries) < len(stores[0].geometries) == len(stores[2].geometries)
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+from libs.chunked_store import ChunkedArrayStore
+
+@pytest.fixture
+def store(tmp_path):
+    lats = np.arange(52.0, 52.5, 0.1)
+    lons = np.arange(5.0, 5.6, 0.1)
+    store = ChunkedArrayStore.create(tmp_path / "store", lats, lons, {"ELEV": ()}, chunks=(2, 2))
+    store.write("ELEV", 0, 0, np.arange(len(lats) * len(lons), dtype=float).reshape(len(lats), len(lons)))
+    return store
+
+def test_get_index_nearest_cell(store):
+    assert store.get_index(52.0, 5.0) == (0, 0)
+    assert store.get_index(52.23, 5.36) == (2, 4)
+    # Up to half a cell outside the outer cell centres still belongs to the edge cell
+    assert store.get_index(51.96, 5.54) == (0, 5)
+    assert store.read_cell("ELEV", *store.get_index(52.41, 5.0)) == 4 * 6
+
+@pytest.mark.parametrize("lat, lon", [(10., 100.), (51.9, 5.2), (52.2, 5.6)])
+def test_get_index_outside_grid(store, lat, lon):
+    assert not store.contains(lat, lon)
+    with pytest.raises(Exception, match="outside the grid"):
+        store.get_index(lat, lon)
@@ -0,0 +1,125 @@
+import hashlib
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler
+from pathlib import Path
+import pytest
+from libs.BOFEK2020DataProvider import BOFEK2020DataProvider
+from libs.downloads import download_file, file_lock
+
+data = bytes(range(256)) * 4096
+
+def make_handler(data, ranges=True, break_first=True):
+    """Handler serving data; the first response is cut off after a third of the body when break_first is set.
+
+    With ranges, Range requests get 206 (or 416 when the range starts at the end of the data); without, the server
+    ignores the Range header and sends the whole file with 200 again."""
+    class Handler(BaseHTTPRequestHandler):
+        range_headers = []
+
+        def do_GET(self):
+            range_header = self.headers.get("Range")
+            Handler.range_headers.append(range_header)
+            start = int(range_header.split("=")[1].rstrip("-")) if range_header and ranges else 0
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(data)}")
+                self.end_headers()
+                return
+            body = data[start:]
+            self.send_response(206 if start > 0 else 200)
+            self.send_header("Content-Length", str(len(body)))
+            if start > 0:
+                self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+            self.end_headers()
+            if break_first and len(Handler.range_headers) == 1:
+                self.wfile.write(body[:len(body) // 3])
+                self.wfile.flush()
+                self.connection.shutdown(2)
+                return
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr("libs.downloads.time.sleep", lambda seconds: None)
+
+def test_resume_with_range(tmp_path, http_server):
+    handler = make_handler(data)
+    url = http_server(handler)
+    fp = download_file(url, tmp_path / "file.bin", sha256=hashlib.sha256(data).hexdigest(), chunk_size=4096)
+    assert fp.read_bytes() == data
+    assert not (tmp_path / "file.bin.part").exists()
+    # The second request resumes from the end of the part file (206)
+    assert handler.range_headers[0] is None
+    assert 0 < int(handler.range_headers[1].split("=")[1].rstrip("-")) <= len(data) // 3
+    assert len(handler.range_headers) == 2
+
+def test_server_without_range_support(tmp_path, http_server):
+    handler = make_handler(data, ranges=False)
+    url = http_server(handler)
+    fp = download_file(url, tmp_path / "file.bin", chunk_size=4096)
+    # The 200 answer to the Range request restarts the file instead of appending to it
+    assert handler.range_headers[1] is not None
+    assert fp.read_bytes() == data
+
+def test_complete_part_file(tmp_path, http_server):
+    handler = make_handler(data, break_first=False)
+    url = http_server(handler)
+    (tmp_path / "file.bin.part").write_bytes(data)
+    fp = download_file(url, tmp_path / "file.bin", sha256=hashlib.sha256(data).hexdigest())
+    # 416: the part file already holds the whole file
+    assert handler.range_headers == [f"bytes={len(data)}-"]
+    assert fp.read_bytes() == data
+
+def test_checksum_mismatch(tmp_path, http_server):
+    url = http_server(make_handler(data, break_first=False))
+    with pytest.raises(Exception, match="checksum"):
+        download_file(url, tmp_path / "file.bin", sha256="0" * 64)
+    assert not (tmp_path / "file.bin").exists()
+    assert not (tmp_path / "file.bin.part").exists()
+
+def test_file_lock(tmp_path):
+    lock_fp = tmp_path / "file.lock"
+    entered = []
+
+    def wait_for_lock():
+        with file_lock(lock_fp, poll_interval=0.01):
+            entered.append(lock_fp.exists())
+
+    with file_lock(lock_fp):
+        thread = threading.Thread(target=wait_for_lock)
+        thread.start()
+        thread.join(0.2)
+        assert not entered
+        with pytest.raises(Exception, match="timed out"):
+            with file_lock(lock_fp, timeout=0.05, poll_interval=0.01):
+                pass
+    thread.join(5.)
+    assert entered == [True]
+    assert not lock_fp.exists()
+
+def test_download_bofek2020_extracts_bod_clusters(tmp_path, http_server, monkeypatch):
+    import py7zr
+    # A BOFEK2020 archive in the layout of the WUR download: a zip holding BOFEK2020_GIS.7z
+    members = {"GIS/shp_files/bod_clusters.shp": b"shp", "GIS/shp_files/bod_clusters.dbf": b"dbf",
+               "GIS/shp_files/bod_clusters.prj": b"prj", "GIS/shp_files/bofek2020.shp": b"other",
+               "Documentatie/rapport.pdf": b"pdf" * 1000}
+    with py7zr.SevenZipFile(tmp_path / "BOFEK2020_GIS.7z", "w") as s:
+        for name, content in members.items():
+            s.writestr(content, f"BOFEK2020_GIS/{name}")
+    zip_fp = tmp_path / "download.zip"
+    with zipfile.ZipFile(zip_fp, "w") as z:
+        z.write(tmp_path / "BOFEK2020_GIS.7z", "BOFEK2020/BOFEK2020_GIS.7z")
+    monkeypatch.setattr(BOFEK2020DataProvider, "url_bofek2020", http_server(make_handler(zip_fp.read_bytes())))
+
+    bofek_dir = tmp_path / "BOFEK2020"
+    BOFEK2020DataProvider.download_bofek2020(bofek_dir)
+    extracted = sorted(fp.relative_to(bofek_dir).as_posix() for fp in (bofek_dir / "GIS").rglob("*") if fp.is_file())
+    assert extracted == sorted(name for name in members if Path(name).name.startswith("bod_clusters."))
+    assert (bofek_dir / "GIS" / "shp_files" / "bod_clusters.dbf").read_bytes() == b"dbf"
+    assert not list(bofek_dir.glob("extract.tmp*"))
@@ -0,0 +1,93 @@
+import datetime as dt
+import os
+import time
+import pytest
+from libs import ensemble_runner
+from libs.ensemble_runner import EnsembleRunner, get_agromanagement
+
+agro_yaml = """Version: 1.0
+AgroManagement:
+- 2015-10-01:
+    CropCalendar:
+        crop_name: wheat
+        variety_name: Julius
+        crop_start_date: 2015-10-20
+        crop_start_type: sowing
+        crop_end_date: 2016-02-29
+        crop_end_type: harvest
+        max_duration: 400
+    TimedEvents: null
+    StateEvents: null
+"""
+
+# The run functions are module-level, so that they can be sent to the worker processes
+def run_stub(run):
+    if run.get("fail"):
+        raise ValueError(f"Error: run {run['run_id']} failed")
+    time.sleep(run.get("delay", 0.))
+    output = [{"day": dt.date(2020, 1, 1) + dt.timedelta(days=k), "LAI": run["value"] * k} for k in range(3)]
+    return {"run_id": run["run_id"], "status": "ok", "output": output, "summary": [{"TWSO": run["value"]}],
+            "pid": os.getpid()}
+
+def run_agro_stub(run):
+    agrod = get_agromanagement(run["agro_fp"], run.get("year"), run.get("crop"), run.get("cultivar"))
+    return {"run_id": run["run_id"], "status": "ok", "agro": agrod, "pid": os.getpid(),
+            "ncached": len(ensemble_runner.worker_state["agro"])}
+
+class ListSink():
+    def __init__(self):
+        self.added = []
+
+    def add(self, run_id, output, summary, run_attrs=None):
+        self.added.append((run_id, len(output), summary, run_attrs))
+
+@pytest.fixture
+def agro_fp(tmp_path):
+    agro_fp = tmp_path / "agro.yaml"
+    agro_fp.write_text(agro_yaml)
+    return agro_fp
+
+def test_results_failures_and_order():
+    # Later runs finish first, the third run raises
+    runs = [{"run_id": f"run{i}", "value": float(i), "delay": 0.05 * (5 - i), "attrs": {"member": i}}
+            for i in range(6)]
+    runs[2]["fail"] = True
+    sink = ListSink()
+    results, failures = EnsembleRunner(max_workers=3, run_function=run_stub).run(runs, sink=sink)
+    assert [result["run_id"] for result in results] == [run["run_id"] for run in runs]
+    assert [result["status"] for result in results] == ["ok", "ok", "failed", "ok", "ok", "ok"]
+    assert [failure["run_id"] for failure in failures] == ["run2"]
+    assert "Error: run run2 failed" in failures[0]["error"]
+    assert all(os.getpid() != result["pid"] for result in results if result["status"] == "ok")
+    # The output of the successful runs went to the sink, with the attributes of their run
+    assert "output" not in results[0]
+    assert sorted(sink.added) == sorted((f"run{i}", 3, [{"TWSO": float(i)}], {"member": i}) for i in (0, 1, 3, 4, 5))
+
+def test_results_without_sink():
+    runs = [{"run_id": i, "value": float(i)} for i in range(4)]
+    results, failures = EnsembleRunner(max_workers=2, run_function=run_stub).run(runs)
+    assert failures == []
+    assert [result["output"][2]["LAI"] for result in results] == [0., 2., 4., 6.]
+
+def test_worker_state_reused(agro_fp):
+    runs = [{"run_id": i, "agro_fp": agro_fp, "year": 2015 + i} for i in range(4)]
+    results, failures = EnsembleRunner(max_workers=1, run_function=run_agro_stub).run(runs)
+    assert failures == []
+    # A single worker reads the agromanagement file once and shifts a copy of it for every run
+    assert len({result["pid"] for result in results}) == 1
+    assert [result["ncached"] for result in results] == [1, 1, 1, 1]
+    start_dates = [list(result["agro"]["AgroManagement"][0])[0] for result in results]
+    assert start_dates == [dt.date(2015 + i, 10, 1) for i in range(4)]
+
+def test_year_shift(agro_fp):
+    agrod = get_agromanagement(agro_fp, 2018, crop="barley", cultivar="Spring_barley_301")
+    campaign = agrod["AgroManagement"][0]
+    assert list(campaign) == [dt.date(2018, 10, 1)]
+    crop_calendar = campaign[dt.date(2018, 10, 1)]["CropCalendar"]
+    assert crop_calendar["crop_start_date"] == dt.date(2018, 10, 20)
+    # 29 February of the original crop end is moved to 28 February in a year that is not a leap year
+    assert crop_calendar["crop_end_date"] == dt.date(2019, 2, 28)
+    assert (crop_calendar["crop_name"], crop_calendar["variety_name"]) == ("barley", "Spring_barley_301")
+    # The cached agromanagement itself is not changed
+    original = get_agromanagement(agro_fp)["AgroManagement"][0][dt.date(2015, 10, 1)]["CropCalendar"]
+    assert (original["crop_name"], original["crop_end_date"]) == ("wheat", dt.date(2016, 2, 29))
@@ -0,0 +1,56 @@
+"""Import-time budgets of the CLI and of the modules its subcommands use.
+
+Every module set is imported in a fresh interpreter with -X importtime (best of a few repeats). A test fails when the
+import takes longer than its budget or pulls in a heavy dependency that it should import lazily. On slow machines
+the budgets can be scaled with the IMPORT_BUDGET_SCALE environment variable.
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+
+repo_dir = Path(__file__).resolve().parent.parent
+repeat = 3
+scale = float(os.environ.get("IMPORT_BUDGET_SCALE", 1.0))
+heavy = ["geopandas", "matplotlib", "pcse", "py7zr", "pyarrow", "rasterio", "requests", "shapely", "sqlalchemy"]
+# name: (modules, budget in seconds, heavy dependencies that may be imported)
+budgets = {
+    "cli": (["cli"], 0.1, []),
+    "run": (["libs.ensemble_runner", "libs.output_sink", "libs.profiling"], 2.0, ["pcse", "pyarrow", "requests"]),
+    "BOFEK2020DataProvider": (["libs.BOFEK2020DataProvider"], 1.0, ["shapely", "pyarrow"]),
+    "SoilGridsDataProvider": (["libs.SoilGridsDataProvider"], 1.0, ["pyarrow"]),
+    "postprocessing": (["libs.postprocessing"], 1.0, ["pyarrow"]),
+}
+
+def measure_import(modules):
+    """Returns the import time in seconds and the (name, cumulative seconds) of every module the import pulls in."""
+    code = "import sys\nsys.stderr.write('-- start\\n')\n" + "".join(f"import {module}\n" for module in modules)
+    res = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=repo_dir, capture_output=True,
+                         text=True, check=True)
+    # Lines are "import time: self [us] | cumulative | imported package", nested imports indented; only the imports
+    # after the marker are those of modules (and not of the interpreter startup)
+    lines = res.stderr.split("-- start\n", 1)[1].splitlines()
+    imported = []
+    seconds = 0.
+    for line in lines:
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        cumulative = int(cumulative_us) * 1e-6
+        imported.append((name.strip(), cumulative))
+        if not name[1:].startswith(" "):
+            seconds += cumulative
+    return seconds, imported
+
+@pytest.mark.parametrize("name", list(budgets))
+def test_import_budget(name):
+    modules, budget, allowed = budgets[name]
+    measurements = [measure_import(modules) for i in range(repeat)]
+    seconds, imported = min(measurements, key=lambda measurement: measurement[0])
+    top_level = {module.split(".")[0] for module, cumulative in imported}
+    unexpected = [module for module in heavy if module in top_level and module not in allowed]
+    assert not unexpected, f"{name} imports {', '.join(unexpected)}, which should be imported lazily"
+    slowest = sorted(imported, key=lambda item: -item[1])[:5]
+    assert seconds <= budget * scale, (f"importing {name} takes {seconds:.3f} s (budget {budget * scale:.2f} s); "
+                                       f"slowest: {', '.join(f'{module} {t:.3f} s' for module, t in slowest)}")
@@ -0,0 +1,99 @@
+import datetime as dt
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+from libs.output_sink import P2Percentiles, ParquetOutputSink, PercentileSink
+from libs.postprocessing import PostProcessor
+
+percentiles = [5, 25, 50, 75, 95]
+
+def add_ensemble(sink, values, summaries):
+    # values: (nmembers, ndays) daily LAI, NaN after the last day of a member; summaries: list of TWSO lists
+    start = dt.date(2020, 1, 1)
+    for member, (row, summary) in enumerate(zip(values, summaries)):
+        output = [{"day": start + dt.timedelta(days=k), "LAI": value} for k, value in enumerate(row)
+                  if not np.isnan(value)]
+        sink.add(member, output, [{"TWSO": value} for value in summary])
+
+@pytest.mark.parametrize("exact", [True, False])
+def test_percentiles(exact):
+    rng = np.random.default_rng(0)
+    values = rng.normal(3., 1., (2000, 10))
+    values[1000:, -1] = np.nan
+    summaries = [[value] if member % 2 else [value, 2 * value] for member, value in enumerate(rng.gamma(2., 1., 2000))]
+    with PercentileSink(["LAI"], ["TWSO"], percentiles, exact=exact) as sink:
+        add_ensemble(sink, values, summaries)
+    df_daily = sink.get_daily_percentiles()
+    df_summary = sink.get_summary_percentiles()
+    assert len(df_daily) == 10
+    assert list(df_summary.index.get_level_values("row").unique()) == [0, 1]
+    actual = [df_daily[f"LAI_p{p}"].to_numpy() for p in percentiles]
+    expected = [[np.percentile(values[~np.isnan(values[:, k]), k], p) for k in range(10)] for p in percentiles]
+    for row in (0, 1):
+        twso = [summary[row] for summary in summaries if len(summary) > row]
+        actual.append(df_summary.loc[row, "TWSO"].to_numpy())
+        expected.append(np.percentile(twso, percentiles))
+    errors = np.abs(np.concatenate(actual) - np.concatenate(expected))
+    if exact:
+        assert errors.max() < 1e-5
+    else:
+        # P-square estimates are typically within a few hundredths of a standard deviation, worse in the tails
+        assert np.median(errors) < 0.03
+        assert errors.max() < 0.35
+
+def test_small_ensemble_is_exact():
+    values = np.array([[1.], [4.], [2.]])
+    with PercentileSink(["LAI"], [], percentiles) as sink:
+        add_ensemble(sink, values, [[], [], []])
+    df_daily = sink.get_daily_percentiles()
+    for p in percentiles:
+        assert df_daily[f"LAI_p{p}"].iloc[0] == pytest.approx(np.percentile(values, p))
+    assert len(sink.get_summary_percentiles()) == 0
+
+def test_streaming_memory_is_bounded():
+    estimator = P2Percentiles(percentiles, nrows=10)
+    rng = np.random.default_rng(1)
+    for _ in range(1000):
+        estimator.add(np.arange(10), rng.uniform(0., 1., 10))
+    assert estimator.q.shape == (len(percentiles), 10, 5)
+    np.testing.assert_allclose(estimator.get(10), np.repeat(np.array(percentiles)[:, None] / 100, 10, axis=1),
+                               atol=0.05)
+
+def test_per_layer_variable():
+    with PercentileSink(["SM"], [], percentiles) as sink:
+        with pytest.raises(Exception, match="not a scalar output variable"):
+            sink.add(0, [{"day": dt.date(2020, 1, 1), "SM": [0.3, 0.2]}], [])
+
+def get_output(ndays, member):
+    start = dt.date(2020, 1, 1)
+    output = [{"day": start + dt.timedelta(days=k), "LAI": float(k + member), "SM": [0.3, 0.2]} for k in range(ndays)]
+    return output, [{"DOM": start + dt.timedelta(days=ndays), "TWSO": 1000. * member}]
+
+def test_parquet_flushes_have_one_schema(tmp_path):
+    # Every run is flushed on its own; the attributes are None or integer in the first part file only
+    with ParquetOutputSink(tmp_path, max_rows=5) as sink:
+        sink.add("run0", *get_output(5, 0), run_attrs={"weather_cell": None, "weight": 1})
+        sink.add("run1", *get_output(7, 1), run_attrs={"weather_cell": "52.0_5.3", "weight": 0.5})
+    schemas = [pq.read_schema(part_fp) for part_fp in sorted((tmp_path / "daily").glob("*.parquet"))]
+    assert len(schemas) == 2
+    assert schemas[0].equals(schemas[1])
+    pp = PostProcessor()
+    df_daily = pp.read_output(tmp_path, table="daily")
+    assert df_daily.groupby("run_id").size().to_dict() == {"run0": 5, "run1": 7}
+    assert df_daily.weather_cell.isna().sum() == 5
+    assert df_daily.weight.dtype == np.float64
+    assert df_daily.LAI.dtype == np.float64
+    assert pd.api.types.is_string_dtype(df_daily.weather_cell)
+    assert list(df_daily.SM.iloc[0]) == [0.3, 0.2]
+    df_summary = pp.read_output(tmp_path, table="summary", run_ids=["run1"])
+    assert len(df_summary) == 1
+    assert df_summary.TWSO.iloc[0] == 1000.
+    assert df_summary.DOM.iloc[0] == dt.date(2020, 1, 8)
+
+def test_plot_single_panel(tmp_path):
+    import matplotlib
+    matplotlib.use("Agg")
+    df = pd.DataFrame({"LAI": [0., 1., 2.]}, index=pd.date_range("2020-01-01", periods=3))
+    PostProcessor().plot_timeseries(df, tmp_path / "fig.png", [("LAI", [("LAI", "LAI", {})])], dpi=50)
+    assert (tmp_path / "fig.png").exists()
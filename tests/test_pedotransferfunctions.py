@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+from libs.pedotransferfunctions import PedotransferFunctionsWosten
+
+@pytest.fixture
+def layers():
+    # Clay, bulk density, silt and organic matter of layer records, with a boolean topsoil mask and one layer without
+    # organic matter
+    return pd.DataFrame({"C": [12., 35., 4.5, 20., 8.], "D": [1.35, 1.2, 1.55, 1.45, 1.6], "S": [30., 45., 8., 25., 15.],
+                         "OM": [3.5, 6., 0., 1.2, 0.4], "is_topsoil": [True, True, False, False, True]})
+
+def test_vectorized_equals_scalar_loop(layers):
+    ptf = PedotransferFunctionsWosten()
+    vectorized = ptf.calculate_van_genuchten_parameters(layers.C, layers.D, layers.S, layers.OM, 0.01,
+                                                        layers.is_topsoil)
+    for i, layer in enumerate(layers.itertuples()):
+        scalar = ptf.calculate_van_genuchten_parameters(layer.C, layer.D, layer.S, layer.OM, 0.01, layer.is_topsoil)
+        for name, values in vectorized.items():
+            assert values.shape == (len(layers),)
+            assert values[i] == pytest.approx(float(scalar[name]), rel=1e-12)
+
+def test_scalar_inputs_give_0d_arrays(layers):
+    ptf = PedotransferFunctionsWosten()
+    layer = layers.iloc[0]
+    dict_vg = ptf.calculate_van_genuchten_parameters(layer.C, layer.D, layer.S, layer.OM, 0.01, True)
+    assert set(dict_vg) == {"alpha", "n", "lambda", "k_sat", "theta_r", "theta_s"}
+    for values in dict_vg.values():
+        assert isinstance(values, np.ndarray)
+        assert values.shape == ()
+    assert float(dict_vg["n"]) > 1
+    assert 0 < float(dict_vg["theta_s"]) < 1
+
+def test_zero_organic_matter(layers):
+    # Without organic matter the functions (with 1/OM and log(OM) terms) use OM = 0.01
+    ptf = PedotransferFunctionsWosten()
+    layer = layers.iloc[2]
+    zero = ptf.calculate_van_genuchten_parameters(layer.C, layer.D, layer.S, 0., 0.01, False)
+    small = ptf.calculate_van_genuchten_parameters(layer.C, layer.D, layer.S, 0.01, 0.01, False)
+    for name, values in zero.items():
+        assert np.isfinite(values)
+        assert float(values) == float(small[name])
+
+def test_is_topsoil():
+    ptf = PedotransferFunctionsWosten()
+    zmin, zmax = np.array([0., 5., 15., 30.]), np.array([5., 15., 30., 60.])
+    is_topsoil = ptf.calculate_isTopsoil(zmin, zmax, 30.)
+    assert is_topsoil.tolist() == [True, True, True, False]
+    assert [bool(ptf.calculate_isTopsoil(a, b, 30.)) for a, b in zip(zmin, zmax)] == is_topsoil.tolist()
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.fixtures import get_sites, make_bofek_fixture
+from libs.BOFEK2020DataProvider import BOFEK2020DataProvider
+from libs.ensemble_runner import EnsembleRunner
+from libs.regional_runner import RegionalRunner
+
+def run_stub(run):
+    # The yield of a run tells its soil profile and agromanagement apart
+    TWSO = run["attrs"]["iProfile"] + (1000. if run["agro_fp"].endswith("b.yaml") else 0.)
+    return {"run_id": run["run_id"], "status": "ok", "output": [], "summary": [{"TWSO": TWSO}]}
+
+@pytest.fixture
+def runner(tmp_path, monkeypatch):
+    monkeypatch.setattr(BOFEK2020DataProvider, "bofek_stores", {})
+    monkeypatch.setattr(BOFEK2020DataProvider, "bofek_rasters", {})
+    monkeypatch.setattr(BOFEK2020DataProvider, "staring_series_stores", {})
+    bofek_dir, staring_series_dir = make_bofek_fixture(tmp_path)
+    runner = RegionalRunner("Wofost81_WLP_MLWB", bofek_dir, staring_series_dir, 120., site={},
+                            weather_fp=tmp_path / "weather.xlsx")
+    runner.runner = EnsembleRunner(max_workers=2, run_function=run_stub)
+    return runner
+
+@pytest.fixture
+def fields():
+    # Every site twice (the second time a few metres away) and one field outside the soil map
+    sites = get_sites(40)
+    return np.concatenate([sites, sites + 1e-5, [[50.0, 3.0]]])
+
+def test_members_collapse(runner, fields):
+    agro_fps = ["a.yaml"] * 60 + ["b.yaml"] * 21
+    members = runner.get_members(fields, agro_fps)
+    assert len(members) == len(fields)
+    assert pd.isna(members.run_id.iloc[-1])
+    inside = members.dropna(subset=["run_id"])
+    assert len(inside) == len(fields) - 1
+    # One run per unique (iProfile, weather cell, agromanagement)
+    keys = inside[["iProfile", "weather_cell", "agro_fp"]].drop_duplicates()
+    assert inside.run_id.nunique() == len(keys)
+    assert (inside.groupby(["iProfile", "weather_cell", "agro_fp"]).run_id.nunique() == 1).all()
+    runs = runner.get_runs(members)
+    assert len(runs) == len(keys) < len(inside)
+    assert sum(run["attrs"]["nmembers"] for run in runs) == len(inside)
+    for run in runs:
+        assert run["soil"]["SoilProfileDescription"]["SoilLayers"]
+
+def test_map_to_members(runner, fields):
+    agro_fps = ["a.yaml"] * 60 + ["b.yaml"] * 21
+    members, results, failures = runner.run(fields, agro_fps)
+    assert failures == []
+    assert len(results) == members.run_id.nunique()
+    df = RegionalRunner.map_to_members(members, RegionalRunner.get_results_table(results))
+    # Every field gets the output of its run; the field outside the soil map gets none
+    assert len(df) == len(members)
+    assert (df.member_id.to_numpy() == members.member_id.to_numpy()).all()
+    inside = df.run_id.notna()
+    expected = df.iProfile[inside].astype(float) + np.where(df.agro_fp[inside] == "b.yaml", 1000., 0.)
+    assert (df.TWSO[inside] == expected).all()
+    assert pd.isna(df.TWSO.iloc[-1])
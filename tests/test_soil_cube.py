@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+from benchmarks.fixtures import make_soilgrids_tiles_fixture
+from libs.soil_cube import SoilParameterCube
+from libs.soilgrids_raster import SoilGridsRasterSource
+from libs.SoilGridsDataProvider import SoilGridsDataProvider
+
+RDMCR = 120.
+
+@pytest.fixture(scope="module")
+def cube(tmp_path_factory):
+    fixture_dir = tmp_path_factory.mktemp("soilgrids")
+    source = SoilGridsRasterSource(make_soilgrids_tiles_fixture(fixture_dir))
+    # Cell centres away from the tile pixel edges, so that the cube and the provider sample the same pixels
+    lats = 52.001 + 0.02 * np.arange(5)
+    lons = 5.101 + 0.02 * np.arange(5)
+    SoilParameterCube.build(fixture_dir / "cube", source, lats, lons, RDMCR, chunks=(4, 4))
+    return fixture_dir / "cube", source
+
+def test_cell_matches_provider(cube):
+    store_dir, source = cube
+    lat, lon = 52.041, 5.161
+    soil_yaml = SoilParameterCube.get_soil_yaml(store_dir, lat, lon)
+    expected = SoilGridsDataProvider(lat, lon, RDMCR, raster_source=source).soil_yaml
+    assert soil_yaml.keys() == expected.keys()
+    for layer, expected_layer in zip(soil_yaml["SoilProfileDescription"]["SoilLayers"],
+                                     expected["SoilProfileDescription"]["SoilLayers"]):
+        assert np.allclose(layer["SMfromPF"], expected_layer["SMfromPF"])
+        assert np.allclose(layer["CONDfromPF"], expected_layer["CONDfromPF"])
+
+@pytest.mark.parametrize("lat, lon", [(10., 100.), (52.2, 5.11), (52.03, 5.3)])
+def test_outside_cube(cube, lat, lon):
+    store_dir, source = cube
+    with pytest.raises(Exception, match="outside the soil parameter cube"):
+        SoilParameterCube.get_soil_yaml(store_dir, lat, lon)
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+from libs.soil_ensemble import SoilHydraulicEnsemble
+
+@pytest.fixture
+def ensemble():
+    layers = {"Thickness": [20., 30., 70.], "CNRatioSOMI": 9., "CRAIRC": 0.05, "FSOMI": 0.02, "RHOD": 1.4,
+              "Soil_pH": 7., "Alpha": [0.0152, 0.0213, 0.0187], "Npar": [1.17, 1.35, 1.05], "Lambda": [-2.5, 0., -4.],
+              "Ksfit": [17.8, 12.0, 5.5], "WCr": [0.01, 0.02, 0.01], "WCs": [0.43, 0.36, 0.05]}
+    pFs = [-1., 1., 2., 3., 4., 4.2, 6.]
+    return SoilHydraulicEnsemble(layers, pFs, 4.2, 2.0, 70., sds={"WCr": 0.05, "WCs": 0.05, "Npar": 1.})
+
+def test_sampled_bounds(ensemble):
+    samples = ensemble.sample(5000, seed=0)
+    for param in ensemble.params:
+        assert samples[param].shape == (5000, 3)
+    assert (samples["Npar"] > 1).all()
+    assert (samples["WCr"] >= 0).all()
+    assert (samples["WCr"] < samples["WCs"]).all()
+    assert (samples["WCs"] <= 1).all()
+    for param in ensemble.log_params:
+        assert (samples[param] > 0).all()
+
+def test_zero_noise_gives_nominal(ensemble):
+    ensemble.sds = {param: 0. for param in ensemble.params}
+    samples = ensemble.sample(3, seed=0)
+    for param in ensemble.params:
+        np.testing.assert_allclose(samples[param], np.broadcast_to(ensemble.layers[param], (3, 3)))
+
+def test_sampling_is_reproducible(ensemble):
+    first, second = ensemble.sample(10, seed=1), ensemble.sample(10, seed=1)
+    for param in ensemble.params:
+        np.testing.assert_array_equal(first[param], second[param])
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from benchmarks.fixtures import make_soilgrids_tiles_fixture
+from libs.soil_profile_builder import SoilProfileBuilder
+from libs.soilgrids_raster import SoilGridsRasterSource
+from libs.SoilGridsDataProvider import SoilGridsDataProvider
+
+pFs = SoilGridsDataProvider.pFs
+
+@pytest.fixture
+def builder():
+    return SoilProfileBuilder(pFs, 4.2, 2.0, 70.)
+
+def get_layers(nlayers=3):
+    SMfromPF = np.linspace(0.45, 0.05, len(pFs)) * np.linspace(1., 0.8, nlayers)[:, None]
+    CONDfromPF = np.linspace(1., -10., len(pFs)) + np.arange(nlayers)[:, None]
+    return {"Thickness": [20., 30., 70.][:nlayers], "SMfromPF": SMfromPF, "CONDfromPF": CONDfromPF,
+            "CNRatioSOMI": 9., "CRAIRC": 0.05, "FSOMI": 0.02, "RHOD": [1.3, 1.4, 1.5][:nlayers], "Soil_pH": 7.}
+
+def test_profile(builder):
+    profile = builder.build(**get_layers())
+    description = profile["SoilProfileDescription"]
+    assert description["PFWiltingPoint"] == 4.2
+    assert description["PFFieldCapacity"] == 2.0
+    assert profile["RDMSOL"] == 120.
+    assert len(description["SoilLayers"]) == 3
+    # The subsoil is the deepest layer
+    assert description["SubSoilType"] == description["SoilLayers"][-1]
+    assert description["SoilLayers"][1]["RHOD"] == 1.4
+    assert description["SoilLayers"][0]["SMfromPF"][0::2] == list(pFs)
+
+def test_provider_profile(tmp_path):
+    provider = SoilGridsDataProvider(52.041, 5.161, 120., raster_source=SoilGridsRasterSource(
+        make_soilgrids_tiles_fixture(tmp_path)))
+    description = provider.soil_yaml["SoilProfileDescription"]
+    assert description["PFWiltingPoint"] == 4.2
+    assert description["PFFieldCapacity"] == 2.0
+    assert description["SubSoilType"] == description["SoilLayers"][-1]
+
+@pytest.mark.parametrize("name, value", [("CONDfromPF", -np.inf), ("CONDfromPF", np.nan), ("SMfromPF", np.nan)])
+def test_non_finite_curves(builder, name, value):
+    layers = get_layers()
+    layers[name][1, 3] = value
+    with pytest.raises(Exception, match=f"{name} of a soil layer contains NaN or infinite values"):
+        builder.build(**layers)
@@ -0,0 +1,43 @@
+import os
+import numpy as np
+import pytest
+import rasterio
+from benchmarks.fixtures import make_soilgrids_tiles_fixture
+from libs.soil_profile_cache import SoilProfileCache
+from libs.soilgrids_raster import SoilGridsRasterSource
+from libs.SoilGridsDataProvider import SoilGridsDataProvider
+
+RDMCR = 120.
+lat, lon = 52.041, 5.161
+
+@pytest.fixture
+def tiles_dir(tmp_path):
+    return make_soilgrids_tiles_fixture(tmp_path)
+
+def scale_tile(fp, factor):
+    # Replaces the tile in place by one with other values
+    with rasterio.open(fp, "r+") as dataset:
+        dataset.write(np.round(dataset.read(1) * factor).astype(dataset.dtypes[0]), 1)
+    mtime = fp.stat().st_mtime_ns + 10 ** 9
+    os.utime(fp, ns=(mtime, mtime))
+
+def test_raster_profiles_cached(tmp_path, tiles_dir):
+    profile_cache = SoilProfileCache(tmp_path / "profiles")
+    first = SoilGridsDataProvider(lat, lon, RDMCR, raster_source=SoilGridsRasterSource(tiles_dir),
+                                  profile_cache=profile_cache)
+    assert first.layers is not None
+    second = SoilGridsDataProvider(lat, lon, RDMCR, raster_source=SoilGridsRasterSource(tiles_dir),
+                                   profile_cache=SoilProfileCache(tmp_path / "profiles"))
+    # A cache hit only sets soil_yaml
+    assert second.layers is None
+    assert second.soil_yaml == first.soil_yaml
+
+def test_replaced_tiles_invalidate_profiles(tmp_path, tiles_dir):
+    profile_cache = SoilProfileCache(tmp_path / "profiles")
+    first = SoilGridsDataProvider(lat, lon, RDMCR, raster_source=SoilGridsRasterSource(tiles_dir),
+                                  profile_cache=profile_cache)
+    scale_tile(tiles_dir / "clay" / "clay_0-5cm_mean.tif", 1.5)
+    second = SoilGridsDataProvider(lat, lon, RDMCR, raster_source=SoilGridsRasterSource(tiles_dir),
+                                   profile_cache=SoilProfileCache(tmp_path / "profiles"))
+    assert second.layers is not None
+    assert second.soil_yaml != first.soil_yaml
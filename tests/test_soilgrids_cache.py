@@ -0,0 +1,80 @@
+import json
+from http.server import BaseHTTPRequestHandler
+import pytest
+import requests
+from libs.soilgrids_cache import SoilGridsResponseCache
+from libs.SoilGridsDataProvider import SoilGridsDataProvider
+
+props = SoilGridsDataProvider.soilgrids_vars
+depths = SoilGridsDataProvider.soilgrids_soillayers
+
+@pytest.fixture
+def soilgrids_api(http_server, soilgrids_response, monkeypatch):
+    """Local stand-in of the SoilGrids REST API that answers every query with the recorded response."""
+    body = json.dumps(soilgrids_response).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        nrequests = 0
+        status = 200
+
+        def do_GET(self):
+            Handler.nrequests += 1
+            self.send_response(Handler.status)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    monkeypatch.setattr(SoilGridsDataProvider, "request_url", http_server(Handler))
+    return Handler
+
+def test_provider_miss_then_hit(tmp_path, soilgrids_api):
+    cache = SoilGridsResponseCache(tmp_path / "cache.sqlite")
+    first = SoilGridsDataProvider(52.0, 5.3, 120., cache=cache)
+    assert soilgrids_api.nrequests == 1
+    # The same site, also after rounding of the coordinates, comes from the cache
+    second = SoilGridsDataProvider(52.0, 5.3, 120., cache=SoilGridsResponseCache(tmp_path / "cache.sqlite"))
+    third = SoilGridsDataProvider(52.00001, 5.29999, 120., cache=cache)
+    assert soilgrids_api.nrequests == 1
+    assert second.soil_yaml == first.soil_yaml
+    assert third.soilgridsdresult == first.soilgridsdresult
+    SoilGridsDataProvider(52.1, 5.3, 120., cache=cache)
+    assert soilgrids_api.nrequests == 2
+
+def test_error_response_not_cached(tmp_path, soilgrids_api):
+    cache = SoilGridsResponseCache(tmp_path / "cache.sqlite")
+    soilgrids_api.status = 500
+    with pytest.raises(requests.HTTPError):
+        SoilGridsDataProvider(52.0, 5.3, 120., cache=cache)
+    assert cache.get(52.0, 5.3, props, depths) is None
+    # Once the API answers again, the site is requested anew
+    soilgrids_api.status = 200
+    SoilGridsDataProvider(52.0, 5.3, 120., cache=cache)
+    assert soilgrids_api.nrequests == 2
+    assert cache.get(52.0, 5.3, props, depths) is not None
+
+def test_key_includes_properties_and_depths(tmp_path, soilgrids_response):
+    cache = SoilGridsResponseCache(tmp_path / "cache.sqlite")
+    cache.put(52.0, 5.3, props, depths, soilgrids_response)
+    assert cache.get(52.0, 5.3, list(reversed(props)), depths) == soilgrids_response
+    assert cache.get(52.0, 5.3, props[:-1], depths) is None
+    assert cache.get(52.0, 5.3, props, depths[:-1]) is None
+
+def test_ttl(tmp_path, soilgrids_response):
+    cache = SoilGridsResponseCache(tmp_path / "cache.sqlite", ttl=-1.)
+    cache.put(52.0, 5.3, props, depths, soilgrids_response)
+    assert cache.get(52.0, 5.3, props, depths) is None
+
+def test_lru_eviction(tmp_path, soilgrids_response):
+    size = len(json.dumps(soilgrids_response))
+    cache = SoilGridsResponseCache(tmp_path / "cache.sqlite", max_size=2 * size)
+    cache.put(52.0, 5.0, props, depths, soilgrids_response)
+    cache.put(52.0, 5.1, props, depths, soilgrids_response)
+    # Reading the first entry makes the second one the least recently used, which is evicted by a third
+    assert cache.get(52.0, 5.0, props, depths) is not None
+    cache.put(52.0, 5.2, props, depths, soilgrids_response)
+    assert cache.get(52.0, 5.0, props, depths) is not None
+    assert cache.get(52.0, 5.1, props, depths) is None
+    assert cache.get(52.0, 5.2, props, depths) is not None
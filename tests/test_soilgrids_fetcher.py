@@ -0,0 +1,67 @@
+import asyncio
+import json
+import time
+from http.server import BaseHTTPRequestHandler
+from libs.soilgrids_fetcher import SoilGridsBatchFetcher, TokenBucket
+from libs.SoilGridsDataProvider import SoilGridsDataProvider
+
+def make_handler(body, statuses):
+    """Handler that answers the n-th request with statuses.get(n, 200) and records the request times."""
+    class Handler(BaseHTTPRequestHandler):
+        times = []
+
+        def do_GET(self):
+            Handler.times.append(time.monotonic())
+            status = statuses.get(len(Handler.times), 200)
+            self.send_response(status)
+            if status == 429:
+                self.send_header("Retry-After", "0.3")
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            if status == 200:
+                self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+def test_token_bucket_spacing():
+    async def acquire_all(bucket, n):
+        times = []
+        for i in range(n):
+            await bucket.acquire()
+            times.append(time.monotonic())
+        return times
+
+    rate, per = 5, 0.5
+    times = asyncio.run(acquire_all(TokenBucket(rate, per), 2 * rate))
+    # No burst: at most rate tokens in the first interval, each per / rate apart
+    assert sum(t - times[0] < per for t in times) <= rate
+    assert min(t1 - t0 for t0, t1 in zip(times, times[1:])) >= 0.95 * per / rate
+
+def test_fetcher_rate_limit_and_retries(http_server, soilgrids_response):
+    handler = make_handler(json.dumps(soilgrids_response).encode(), {2: 429, 4: 503, 5: 500})
+    url = http_server(handler)
+    rate, per = 5, 0.5
+    fetcher = SoilGridsBatchFetcher(RDMCR=120., request_url=url, rate=rate, per=per, max_retries=3)
+    coordinates = [(52.0 + 0.01 * i, 5.0) for i in range(4)]
+    providers = fetcher.get_providers(coordinates)
+
+    assert all(isinstance(provider, SoilGridsDataProvider) for provider in providers)
+    times = handler.times
+    # Every site once, plus the retries of the 429 and the two 5xx answers
+    assert len(times) == len(coordinates) + 3
+    # No burst (the server sees the requests with some jitter) and on average per / rate apart
+    assert min(t1 - t0 for t0, t1 in zip(times, times[1:])) >= 0.5 * per / rate
+    assert times[-1] - times[0] >= 0.95 * (len(times) - 1) * per / rate
+    # After the 429, no request is sent before its Retry-After has passed
+    assert times[2] - times[1] >= 0.3
+
+def test_fetcher_gives_up(http_server, soilgrids_response):
+    handler = make_handler(b"", {n: 503 for n in range(1, 10)})
+    url = http_server(handler)
+    fetcher = SoilGridsBatchFetcher(RDMCR=120., request_url=url, rate=20, per=1., max_retries=2)
+    providers = fetcher.get_providers([(52.0, 5.0)])
+    assert isinstance(providers[0], Exception)
+    assert len(handler.times) == 3
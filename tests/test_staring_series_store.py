@@ -0,0 +1,63 @@
+import os
+import shutil
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+from libs.BOFEK2020DataProvider import BOFEK2020DataProvider
+from libs.staring_series_store import StaringSeriesStore
+
+staring_series_src_dir = Path(__file__).resolve().parent.parent / "input" / "03" / "StaringSeries"
+RDMCR = 125.
+
+@pytest.fixture
+def staring_series_dir(tmp_path, monkeypatch):
+    staring_series_dir = tmp_path / "StaringSeries"
+    shutil.copytree(staring_series_src_dir, staring_series_dir, ignore=shutil.ignore_patterns("*.npz"))
+    monkeypatch.setattr(BOFEK2020DataProvider, "staring_series_stores", {})
+    return staring_series_dir
+
+def test_get_layers(staring_series_dir):
+    store = BOFEK2020DataProvider.get_staring_series_store(staring_series_dir, RDMCR)
+    df_vgn = pd.read_csv(staring_series_dir / "StaringReeksPARS_2018.csv").set_index("Name")
+    df_profiles = pd.read_csv(staring_series_dir / "AllProfiles_368.csv").set_index("iProfile")
+    for soilid in store.soilids[::37]:
+        layers = store.get_layers(soilid=soilid)
+        assert layers["Thickness"].sum() >= RDMCR
+        isoil = df_profiles.loc[soilid, "iSoil1"]
+        expected = df_vgn.loc[StaringSeriesStore.get_staring_block(isoil)]
+        for param in StaringSeriesStore.vgn_params:
+            assert layers[param][0] == expected[param]
+
+def test_recompiled_when_tables_change(staring_series_dir):
+    store = BOFEK2020DataProvider.get_staring_series_store(staring_series_dir, RDMCR)
+    store_fp = store.store_fp
+    assert store.source_version == StaringSeriesStore.get_source_version(staring_series_dir)
+
+    # An unchanged store is reused by a new process
+    BOFEK2020DataProvider.staring_series_stores.clear()
+    mtime = store_fp.stat().st_mtime_ns
+    BOFEK2020DataProvider.get_staring_series_store(staring_series_dir, RDMCR)
+    assert store_fp.stat().st_mtime_ns == mtime
+
+    # Edited Van Genuchten parameters give a new store
+    vgn_fp = staring_series_dir / "StaringReeksPARS_2018.csv"
+    df_vgn = pd.read_csv(vgn_fp)
+    df_vgn["WCs"] = df_vgn["WCs"] - 0.05
+    df_vgn.to_csv(vgn_fp, index=False)
+    os.utime(vgn_fp, ns=(mtime + 10 ** 9, mtime + 10 ** 9))
+    BOFEK2020DataProvider.staring_series_stores.clear()
+    new_store = BOFEK2020DataProvider.get_staring_series_store(staring_series_dir, RDMCR)
+    assert new_store.source_version != store.source_version
+    assert np.allclose(new_store.layer_params[:, -1], store.layer_params[:, -1] - 0.05)
+    assert not np.allclose(new_store.SMfromPF, store.SMfromPF)
+
+def test_stale_store_without_version(staring_series_dir):
+    store = BOFEK2020DataProvider.get_staring_series_store(staring_series_dir, RDMCR)
+    # A store written before the source version was recorded
+    with np.load(store.store_fp) as data:
+        arrays = {name: data[name] for name in data.files if name not in ["source_version", "layer_params"]}
+    np.savez(store.store_fp, **arrays)
+    BOFEK2020DataProvider.staring_series_stores.clear()
+    store = BOFEK2020DataProvider.get_staring_series_store(staring_series_dir, RDMCR)
+    assert store.layer_params is not None
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from libs.util import AfgenTable, Util
+
+def afgen_reference(x, table_function):
+    # Util.Afgen before AfgenTable: clamped linear interpolation with a linear scan of the xs
+    xs = list(table_function[0::2])
+    ys = list(table_function[1::2])
+    x = min(max(x, xs[0]), xs[-1])
+    ind = 0
+    x0, x1, y0, y1 = xs[0], xs[1], ys[0], ys[1]
+    while (x > x1):
+        x0, x1, y0, y1 = xs[ind], xs[ind + 1], ys[ind], ys[ind + 1]
+        ind += 1
+    return y0 * ((x1 - x) / (x1 - x0)) + y1 * ((x - x0) / (x1 - x0))
+
+tables = [
+    [0., 0.2, 1., 1.],
+    [-10., 0., 0., 0., 10., 1., 20., 1., 30., 0.5],
+    [0, 5, 1, 3, 2, 3, 3, 0, 4, 8, 5, -2],
+]
+
+def get_xs(table_function):
+    xs = np.array(table_function[0::2], dtype=float)
+    # Below and above the table, on every breakpoint and between them
+    return np.concatenate([[xs[0] - 100., xs[0] - 1e-9, xs[-1] + 1e-9, xs[-1] + 100.], xs,
+                           (xs[:-1] + xs[1:]) / 2, xs[:-1] + 0.1 * np.diff(xs)])
+
+@pytest.mark.parametrize("table_function", tables)
+def test_scalar(table_function):
+    table = AfgenTable(table_function)
+    for x in get_xs(table_function):
+        expected = afgen_reference(float(x), table_function)
+        assert table(float(x)) == pytest.approx(expected, rel=1e-12, abs=1e-12)
+        assert table(x) == pytest.approx(expected, rel=1e-12, abs=1e-12)
+        assert Util().Afgen(float(x), table_function) == pytest.approx(expected, rel=1e-12, abs=1e-12)
+    assert table(int(table_function[2])) == pytest.approx(table_function[3])
+
+@pytest.mark.parametrize("table_function", tables)
+def test_vectorized(table_function):
+    table = AfgenTable(table_function)
+    xs = get_xs(table_function)
+    expected = [afgen_reference(float(x), table_function) for x in xs]
+    np.testing.assert_allclose(table(xs), expected, rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(table(list(xs)), expected, rtol=1e-12, atol=1e-12)
+    n = len(xs) // 2 * 2
+    np.testing.assert_allclose(table(xs[:n].reshape(-1, 2)), np.reshape(expected[:n], (-1, 2)), rtol=1e-12,
+                               atol=1e-12)
+
+@pytest.mark.parametrize("table_function, match", [([0., 1., 1.], "even number"), ([0., 1.], "at least 4"),
+                                                   ([1., 0., 0., 1.], "smaller than"), ([0., 0., 0., 1.], "equal to")])
+def test_invalid_tables(table_function, match):
+    with pytest.raises(Exception, match=match):
+        AfgenTable(table_function)
+    with pytest.raises(Exception, match=match):
+        Util().Afgen(0.5, table_function)
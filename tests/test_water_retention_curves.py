@@ -0,0 +1,39 @@
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+from libs.water_retention_curves import VanGenuchten
+
+staring_series_fp = Path(__file__).resolve().parent.parent / "input" / "03" / "StaringSeries" / \
+    "StaringReeksPARS_2018.csv"
+
+pFs = np.concatenate([[-1.0], np.linspace(0., 7., 36)])
+
+@pytest.fixture(scope="module")
+def staring_series():
+    return pd.read_csv(staring_series_fp)
+
+def test_soil_moisture_content_matrix(staring_series):
+    vgn = VanGenuchten()
+    matrix = vgn.calculate_soil_moisture_content_matrix(pFs, staring_series.Alpha, staring_series.Npar,
+                                                        staring_series.WCr, staring_series.WCs)
+    assert matrix.shape == (len(staring_series), len(pFs))
+    for i, layer in enumerate(staring_series.itertuples()):
+        expected = [vgn.calculate_soil_moisture_content(pF, layer.Alpha, layer.Npar, layer.WCr, layer.WCs)
+                    for pF in pFs]
+        assert np.allclose(matrix[i], expected, rtol=1e-12, atol=0.)
+
+def test_log10_hydraulic_conductivity_matrix(staring_series):
+    vgn = VanGenuchten()
+    matrix = vgn.calculate_log10_hydraulic_conductivity_matrix(pFs, staring_series.Alpha, staring_series.Lambda,
+                                                               staring_series.Ksfit, staring_series.Npar)
+    assert matrix.shape == (len(staring_series), len(pFs))
+    for i, layer in enumerate(staring_series.itertuples()):
+        expected = [vgn.calculate_log10_hydraulic_conductivity(pF, layer.Alpha, layer.Lambda, layer.Ksfit, layer.Npar)
+                    for pF in pFs]
+        assert np.allclose(matrix[i], expected, rtol=1e-12, atol=1e-12)
+
+def test_make_xy_tables():
+    vgn = VanGenuchten()
+    matrix = np.array([[0.4, 0.3], [0.2, 0.1]])
+    assert vgn.make_xy_tables([1.0, 2.0], matrix) == [[1.0, 0.4, 2.0, 0.3], [1.0, 0.2, 2.0, 0.1]]
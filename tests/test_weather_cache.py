@@ -0,0 +1,40 @@
+import datetime as dt
+import shutil
+from pathlib import Path
+import pytest
+from pcse.input import ExcelWeatherDataProvider
+from libs.weather_cache import CachedWeatherDataProvider
+
+weather_fp = Path(__file__).resolve().parent.parent / "input" / "02" / "weather" / "02_weather.xlsx"
+
+@pytest.fixture(scope="module")
+def excel_wdp():
+    return ExcelWeatherDataProvider(weather_fp, force_reload=True)
+
+def test_cache_equals_source(tmp_path, excel_wdp):
+    CachedWeatherDataProvider(weather_fp, cache_dir=tmp_path)
+    wdp = CachedWeatherDataProvider(weather_fp, cache_dir=tmp_path)
+    # Containers are only built for the days that are requested
+    assert len(wdp.store.containers) == 0
+    assert wdp.first_date == excel_wdp.first_date and wdp.last_date == excel_wdp.last_date
+    wdc = wdp(dt.date(2020, 6, 1))
+    assert len(wdp.store.containers) == 1
+    assert wdp(dt.date(2020, 6, 1)) is wdc
+    assert wdp.export() == excel_wdp.export()
+    for attr in ["latitude", "longitude", "elevation", "angstA", "angstB"]:
+        assert getattr(wdp, attr) == getattr(excel_wdp, attr)
+    assert wdp.angstA is not None and wdp.angstB is not None
+
+def test_missing_day(tmp_path):
+    wdp = CachedWeatherDataProvider(weather_fp, cache_dir=tmp_path)
+    with pytest.raises(Exception, match="No weather data"):
+        wdp(dt.date(1990, 1, 1))
+
+def test_changed_file_gets_new_cache(tmp_path):
+    fp = tmp_path / weather_fp.name
+    shutil.copy(weather_fp, fp)
+    wdp = CachedWeatherDataProvider(fp, cache_dir=tmp_path / "cache")
+    with open(fp, "ab") as f:
+        f.write(b"\0")
+    other = CachedWeatherDataProvider(fp, cache_dir=tmp_path / "cache")
+    assert other.cache_fp != wdp.cache_fp